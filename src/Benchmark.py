@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Banco de pruebas de rendimiento con boletines sintéticos.
+Genera PDF con el mismo formato que los del BORME (cabeceras, entradas "código - nombre" y
+actos partidos en varias líneas) y mide cada etapa por separado y la cadena completa,
+sirviendo los PDF desde un servidor HTTP local para que el Fetcher no dependa de boe.es.
+Los resultados se guardan en JSON y se pueden comparar con los de una ejecución anterior.
+
+Uso: python Benchmark.py [--entradas 10,100,1000] [--base resultados_anteriores.json]
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+from datetime import datetime
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+import Crawler
+import Fetcher
+import Wrangler
+RUTA_RESULTADOS = "../data/benchmarks"
+ENTRADAS_POR_DEFECTO = (10, 100, 1000, 10000)
+LINEAS_POR_PAGINA = 70
+TIPOS_VIA = ("C/", "AVDA", "PLAZA", "CTRA", "PASEO")
+CIUDADES = ("MADRID", "ALICANTE", "ELCHE", "VALENCIA", "SEVILLA")
+ACTIVIDADES = ("construcción", "comercio", "hostelería", "consultoría", "transporte")
+def _escapar(texto):
+    """Codifica una línea como cadena literal de PDF en WinAnsi"""
+    return texto.encode("cp1252", "replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+def generar_entradas(n, semilla=0, codigo_inicial=100000):
+    """
+    Genera las líneas de `n` entradas del BORME, mitad constituciones y mitad disoluciones.
+
+    Args:
+        n (int): Número de entradas.
+        semilla (int, opcional): Semilla del generador, para que los datos sean reproducibles.
+        codigo_inicial (int, opcional): Código de la primera entrada; los siguientes son consecutivos.
+    Returns:
+        list: Una lista de líneas por entrada, ya partidas al ancho de columna del boletín.
+    """
+    aleatorio = random.Random(semilla)
+    entradas = []
+    for k in range(n):
+        codigo = codigo_inicial + k
+        nombre = f"EMPRESA {aleatorio.choice(['ALFA', 'BETA', 'GAMMA', 'DELTA'])} {k} {aleatorio.choice(['SL.', 'SA.', 'SLU.'])}"
+        if aleatorio.random() < 0.5:
+            cuerpo = (f"Constitución. Comienzo de operaciones: {aleatorio.randint(1, 28)}.0{aleatorio.randint(1, 9)}.24. "
+                      f"Objeto social: Actividades de {aleatorio.choice(ACTIVIDADES)} y servicios. "
+                      f"Domicilio: {aleatorio.choice(TIPOS_VIA)} MAYOR {aleatorio.randint(1, 200)} "
+                      f"({aleatorio.choice(CIUDADES)}). Capital: {aleatorio.randint(3, 90)}.000,00 Euros. "
+                      f"Nombramientos. Adm. Unico: PEREZ GARCIA JUAN. "
+                      f"Datos registrales. S 8 , H A {codigo + 500000}, I/A 1 (26.08.24).")
+        else:
+            cuerpo = (f"Disolución. Voluntaria. Extinción. Ceses/Dimisiones. Liquidador: LOPEZ ANA. "
+                      f"Datos registrales. T 123 , F 45, S 8, H A {codigo + 500000}, I/A 5 (26.08.24).")
+        entradas.append([f"{codigo} - {nombre}"] + textwrap.wrap(cuerpo, 110))
+    return entradas
+def generar_pdf(ruta, n, semilla=0):
+    """
+    Escribe un PDF sintético del BORME con `n` entradas.
+
+    Args:
+        ruta (str): Ruta del PDF a crear. Su nombre debería seguir el formato del BORME
+            (BORME-A-2024-168-03.pdf) para que el Wrangler deduzca la provincia.
+        n (int): Número de entradas.
+        semilla (int, opcional): Semilla del generador.
+    """
+    lineas = [linea for entrada in generar_entradas(n, semilla) for linea in entrada]
+    escritor = PdfWriter()
+    fuente = DictionaryObject({NameObject("/Type"): NameObject("/Font"), NameObject("/Subtype"): NameObject("/Type1"),
+                               NameObject("/BaseFont"): NameObject("/Helvetica"),
+                               NameObject("/Encoding"): NameObject("/WinAnsiEncoding")})
+    for inicio in range(0, max(len(lineas), 1), LINEAS_POR_PAGINA):
+        cabecera = ["BOLETÍN OFICIAL DEL REGISTRO MERCANTIL", "Núm. 168 Lunes 2 de septiembre de 2024 Pág. 1"]
+        if inicio == 0:
+            cabecera += ["SECCIÓN PRIMERA", "Empresarios", "Actos inscritos", "ALICANTE"]
+        pagina_lineas = cabecera + lineas[inicio:inicio + LINEAS_POR_PAGINA] + [
+            "cve: BORME-A-2024-168-03", "Verificable en https://www.boe.es"]
+        pagina = escritor.add_blank_page(595, 842)
+        pagina[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): fuente})})
+        contenido = DecodedStreamObject()
+        contenido.set_data(b"BT /F1 8 Tf 10 TL 30 810 Td "
+                           + b" ".join(b"(" + _escapar(linea) + b") Tj T*" for linea in pagina_lineas) + b" ET")
+        pagina.replace_contents(contenido)
+    escritor.write(ruta)
+def cronometrar(funcion, repeticiones, preparar=None):
+    """
+    Ejecuta una función varias veces y mide cada ejecución.
+
+    Args:
+        funcion (callable): Función a medir, sin argumentos.
+        repeticiones (int): Número de ejecuciones.
+        preparar (callable, opcional): Se llama antes de cada ejecución, fuera del tiempo medido.
+    Returns:
+        dict: Tiempo mínimo y mediana en segundos y número de repeticiones.
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {"segundos_min": min(tiempos), "segundos_mediana": statistics.median(tiempos),
+            "repeticiones": repeticiones}
+class _ManejadorSilencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+def servidor_local(directorio):
+    """
+    Arranca en segundo plano un servidor HTTP que sirve los archivos de un directorio.
+
+    Args:
+        directorio (str): Directorio a servir.
+    Returns:
+        ThreadingHTTPServer: Servidor en marcha, en un puerto libre. Llamar a shutdown() al terminar.
+    """
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_ManejadorSilencioso, directory=directorio))
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+def preparar_espacio(directorio):
+    """
+    Crea un espacio de trabajo con la misma estructura que el repositorio (src/ y data/) y
+    se sitúa en su src/, ya que las etapas usan rutas relativas a ella.
+
+    Returns:
+        logging.Logger: Logger del proyecto, que escribe solo en data/logs/Benchmarklogs del
+        espacio de trabajo para que los mensajes de las etapas no se mezclen con los tiempos.
+    """
+    for subdirectorio in ("src", "data/logs", "data/outputs/PDF", "data/outputs/jsonlines", "data/outputs/csv",
+                          "data/fixtures"):
+        os.makedirs(os.path.join(directorio, subdirectorio), exist_ok=True)
+    os.chdir(os.path.join(directorio, "src"))
+    logger = logging.getLogger("Practica12")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.FileHandler("../data/logs/Benchmarklogs")
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+def _vaciar(*directorios):
+    for directorio in directorios:
+        shutil.rmtree(directorio, ignore_errors=True)
+        os.makedirs(directorio)
+def medir_etapas(n, logger, repeticiones):
+    """
+    Mide por separado cada función de las etapas sobre un PDF sintético de `n` entradas.
+
+    Returns:
+        list: Un resultado por función medida.
+    """
+    nombre = "BORME-A-2024-168-03.pdf"
+    ruta_pdf = os.path.join("../data/fixtures", nombre)
+    generar_pdf(ruta_pdf, n)
+    with open(ruta_pdf, "rb") as archivo:
+        contenido = archivo.read()
+    lineas = Crawler.extraer_lineas(contenido)
+    texto = "\n".join(lineas)
+    parrafos = list(Crawler.segmentar_parrafos(texto))
+    registros = Crawler.parrafos_to_dict(parrafos, logger)
+    limpios = Wrangler.clean_datos_vectorizado(registros, logger)
+    medidas = {
+        "extraer_lineas": lambda: Crawler.extraer_lineas(contenido),
+        "segmentar_parrafos": lambda: list(Crawler.segmentar_parrafos(texto)),
+        "parrafos_to_dict": lambda: Crawler.parrafos_to_dict(parrafos, logger),
+        "read_pdf": lambda: Crawler.read_pdf("../data/fixtures", nombre, logger),
+        "clean_datos": lambda: Wrangler.clean_datos(registros, logger),
+        "clean_datos_vectorizado": lambda: Wrangler.clean_datos_vectorizado(registros, logger),
+        "limpiar_datos": lambda: Wrangler.limpiar_datos(registros, logger),
+        "list_to_csv": lambda: Wrangler.list_to_csv(f"{nombre}.json", limpios, logger),
+    }
+    return [{"etapa": etapa, "entradas": n, "registros": len(registros), **cronometrar(funcion, repeticiones)}
+            for etapa, funcion in medidas.items()]
+def medir_cadena(n, pdfs, logger, repeticiones):
+    """
+    Mide el Fetcher contra el servidor local y la cadena completa Fetcher -> Crawler -> Wrangler
+    con `pdfs` boletines de `n` entradas.
+
+    Returns:
+        list: Resultados del Fetcher y de la cadena completa.
+    """
+    directorio_servido = os.path.abspath(f"../data/fixtures/servidor-{n}")
+    # Misma ruta que en boe.es, para que el Wrangler deduzca la fecha del boletín de links.txt
+    ruta_dia = "borme/dias/2024/09/02/pdfs"
+    _vaciar(os.path.join(directorio_servido, ruta_dia))
+    nombres = [f"BORME-A-2024-168-{j:02d}.pdf" for j in range(pdfs)]
+    for j, nombre in enumerate(nombres):
+        generar_pdf(os.path.join(directorio_servido, ruta_dia, nombre), n, semilla=j)
+    servidor = servidor_local(directorio_servido)
+    try:
+        base = f"http://127.0.0.1:{servidor.server_address[1]}"
+        enlaces = [f"{base}/{ruta_dia}/{nombre}" for nombre in nombres]
+        with open(Fetcher.RUTA_ENLACES, "w", encoding="utf-8") as archivo:
+            archivo.writelines(f"{enlace}\n" for enlace in enlaces)
+        fetcher = cronometrar(lambda: Fetcher.descargar_enlaces(enlaces, Fetcher.DIRECTORIO_PDF, logger,
+                                                                peticiones_por_segundo=None),
+                              repeticiones, preparar=lambda: _vaciar(Fetcher.DIRECTORIO_PDF))
+        def cadena():
+            Fetcher.execute(peticiones_por_segundo=None, ruta_manifiesto=None, ruta_indice=None)
+            Crawler.run(usar_cache=False, forzar=True)
+            Wrangler.run(forzar=True)
+        completa = cronometrar(cadena, repeticiones, preparar=lambda: _vaciar(
+            Fetcher.DIRECTORIO_PDF, "../data/outputs/jsonlines", "../data/outputs/csv"))
+        csv_escritos = len(os.listdir("../data/outputs/csv"))
+    finally:
+        servidor.shutdown()
+    return [{"etapa": "fetcher", "entradas": n, "pdfs": pdfs, **fetcher},
+            {"etapa": "extremo_a_extremo", "entradas": n, "pdfs": pdfs, "csv": csv_escritos, **completa}]
+def comparar(resultados, base, umbral=0.10, minimo=0.001):
+    """
+    Compara unos resultados con los de una ejecución anterior por etapa y número de entradas.
+
+    Args:
+        resultados (list): Resultados de la ejecución actual.
+        base (list): Resultados de la ejecución de referencia.
+        umbral (float, opcional): Empeoramiento relativo del tiempo mínimo a partir del cual
+            se considera una regresión (0.10 = un 10 % más lento).
+        minimo (float, opcional): Diferencia absoluta en segundos por debajo de la cual no se
+            considera regresión, para no confundir con el ruido las medidas de milisegundos.
+    Returns:
+        list: Tuplas (etapa, entradas, segundos_base, segundos_actual, ratio) de las regresiones.
+    """
+    referencia = {(r["etapa"], r["entradas"]): r["segundos_min"] for r in base}
+    regresiones = []
+    for r in resultados:
+        anterior = referencia.get((r["etapa"], r["entradas"]))
+        if not anterior:
+            continue
+        ratio = r["segundos_min"] / anterior
+        print(f"{r['etapa']:<25} {r['entradas']:>6} {anterior:>10.4f} s {r['segundos_min']:>10.4f} s  x{ratio:.2f}")
+        if ratio > 1 + umbral and r["segundos_min"] - anterior > minimo:
+            regresiones.append((r["etapa"], r["entradas"], anterior, r["segundos_min"], ratio))
+    return regresiones
+def run(entradas=ENTRADAS_POR_DEFECTO, pdfs=4, repeticiones=3, salida=None, base=None, umbral=0.10,
+        cadena=True):
+    """
+    Ejecuta el banco de pruebas y guarda los resultados.
+
+    Args:
+        entradas (tuple, opcional): Tamaños de boletín (número de entradas) a medir.
+        pdfs (int, opcional): Número de PDF servidos para el Fetcher y la cadena completa.
+        repeticiones (int, opcional): Ejecuciones de cada medida; se guarda el mínimo y la mediana.
+        salida (str, opcional): Archivo JSON de resultados. Por defecto
+            data/benchmarks/benchmark-<fecha>.json.
+        base (str, opcional): Resultados de una ejecución anterior con los que comparar.
+        umbral (float, opcional): Empeoramiento relativo que se considera regresión.
+        cadena (bool, opcional): Mide también el Fetcher y la cadena completa.
+    Returns:
+        list: Regresiones encontradas respecto a `base` (vacía si no se indica).
+    """
+    marca = datetime.now().strftime("%Y%m%d-%H%M%S")
+    salida = os.path.abspath(salida or os.path.join(RUTA_RESULTADOS, f"benchmark-{marca}.json"))
+    base = os.path.abspath(base) if base else None
+    directorio_actual = os.getcwd()
+    espacio = tempfile.mkdtemp(prefix="borme-benchmark-")
+    resultados = []
+    try:
+        logger = preparar_espacio(espacio)
+        for n in entradas:
+            resultados += medir_etapas(n, logger, repeticiones)
+            if cadena:
+                resultados += medir_cadena(n, pdfs, logger, repeticiones)
+            print(f"Medido el tamaño de {n} entradas")
+    finally:
+        os.chdir(directorio_actual)
+        shutil.rmtree(espacio, ignore_errors=True)
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as archivo:
+        json.dump({"fecha": marca, "python": platform.python_version(), "plataforma": platform.platform(),
+                   "cpus": os.cpu_count(), "resultados": resultados}, archivo, ensure_ascii=False, indent=1)
+    print(f"Resultados guardados en {salida}")
+    if base is None:
+        return []
+    with open(base, "r", encoding="utf-8") as archivo:
+        regresiones = comparar(resultados, json.load(archivo)["resultados"], umbral)
+    for etapa, n, anterior, actual, ratio in regresiones:
+        print(f"Regresión en {etapa} con {n} entradas: {anterior:.4f} s -> {actual:.4f} s (x{ratio:.2f})")
+    return regresiones
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento con boletines sintéticos")
+    parser.add_argument("--entradas", default=",".join(map(str, ENTRADAS_POR_DEFECTO)),
+                        help="Tamaños de boletín separados por comas")
+    parser.add_argument("--pdfs", type=int, default=4, help="PDF servidos para el Fetcher y la cadena completa")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="Archivo JSON de resultados")
+    parser.add_argument("--base", help="Resultados anteriores con los que comparar")
+    parser.add_argument("--umbral", type=float, default=0.10, help="Empeoramiento que se considera regresión")
+    parser.add_argument("--sin-cadena", action="store_true", help="Mide solo las etapas por separado")
+    argumentos = parser.parse_args()
+    regresiones = run(tuple(int(n) for n in argumentos.entradas.split(",")), argumentos.pdfs,
+                      argumentos.repeticiones, argumentos.salida, argumentos.base, argumentos.umbral,
+                      not argumentos.sin_cadena)
+    sys.exit(1 if regresiones else 0)
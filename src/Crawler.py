@@ -1,220 +1,568 @@
 #!/usr/bin/env python
 # coding: utf-8
 from pypdf import PdfReader
+import io
+import mmap
 import os
 import jsonlines
 import pathlib
-import json
+import re
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from os.path import exists, join
 from os import makedirs
 from utils.Loger import Logger
+from utils.Cache import TextCache
+from utils.Estado import StateLedger, RUTA_ESTADO
+from utils.Metricas import METRICAS
+from utils.Jsonlines import JsonlinesWriter, borrar_jsonlines, completo, comprobar_compresion, ruta_comprimida
+# Versión de la extracción y limpieza de líneas; cambiarla invalida la caché de texto
+VERSION_EXTRACTOR = "1"
+# Versión de las reglas de segmentación y parseo; junto con VERSION_EXTRACTOR identifica la
+# salida del Crawler en el registro de estado. Hay que subirla al cambiar cualquiera de las dos.
+# 2: los renglones de cada acto se unen con un espacio y la constitución ya no repite su texto
+# entero en "Constitución", solo en sus campos (ver `extraer_actos`)
+VERSION_PARSEO = "2"
+VERSION_CRAWLER = f"{VERSION_EXTRACTOR}.{VERSION_PARSEO}"
+DIRECTORIO_JSONLINES = "../data/outputs/jsonlines"
+RUTA_CACHE = "../data/cache/texto"
+# Boletín de un día, sin la provincia: BORME-A-2024-168-03.pdf -> BORME-A-2024-168
+PATRON_DIA = re.compile(r"(BORME-[A-Z]-\d{4}-\d+)-\d+\.pdf")
+# Código de entrada al principio de línea, p. ej. "386538 - CONSTRUCCIONES XYZ SL."
+PATRON_ENTRADA = re.compile(r"^(\d+) - ", re.MULTILINE)
+# Máximo salto admitido entre dos códigos de entrada consecutivos
+SALTO_MAXIMO = 10
 # Función para guardar los datos en un archivo JSON Lines
-def save_nested_to_jsonlines(data, filename,logger):
+def save_nested_to_jsonlines(data, filename,logger,compresion=None):
     """Entra la lista con la informacion del pdf, en cada jsonlines se guarda un pdf
+
+    Se escribe con `utils.Jsonlines.JsonlinesWriter`: por lotes, en un temporal que se
+    renombra al terminar y con un sidecar <archivo>.count, de modo que una caída a mitad
+    nunca deja un jsonlines a medias que el Wrangler pueda tomar por bueno.
+
+    Args:
+        compresion (str, opcional): None, "gzip" (<pdf>.json.gz) o "zstd" (<pdf>.json.zst)
+    Returns:
+        bool: True si el archivo se ha guardado completo
     """
-    output_dir =  "../data/outputs/jsonlines"
+    output_dir =  DIRECTORIO_JSONLINES
     file_path = output_dir+"/"+f"{filename}.json"
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            for item in data:
-                json_line = json.dumps(item, ensure_ascii=False)
-                f.write(json_line + '\n')
+        with JsonlinesWriter(file_path, compresion) as escritor:
+            escritor.escribir_todos(data)
+        return True
     except Exception as e:
         logger.info(f"Error al guardar el archivo {filename}: {e}")
-# Función para transformar los párrafos a diccionarios
-def extraer_datos_constitucion(parrafo):
-    """
-    Extrae información estructurada de un párrafo relacionado con la constitución de una entidad.
-
-    La función toma como entrada un párrafo de texto y devuelve un diccionario con 
-    los siguientes campos:
-    
-    - "Id": código de la entidad.
-    - "nombre": nombre de la entidad.
-    - "Acto legal": tipo de acto legal relacionado con la constitución.
-    - "Comienzo de operaciones": fecha o detalle del inicio de las operaciones.
-    - "Domicilio": dirección de la entidad.
-    - "Capital" (opcional): monto del capital, si está presente.
-    - Otros campos: extrae también el campo correspondiente a "Objetivo social" o 
-      cualquier otra clave que aparezca antes de "Domicilio".
-      
-    Args:
-        parrafo (str): Párrafo de texto que contiene la información de la constitución.
-    Returns:
-        dict: Diccionario con la información extraída.
-    Raises:
-        ValueError: Si ocurre algún error durante el procesamiento del párrafo.
+        return False
+def segmentar_lineas(lineas):
     """
-    try:
-        dicc = {}
-        # Dividir el párrafo en secciones
-        titulo, d = parrafo.split("Comienzo de operaciones:", 1)
-        codigo, nombre = titulo.split("-", 1)
-        nombre, acto_legal = nombre.split("\n", 1)
-        
-        dicc["Id"] = codigo.strip()
-        dicc["nombre"] = nombre.strip()
-        dicc["Acto legal"] = acto_legal.strip()
-
-        # Procesar 'Comienzo de operaciones' y demás secciones
-        operaciones, d = d.split(". ", 1)
-        dicc["Comienzo de operaciones"] = operaciones.strip()
-
-        d = d.replace("\n", "").strip()
-        objetivo_social, d = d.split("Domicilio:", 1)
-        key, value = objetivo_social.split(":", 1)
-        dicc[key.strip()] = value.strip()
-
-        domicilio, d = d.split("Capital", 1)
-        dicc["Domicilio"] = domicilio.strip()
-        try:
-            c=d.split(",",1)[0]
-            dicc["Capital"] = c.strip()
-        except Exception as e:
-            pass
-        return dicc
-    except Exception as e:
-        raise ValueError(f"Error al procesar 'Constitución': {e}")
-def extraer_datos_extincion(parrafo):
-        """
-    Extrae información estructurada de un párrafo relacionado con la extinción de una entidad.
-
-    La función toma como entrada un párrafo de texto y devuelve un diccionario con 
-    los siguientes campos:
-    
-    - "Id": código de la entidad.
-    - "nombre": nombre de la entidad.
-    - "Actolegal": siempre se establece con el valor "Extinción".
-    - "Disolución" (opcional): fecha o detalle de la disolución, si está presente en el párrafo.
+    Agrupa las líneas limpias de un boletín en párrafos, uno por entrada, a medida que llegan.
+
+    Cada entrada empieza en una línea con su código numérico seguido de " - ". Los códigos
+    son correlativos, así que un número al principio de línea que no sigue al código
+    anterior (por ejemplo, dentro del cuerpo de otra entrada) no abre un párrafo nuevo.
+    Un párrafo se entrega en cuanto aparece el código de la entrada siguiente, aunque esté
+    en otra página, de modo que no hace falta tener el documento entero en memoria.
 
     Args:
-        parrafo (str): Párrafo de texto que contiene la información de la extinción.
-    Returns:
-        dict: Diccionario con la información extraída.
-    Raises:
-        ValueError: Si ocurre algún error durante el procesamiento del párrafo.
+        lineas (iterable): Líneas del boletín ya limpias de cabeceras (lista o generador).
+    Yields:
+        str: Cada párrafo, empezando por su código de entrada.
     """
-    try:
-        dicc = {}
-        r, d = parrafo.split("\n", 1)
-        codigo, nombre = r.split("-", 1)
+    actual = None
+    anterior = None
+    for linea in lineas:
+        coincidencia = PATRON_ENTRADA.match(linea)
+        if coincidencia is not None:
+            codigo = int(coincidencia.group(1))
+            if anterior is None or anterior < codigo <= anterior + SALTO_MAXIMO:
+                if actual is not None:
+                    yield "\n".join(actual) + "\n"
+                actual = []
+                anterior = codigo
+        if actual is not None:
+            actual.append(linea)
+    if actual is not None:
+        yield "\n".join(actual)
+def segmentar_parrafos(texto):
+    """
+    Divide el texto limpio de un boletín en párrafos, uno por entrada (ver `segmentar_lineas`).
 
-        dicc["Id"] = codigo.strip()
-        dicc["nombre"] = nombre.strip()
-        dicc["Actolegal"] = "Extinción"
+    Args:
+        texto (str): Texto del boletín ya limpio de cabeceras, con una línea por renglón.
+    Yields:
+        str: Cada párrafo, empezando por su código de entrada.
+    """
+    yield from segmentar_lineas(texto.split("\n"))
+# Actos que publica el BORME en la sección de Actos inscritos
+ACTOS_BORME = (
+    "Constitución", "Nombramientos", "Reelecciones", "Ceses/Dimisiones", "Revocaciones",
+    "Cancelaciones de oficio de nombramientos", "Ampliación de capital", "Reducción de capital",
+    "Desembolso de dividendos pasivos", "Cambio de domicilio social", "Cambio de objeto social",
+    "Ampliacion del objeto social", "Cambio de denominación social", "Modificaciones estatutarias",
+    "Declaración de unipersonalidad", "Pérdida del caracter de unipersonalidad",
+    "Cambio de identidad del socio único", "Sociedad unipersonal", "Disolución", "Extinción",
+    "Fusión por absorción", "Fusión por unión", "Escisión parcial", "Escisión total", "Segregación",
+    "Cesión global de activo y pasivo", "Transformación de sociedad", "Situación concursal",
+    "Reapertura hoja registral", "Cierre provisional hoja registral por revocación del NIF",
+    "Cierre provisional de la hoja registral por baja en el índice de Entidades Jurídicas",
+    "Cierre provisional hoja registral art. 137.2 Ley 43/1995", "Emisión de obligaciones",
+    "Modificación de poderes", "Primera inscripcion (O.M. 10/6/1.997)", "Adaptación Ley 2/95",
+    "Adaptación Ley 44/2015", "Empresario Individual", "Crédito incobrable", "Otros conceptos",
+    "Datos registrales",
+)
+# Un acto empieza al principio del cuerpo o tras un punto y termina en "." o ":"
+PATRON_ACTOS = re.compile(
+    r"(?:^|(?<=\.))\s*(?P<acto>"
+    + "|".join(re.escape(acto) for acto in sorted(ACTOS_BORME, key=len, reverse=True))
+    + r")(?=[.:])")
+PATRON_CABECERA = re.compile(r"(?P<id>\d+)\s*-\s*(?P<nombre>.*)")
+# Campos de la constitución, con los mismos cortes que el antiguo extraer_datos_constitucion
+PATRONES_CONSTITUCION = {
+    "Comienzo de operaciones": re.compile(r"Comienzo de operaciones:\s*(.*?)\.\s"),
+    "Objeto social": re.compile(r"Objeto social:\s*(.*?)\s*Domicilio:"),
+    "Domicilio": re.compile(r"Domicilio:\s*(.*?)\s*Capital"),
+    "Capital": re.compile(r"Domicilio:.*?Capital([^,]*)"),
+}
+def extraer_actos(parrafo, estadisticas):
+    """
+    Tokeniza en una sola pasada todos los actos de una entrada del boletín.
 
-        if "Disolución" in d:
-            d = d.split("Disolución.", 1)[1]
-            disolucion = d.split(".", 1)[0]
-            dicc["Disolución"] = disolucion.strip()
+    El párrafo tiene en la primera línea "código - nombre" y a continuación la lista de
+    actos inscritos ("Constitución. ...", "Nombramientos. ...", "Ceses/Dimisiones. ...").
+    Los renglones del cuerpo se unen con un espacio. Cada acto se guarda como clave del
+    diccionario con su contenido como valor, que queda vacío en los actos sin texto (por
+    ejemplo "Extinción": ""). De la constitución solo se guardan los campos que consume el
+    Wrangler, no su texto entero.
 
-        return dicc
-    except Exception as e:
-        raise ValueError(f"Error al procesar 'Extinción': {e}")
+    Cambia el esquema del antiguo extraer_datos_extincion: la extinción ya no se marca con
+    "Actolegal": "Extinción", sino con "Extinción" en "Acto legal" y su clave "Extinción"; la
+    disolución sigue en "Disolución".
 
-def parrafos_to_dict(parrafos, logger):
+    Args:
+        parrafo (str): Párrafo de texto de una entrada.
+        estadisticas (dict): Contadores {"aciertos": Counter, "fallos": Counter} por tipo de acto.
+    Returns:
+        dict | None: Diccionario con "Id", "nombre", "Acto legal" (lista de actos separados
+        por comas), un campo por acto salvo la constitución y, si hay constitución,
+        "Comienzo de operaciones", "Objeto social", "Domicilio" y "Capital". None si la entrada
+        no tiene cabecera o actos reconocibles.
+    """
+    cabecera, _, cuerpo = parrafo.partition("\n")
+    coincidencia = PATRON_CABECERA.match(cabecera.strip())
+    if coincidencia is None:
+        estadisticas["fallos"]["Cabecera"] += 1
+        return None
+    # Los renglones se unen con un espacio para no pegar la última palabra de uno con la primera del siguiente
+    cuerpo = " ".join(cuerpo.split())
+    actos = list(PATRON_ACTOS.finditer(cuerpo))
+    if not actos:
+        estadisticas["fallos"]["Sin actos"] += 1
+        return None
+    dicc = {"Id": coincidencia.group("id"), "nombre": coincidencia.group("nombre").strip()}
+    dicc["Acto legal"] = ", ".join(acto.group("acto") for acto in actos)
+    for i, acto in enumerate(actos):
+        fin = actos[i + 1].start() if i + 1 < len(actos) else len(cuerpo)
+        nombre_acto = acto.group("acto")
+        if nombre_acto != "Constitución":
+            dicc[nombre_acto] = cuerpo[acto.end():fin].strip(" .:")
+        else:
+            # El domicilio y el capital pueden quedar en el acto siguiente si el texto viene cortado
+            resto = cuerpo[acto.end():] + " "
+            campos = {clave: patron.search(resto) for clave, patron in PATRONES_CONSTITUCION.items()}
+            if campos["Comienzo de operaciones"] is None or campos["Domicilio"] is None:
+                estadisticas["fallos"][nombre_acto] += 1
+            for clave, campo in campos.items():
+                if campo is not None:
+                    dicc[clave] = campo.group(1).strip()
+        estadisticas["aciertos"][nombre_acto] += 1
+    return dicc
+def resumen_estadisticas(estadisticas):
+    """Texto de una línea con los aciertos y fallos por tipo de acto"""
+    partes = []
+    for acto in sorted(set(estadisticas["aciertos"]) | set(estadisticas["fallos"])):
+        parte = f"{acto}: {estadisticas['aciertos'][acto]}"
+        if estadisticas["fallos"][acto]:
+            parte += f" (fallos {estadisticas['fallos'][acto]})"
+        partes.append(parte)
+    return "; ".join(partes)
+def parrafos_to_dict(parrafos, logger, estadisticas=None):
     """
     Convierte párrafos de texto del Boletín Oficial en diccionarios estructurados,
-    procesando específicamente entradas de constitución y extinción de empresas.
-    
-    Esta función procesa cada párrafo y determina si contiene información sobre:
-    - Constitución de nuevas empresas
-    - Extinción de empresas existentes
-    
+    con todos los actos inscritos de cada empresa (constitución, nombramientos, ceses,
+    ampliaciones de capital, cambios de domicilio, extinción, ...).
+
+    Los actos se reconocen con patrones precompilados (ver `ACTOS_BORME`), sin cadenas de
+    `split` ni excepciones por entrada. Al terminar se registra una línea con los aciertos
+    y fallos por tipo de acto, que también se suman a las métricas del proceso.
+
     Args:
-        parrafos (list): Lista de strings, cada uno conteniendo un párrafo del Boletín
-                        Oficial que describe una constitución o extinción de empresa
+        parrafos (iterable): Strings (lista o generador), cada uno conteniendo un párrafo del Boletín
+                        Oficial que describe los actos inscritos de una empresa
         logger (Logger): Instancia del logger para registro de eventos y errores
-        
+        estadisticas (dict, opcional): Contadores {"aciertos": Counter, "fallos": Counter}
+                        que se acumulan entre llamadas. Si no se indica se usan unos nuevos.
+
     Returns:
-        list: Lista de diccionarios, donde cada diccionario contiene la información
-              estructurada de una constitución o extinción de empresa
-              
-    Raises:
-        Exception: Captura y registra errores específicos durante el procesamiento
-                  de cada párrafo, permitiendo continuar con el resto
+        list: Lista de diccionarios, uno por entrada con algún acto reconocido
     """
+    if estadisticas is None:
+        estadisticas = {"aciertos": Counter(), "fallos": Counter()}
+    locales = {"aciertos": Counter(), "fallos": Counter()}
     lista = []
     for p in parrafos:
-        if "Constitución" in p:
-            try:
-                dicc = extraer_datos_constitucion(p)
-                lista.append(dicc)
-            except Exception as e:
-                logger.info(f"Error al procesar Constitución: {e}")
-                continue
-        elif "Extinción" in p:
-            try:
-                dicc = extraer_datos_extincion(p)
-                lista.append(dicc)
-            except Exception as e:
-                logger.info(f"Error al procesar Extinción: {e}")
-                continue
+        dicc = extraer_actos(p, locales)
+        if dicc is not None:
+            lista.append(dicc)
+    for acto, total in locales["aciertos"].items():
+        METRICAS.incrementar("crawler_actos_total", total, acto=acto)
+    for acto, total in locales["fallos"].items():
+        METRICAS.incrementar("crawler_fallos_parseo_total", total, acto=acto)
+    METRICAS.incrementar("crawler_entradas_total", len(lista))
+    estadisticas["aciertos"].update(locales["aciertos"])
+    estadisticas["fallos"].update(locales["fallos"])
+    logger.info(f"Actos procesados: {resumen_estadisticas(estadisticas)}")
     return lista
-# Función para leer el PDF y extraer los párrafos
-def read_pdf(path, nombre, logger):
+# Líneas que no forman parte de las entradas: cabecera y pie de cada página
+PATRON_DESCARTE = re.compile(r"BOLETÍN OFICIAL|Núm\.|cv|Verificable en https://www\.boe\.es|https")
+# Líneas de cabecera de la primera página que quedan tras el filtro
+LINEAS_CABECERA = 4
+def abrir_pdf(contenido):
+    """
+    Abre un PDF con pypdf. Un PDF proyectado en memoria (mmap) se lee directamente, sin
+    copiarlo a un BytesIO.
+
+    Args:
+        contenido (bytes | mmap.mmap): Bytes del PDF
+    Returns:
+        PdfReader: Lector del PDF
+    Raises:
+        PdfReadError: Si hay problemas al leer el archivo PDF
     """
-    Lee y procesa un archivo PDF del Boletín Oficial, extrayendo y limpiando su contenido.
+    return PdfReader(contenido if isinstance(contenido, mmap.mmap) else io.BytesIO(contenido))
+def iterar_lineas(contenido):
+    """
+    Extrae el texto del PDF página a página y devuelve sus líneas limpias de cabeceras y
+    líneas no deseadas según se van leyendo, sin juntar antes el texto de todo el documento.
+
+    Args:
+        contenido (bytes | mmap.mmap | PdfReader): Bytes del PDF, o el PDF ya abierto con `abrir_pdf`
+    Yields:
+        str: Cada línea limpia del boletín, ya sin las cabeceras de la primera página
+    Raises:
+        PdfReadError: Si hay problemas al leer el archivo PDF
+    """
+    reader = contenido if isinstance(contenido, PdfReader) else abrir_pdf(contenido)
+    METRICAS.incrementar("crawler_paginas_total", len(reader.pages))
+    descartar = PATRON_DESCARTE.match
+    restantes = LINEAS_CABECERA
+    extraccion = 0.0
+    try:
+        for page in reader.pages:
+            inicio = time.perf_counter()
+            texto = page.extract_text()
+            extraccion += time.perf_counter() - inicio
+            for line in texto.split("\n"):
+                linea = line.strip()
+                if not linea or descartar(line):
+                    continue
+                if restantes:  # Elimino las cabeceras
+                    restantes -= 1
+                    continue
+                yield linea
+    finally:
+        METRICAS.observar("crawler_extraccion_segundos", extraccion)
+def extraer_lineas(contenido):
+    """
+    Extrae el texto de todas las páginas de un PDF y lo limpia de cabeceras y líneas no deseadas.
+
+    Args:
+        contenido (bytes): Bytes del PDF
+    Returns:
+        list: Líneas limpias del boletín, ya sin las cabeceras de la primera página
+    Raises:
+        PdfReadError: Si hay problemas al leer el archivo PDF
+    """
+    return list(iterar_lineas(contenido))
+def _guardar_al_terminar(lineas, cache, clave, paginas):
+    """Pasa las líneas tal cual y, si se llegan a leer todas, las guarda en la caché"""
+    vistas = []
+    for linea in lineas:
+        vistas.append(linea)
+        yield linea
+    cache.guardar(clave, vistas, paginas)
+def extraer_registros(fuente, logger, cache=None):
+    """
+    Extrae los registros de un PDF del Boletín Oficial sin guardar nada en disco.
 
     Esta función realiza las siguientes operaciones:
-    1. Lee el archivo PDF especificado
-    2. Extrae el texto de todas las páginas
-    3. Limpia el contenido eliminando cabeceras y líneas no deseadas
-    4. Divide el texto en párrafos basándose en códigos numéricos
-    5. Convierte los párrafos en diccionarios
-    6. Guarda los resultados en formato jsonlines
-    
+    1. Proyecta en memoria (mmap) el archivo PDF especificado
+    2. Extrae y limpia el texto de todas las páginas, o lo recupera de la caché si ese
+       mismo PDF ya se procesó con la misma versión del extractor
+    3. Divide el texto en párrafos basándose en códigos numéricos
+    4. Convierte los párrafos en diccionarios
+
     Args:
-        path (str): Ruta del directorio donde se encuentra el archivo PDF
-        nombre (str): Nombre del archivo PDF a procesar
+        fuente (str | bytes | mmap.mmap): Ruta del PDF o su contenido ya en memoria
         logger (Logger): Instancia del logger para registro de eventos
+        cache (TextCache, opcional): Caché de texto extraído
     Returns:
-        None
+        list: Lista de diccionarios, uno por entrada del boletín
     Raises:
         FileNotFoundError: Si el archivo PDF no existe en la ruta especificada
         PdfReadError: Si hay problemas al leer el archivo PDF
-        Exception: Para otros errores durante el procesamiento
+    """
+    if isinstance(fuente, str):
+        # El sha256 de la caché y pypdf leen del mapa de páginas del archivo, sin otra copia
+        with open(fuente, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contenido:
+            return extraer_registros(contenido, logger, cache)
+    contenido = fuente
+    entrada = None
+    if cache is not None:
+        clave = TextCache.clave(contenido, VERSION_EXTRACTOR)
+        entrada = cache.obtener(clave)
+    METRICAS.incrementar("crawler_cache_total", resultado="fallo" if entrada is None else "acierto")
+    if entrada is not None:
+        cleaned_lines, paginas = entrada
+        # Cuentan como las extraídas, para que crawler_paginas_por_segundo no caiga a 0 con la caché
+        METRICAS.incrementar("crawler_paginas_total", paginas)
+    else:
+        # Las páginas se leen según el parseo va pidiendo líneas
+        reader = abrir_pdf(contenido)
+        cleaned_lines = iterar_lineas(reader)
+        if cache is not None:
+            cleaned_lines = _guardar_al_terminar(cleaned_lines, cache, clave, len(reader.pages))
+    # Dividir en párrafos en base a los códigos
+    parrafos = segmentar_lineas(cleaned_lines)
+    # Transformar los párrafos en diccionarios
+    return parrafos_to_dict(parrafos,logger)
+def read_pdf(path, nombre, logger, cache=None, compresion=None):
+    """
+    Lee y procesa un archivo PDF del Boletín Oficial, extrae sus registros con
+    `extraer_registros` y los guarda en formato jsonlines.
 
+    Args:
+        path (str): Ruta del directorio donde se encuentra el archivo PDF
+        nombre (str): Nombre del archivo PDF a procesar
+        logger (Logger): Instancia del logger para registro de eventos
+        cache (TextCache, opcional): Caché de texto extraído
+        compresion (str, opcional): Compresión del jsonlines (ver `save_nested_to_jsonlines`)
+    Returns:
+        int | None: Número de registros guardados, o None si el PDF no se pudo procesar
     """
     try:
-        pdf_path = join(path, nombre)
-        reader = PdfReader(pdf_path)
-        text = []
-        for page in reader.pages:
-            text.append(page.extract_text())
-        full_text="\n".join(text)
-        # Limpiar y filtrar las líneas
-        lines=full_text.split("\n")
-        cleaned_lines = [
-            line.strip() for line in lines if line.strip() and not line.startswith("BOLETÍN OFICIAL")
-            and not line.startswith("Núm.") and not line.startswith("cv")
-            and not line.startswith("Verificable en https://www.boe.es") and not line.startswith("https")]
-        cleaned_lines = cleaned_lines[4:]  # Elimino las cabeceras
-        cleaned_texto = "\n".join(cleaned_lines)  # Reagrupo las líneas
-        # Dividir en párrafos
-        parrafos = []
-        num = int(cleaned_texto[0:6])  # Divido en base a los códigos
-        while str(num) in cleaned_texto:
-            cleaned_texto = cleaned_texto.split(str(num))
-            parrafos.append(str(num) + cleaned_texto[0])
-            cleaned_texto = cleaned_texto[1]
-            num += 1
-        # Transformar los párrafos en diccionarios
-        lista = parrafos_to_dict(parrafos,logger)
-        save_nested_to_jsonlines(lista, nombre,logger)
+        lista = extraer_registros(join(path, nombre), logger, cache)
+        if not save_nested_to_jsonlines(lista, nombre, logger, compresion):
+            METRICAS.incrementar("crawler_pdf_fallidos_total")
+            return None
+        METRICAS.incrementar("crawler_registros_escritos_total", len(lista))
+        return len(lista)
     except Exception as e:
         logger.info(f"Error al leer el PDF {nombre}: {e}")
+        METRICAS.incrementar("crawler_pdf_fallidos_total")
+        return None
+def dia_boletin(nombre):
+    """Boletín del día al que pertenece un PDF (BORME-A-2024-168), o el propio nombre si no sigue el formato"""
+    coincidencia = PATRON_DIA.fullmatch(nombre)
+    return coincidencia.group(1) if coincidencia else nombre
+def extraer_o_none(fuente, nombre, logger, cache=None):
+    """
+    Registros de un PDF con `extraer_registros`, o None si no se pudo procesar (el error
+    queda registrado y contado).
+    """
+    try:
+        return extraer_registros(fuente, logger, cache)
+    except Exception as e:
+        logger.info(f"Error al leer el PDF {nombre}: {e}")
+        METRICAS.incrementar("crawler_pdf_fallidos_total")
+        return None
+def guardar_dia(dia, extraidos, logger, compresion=None):
+    """
+    Guarda en un solo jsonlines (<dia>.json) los registros ya extraídos de los PDF de
+    provincias de un mismo boletín, con el PDF de origen de cada registro en el campo "Archivo".
+    Al guardarlo se borran los jsonlines por PDF de los PDF incluidos, que repetirían sus
+    registros en el Wrangler.
+
+    Args:
+        dia (str): Nombre del boletín del día (ver `dia_boletin`)
+        extraidos (iterable): Tuplas (nombre_pdf, registros) en el orden en que se escriben;
+            `registros` es None si el PDF no se pudo procesar
+        logger (Logger): Instancia del logger para registro de eventos
+        compresion (str, opcional): Compresión del jsonlines (ver `save_nested_to_jsonlines`)
+    Returns:
+        dict: Nombre de cada PDF -> número de registros, o None si no se pudo procesar
+    """
+    registros = []
+    resultados = {}
+    for nombre, lista in extraidos:
+        if lista is None:
+            resultados[nombre] = None
+            continue
+        registros += [{"Archivo": nombre, **registro} for registro in lista]
+        resultados[nombre] = len(lista)
+    if not save_nested_to_jsonlines(registros, dia, logger, compresion):
+        return dict.fromkeys(resultados)
+    METRICAS.incrementar("crawler_registros_escritos_total", len(registros))
+    for nombre, cantidad in resultados.items():
+        if cantidad is not None and nombre != dia:
+            borrar_jsonlines(join(DIRECTORIO_JSONLINES, f"{nombre}.json"))
+    return resultados
+def leer_dia(path, dia, nombres, logger, cache=None, compresion=None):
+    """
+    Procesa en serie los PDF de provincias de un mismo boletín y guarda todos sus registros
+    en un solo jsonlines (ver `guardar_dia`). Los días con decenas de PDF pequeños crean así
+    un archivo en lugar de uno por provincia.
+
+    Args:
+        path (str): Ruta del directorio donde se encuentran los PDF
+        dia (str): Nombre del boletín del día (ver `dia_boletin`)
+        nombres (list): PDF del día, en el orden en que se escriben sus registros
+        logger (Logger): Instancia del logger para registro de eventos
+        cache (TextCache, opcional): Caché de texto extraído
+        compresion (str, opcional): Compresión del jsonlines (ver `save_nested_to_jsonlines`)
+    Returns:
+        dict: Nombre de cada PDF -> número de registros, o None si no se pudo procesar
+    """
+    return guardar_dia(dia, ((nombre, extraer_o_none(join(path, nombre), nombre, logger, cache))
+                             for nombre in nombres), logger, compresion)
+# Logger de cada proceso trabajador del pool
+_logger_trabajador = None
+_cache_trabajador = None
+def _iniciar_trabajador(cola_logs, ruta_cache=None):
+    """Prepara el logger de un proceso trabajador para que envíe sus registros al proceso padre"""
+    global _logger_trabajador, _cache_trabajador
+    _logger_trabajador = Logger.launch_worker_logging("Practica12", cola_logs)
+    _cache_trabajador = TextCache(ruta_cache) if ruta_cache else None
+    METRICAS.reiniciar()  # No arrastrar las métricas que tuviera el padre al hacer fork
+def _instantanea_trabajador():
+    """Métricas acumuladas por el trabajador desde la tarea anterior, para sumarlas en el padre"""
+    instantanea = METRICAS.instantanea()
+    METRICAS.reiniciar()
+    return instantanea
+def _procesar_pdf(ruta, nombre, compresion=None):
+    """Tarea de un proceso trabajador: procesa un PDF y devuelve (nombre, registros, métricas)"""
+    registros = read_pdf(ruta, nombre, _logger_trabajador, _cache_trabajador, compresion)
+    return nombre, registros, _instantanea_trabajador()
+def _extraer_pdf(ruta, nombre):
+    """Tarea de un proceso trabajador: extrae sin guardarlos los registros de un PDF y devuelve (nombre, registros, métricas)"""
+    registros = extraer_o_none(join(ruta, nombre), nombre, _logger_trabajador, _cache_trabajador)
+    return nombre, registros, _instantanea_trabajador()
+def _extraer_contenido(nombre, contenido):
+    """Tarea de un proceso trabajador: extrae los registros de un PDF recibido en memoria"""
+    try:
+        registros = extraer_registros(contenido, _logger_trabajador, _cache_trabajador)
+    except Exception as e:
+        _logger_trabajador.info(f"Error al leer el PDF {nombre}: {e}")
+        registros = None
+    return nombre, registros, _instantanea_trabajador()
 # Función principal para ejecutar el proceso en todos los archivos PDF
-def run():
-    """Aqui se define el logger y se recojen todos los pdfs de la carpeta"""
+def run(trabajadores=None, usar_cache=True, forzar=False, por_dia=False, compresion=None):
+    """
+    Aqui se define el logger y se recojen todos los pdfs de la carpeta.
+
+    Los PDF se reparten entre un pool de procesos, ya que la extracción de texto de pypdf
+    ocupa la CPU y con un solo proceso el resto de núcleos quedan parados. Los trabajadores
+    envían sus registros de log al proceso padre a través de una cola.
+
+    Args:
+        trabajadores (int, opcional): Número de procesos. Por defecto uno por núcleo;
+            con 1 se procesa todo en serie en el proceso actual.
+        usar_cache (bool, opcional): Reutiliza el texto ya extraído de cada PDF (ver
+            `utils.Cache.TextCache`), de forma que tras cambiar una regla de parseo solo se
+            repite el parseo y no la decodificación de los PDF.
+        forzar (bool, opcional): Procesa todos los PDF aunque el registro de estado
+            (`utils.Estado.StateLedger`) indique que su jsonlines ya está al día.
+        por_dia (bool, opcional): Escribe un jsonlines por día (ver `guardar_dia`) en lugar
+            de uno por PDF. Cada PDF se sigue extrayendo en un trabajador; el proceso padre
+            reúne los registros del día y los escribe de una vez.
+        compresion (str, opcional): Comprime los jsonlines con "gzip" o "zstd". Los PDF
+            cuyo jsonlines está en otra compresión, o a medias, se vuelven a procesar.
+    Returns:
+        list: Tuplas (nombre_pdf, registros) de los PDF procesados, en el mismo orden en que
+        se listan. `registros` es None si el PDF no se pudo procesar.
+    Raises:
+        ValueError: Si la compresión no está soportada
+        ImportError: Si se pide zstd y zstandard no está instalado
+    """
+    comprobar_compresion(compresion)
     dir="../data/logs/Crawlerlogs"
     logger_instance=Logger("Practica12",dir)
-    logger=logger_instance.launch_logging()
+    logger=logger_instance.launch_logging(queued=True)
+    METRICAS.reiniciar()
+    inicio = time.perf_counter()
     ruta = "../data/outputs/PDF"
-    archivos = os.listdir(ruta)
-    for i in archivos:
-        if i.endswith(".pdf") and not i.endswith("99.pdf"):  # Asegurarse de que sea un archivo PDF
-            read_pdf(ruta, i,logger)
+    archivos = [i for i in sorted(os.listdir(ruta))
+                if i.endswith(".pdf") and not i.endswith("99.pdf")]  # Asegurarse de que sea un archivo PDF
+    # Solo se procesan los PDF nuevos, modificados o generados con otra versión del Crawler
+    estado = StateLedger(RUTA_ESTADO)
+    salida = lambda nombre: ruta_comprimida(
+        join(DIRECTORIO_JSONLINES, f"{dia_boletin(nombre) if por_dia else nombre}.json"), compresion)
+    pendientes = [i for i in archivos
+                  if forzar or not (estado.al_dia("crawler", i, join(ruta, i), VERSION_CRAWLER, salida(i))
+                                    and completo(salida(i)))]
+    if por_dia:
+        # El jsonlines de un día se reescribe entero, así que se repiten todos sus PDF
+        dias_pendientes = {dia_boletin(i) for i in pendientes}
+        pendientes = [i for i in archivos if dia_boletin(i) in dias_pendientes]
+    if len(pendientes) < len(archivos):
+        logger.info(f"{len(archivos) - len(pendientes)} PDF ya procesados con la versión {VERSION_CRAWLER}, se omiten")
+    archivos = pendientes
+    trabajadores = trabajadores or os.cpu_count() or 1
+    cache = TextCache(RUTA_CACHE) if usar_cache else None
+    resultados = []
+    if por_dia:
+        # Los PDF se extraen en los trabajadores, pero cada día se escribe una sola vez, aquí,
+        # cuando han llegado todos sus PDF (pool.map los devuelve en orden)
+        pdf_por_dia = Counter(dia_boletin(i) for i in archivos)
+        extraidos = {}
+        def recoger(nombre, registros):
+            dia = dia_boletin(nombre)
+            extraidos.setdefault(dia, []).append((nombre, registros))
+            if len(extraidos[dia]) == pdf_por_dia[dia]:
+                resultados.extend(guardar_dia(dia, extraidos.pop(dia), logger, compresion).items())
+        tarea, argumentos = _extraer_pdf, (archivos,)
+        en_serie = lambda nombre: (nombre, extraer_o_none(join(ruta, nombre), nombre, logger, cache))
+    else:
+        recoger = lambda nombre, registros: resultados.append((nombre, registros))
+        tarea, argumentos = _procesar_pdf, (archivos, [compresion] * len(archivos))
+        en_serie = lambda nombre: (nombre, read_pdf(ruta, nombre, logger, cache, compresion))
+    if trabajadores == 1 or len(archivos) <= 1:
+        for nombre in archivos:
+            recoger(*en_serie(nombre))
+    else:
+        with multiprocessing.Manager() as gestor:
+            cola_logs = gestor.Queue()
+            listener = logger_instance.launch_queue_listener(cola_logs)
+            try:
+                with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_trabajador,
+                                         initargs=(cola_logs, RUTA_CACHE if usar_cache else None)) as pool:
+                    for nombre, registros, instantanea in pool.map(tarea, [ruta] * len(archivos), *argumentos):
+                        METRICAS.fusionar(instantanea)
+                        recoger(nombre, registros)
+            finally:
+                listener.stop()
+    if not por_dia:
+        # Los jsonlines por día de los boletines que se acaban de escribir por PDF repetirían sus registros
+        for dia in {dia_boletin(nombre) for nombre, registros in resultados
+                    if registros is not None and dia_boletin(nombre) != nombre}:
+            borrar_jsonlines(join(DIRECTORIO_JSONLINES, f"{dia}.json"))
+    if cache is not None:
+        cache.recortar()
+    for nombre, registros in resultados:
+        if registros is not None:
+            estado.registrar("crawler", nombre, join(ruta, nombre), salida(nombre), VERSION_CRAWLER)
+    estado.guardar()
+    fallidos = sum(1 for _, registros in resultados if registros is None)
+    if fallidos:
+        logger.info(f"{fallidos} de {len(resultados)} PDF no se pudieron procesar")
+    duracion = time.perf_counter() - inicio
+    METRICAS.observar("etapa_segundos", duracion, etapa="Crawler")
+    METRICAS.fijar("crawler_paginas_por_segundo", METRICAS.total("crawler_paginas_total") / duracion if duracion else 0)
+    logger.info(f"Métricas guardadas en {METRICAS.volcar('Crawler')}")
     logger.info("Proceso completado con éxito")
+    logger_instance.stop_logging()
+    return resultados
 if __name__ == "__main__":
     run()
@@ -1,55 +1,450 @@
 #!/usr/bin/env python
-# -*- coding: utf-8 
+# -*- coding: utf-8
 """
 Script para descargar archivos PDF del BORME a partir de una lista de enlaces.
 """
 import requests
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from os import makedirs
 from os.path import exists
 from utils.Loger import Logger
-def download_pdf(url, output_path,logger):
-     """
+from utils.Manifest import FetchManifest
+from utils.Enlaces import LinkIndex, RUTA_INDICE
+from utils.Reintentos import Reintentos, ESTADOS_REINTENTABLES, segundos_retry_after
+from utils.Metricas import METRICAS
+RUTA_ENLACES = "../data/outputs/links.txt"
+DIRECTORIO_PDF = "../data/outputs/PDF"
+TAM_BLOQUE = 64 * 1024
+RUTA_MANIFIESTO = "../data/outputs/fetch_manifest.json"
+INTERVALO_PROGRESO = 50  # Cada cuántos archivos se registra el progreso de la descarga
+class LimitadorPorHost:
+    """
+    Limita el número de peticiones por segundo que se lanzan contra cada host,
+    repartiendo turnos entre los hilos de descarga para que boe.es no nos corte.
+    """
+    def __init__(self, peticiones_por_segundo):
+        '''
+        Args:
+            peticiones_por_segundo (float): Máximo de peticiones por segundo y host.
+                Si es None o 0 no se aplica ningún límite.
+        '''
+        self.intervalo = 1.0 / peticiones_por_segundo if peticiones_por_segundo else 0.0
+        self._siguiente_turno = {}
+        self._lock = threading.Lock()
+    def esperar(self, host):
+        '''
+        Bloquea el hilo actual hasta que le toque turno para lanzar una petición al host.
+        '''
+        if not self.intervalo:
+            return
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente_turno.get(host, ahora))
+            self._siguiente_turno[host] = turno + self.intervalo
+        espera = turno - ahora
+        if espera > 0:
+            time.sleep(espera)
+class SesionesPorHost:
+    """
+    Mantiene una `requests.Session` con conexiones keep-alive por cada host, de forma
+    que todas las descargas contra el mismo servidor reutilizan el pool de conexiones.
+    """
+    def __init__(self, tam_pool=8):
+        '''
+        Args:
+            tam_pool (int): Número máximo de conexiones abiertas por host.
+        '''
+        self.tam_pool = tam_pool
+        self._sesiones = {}
+        self._lock = threading.Lock()
+    def obtener(self, url):
+        '''
+        Devuelve la sesión asociada al host de la URL, creándola si no existe.
+        '''
+        host = urlparse(url).netloc
+        with self._lock:
+            sesion = self._sesiones.get(host)
+            if sesion is None:
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.tam_pool)
+                sesion.mount("http://", adaptador)
+                sesion.mount("https://", adaptador)
+                self._sesiones[host] = sesion
+            return sesion
+    def cerrar(self):
+        '''
+        Cierra todas las sesiones abiertas y libera sus conexiones.
+        '''
+        with self._lock:
+            for sesion in self._sesiones.values():
+                sesion.close()
+            self._sesiones.clear()
+def _tamano_esperado(response, inicio):
+    """
+    Calcula el tamaño final que debe tener el archivo a partir de las cabeceras de la respuesta.
+
+    Args:
+        response (requests.Response): Respuesta de la petición de descarga.
+        inicio (int): Byte desde el que se está descargando (0 si es una descarga completa).
+
+    Returns:
+        int | None: Tamaño total esperado en bytes, o None si el servidor no lo indica o el
+        contenido viene comprimido y no se puede comparar con lo escrito en disco.
+    """
+    if response.status_code == 206:
+        rango = response.headers.get("Content-Range", "")
+        total = rango.rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else None
+    if response.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    longitud = response.headers.get("Content-Length")
+    return inicio + int(longitud) if longitud and longitud.isdigit() else None
+def _intento_descarga(url, output_path, logger, cliente, timeout, manifiesto=None, timeouts=None):
+    """
+    Un intento de descarga de `download_pdf`, sin reintentos.
+
+    Args:
+        url (str): URL del archivo PDF a descargar.
+        output_path (str): Ruta donde se guardará el archivo PDF descargado.
+        logger (logging.Logger): Objeto de registro del proceso.
+        cliente (requests.Session | module): Sesión o módulo `requests` con el que pedirlo.
+        timeout (float | tuple): Timeout de la petición, o (conexión, lectura).
+        manifiesto (FetchManifest, opcional): Manifiesto donde consultar y registrar la descarga.
+        timeouts (TimeoutAdaptativo, opcional): Donde registrar la latencia de la respuesta.
+
+    Returns:
+        bool: True si el archivo queda guardado (o el servidor responde 304), False si queda
+        incompleto (el `.part` se conserva para reanudarlo).
+
+    Raises:
+        requests.exceptions.RequestException: Si la petición falla o el servidor responde
+        con un estado de error.
+        OSError: Si no se puede escribir el archivo.
+    """
+    ruta_parcial = output_path + ".part"
+    comienzo = time.perf_counter()
+    inicio = os.path.getsize(ruta_parcial) if exists(ruta_parcial) else 0
+    cabeceras = {"Range": f"bytes={inicio}-"} if inicio else {}
+    if manifiesto is not None and not inicio and exists(output_path):
+        cabeceras.update(manifiesto.cabeceras_condicionales(url))
+    response = cliente.get(url, timeout=timeout, stream=True, headers=cabeceras)
+    if timeouts is not None:
+        timeouts.observar(urlparse(url).netloc, response.elapsed.total_seconds())
+    if response.status_code == 304:
+        response.close()
+        METRICAS.incrementar("fetcher_descargas_total", resultado="no_modificado")
+        return True
+    if response.status_code == 416:
+        # El parcial no encaja con el archivo del servidor, se descarga de nuevo entero
+        response.close()
+        os.remove(ruta_parcial)
+        inicio = 0
+        response = cliente.get(url, timeout=timeout, stream=True)
+    with response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            inicio = 0  # El servidor ignora el Range y devuelve el archivo completo
+        esperado = _tamano_esperado(response, inicio)
+        huella = hashlib.sha256()
+        if inicio:
+            with open(ruta_parcial, "rb") as file:
+                for bloque in iter(lambda: file.read(TAM_BLOQUE), b""):
+                    huella.update(bloque)
+        with open(ruta_parcial, "ab" if inicio else "wb") as file:
+            for bloque in response.iter_content(chunk_size=TAM_BLOQUE):
+                file.write(bloque)
+                huella.update(bloque)
+    descargado = os.path.getsize(ruta_parcial)
+    METRICAS.incrementar("fetcher_bytes_total", descargado - inicio)
+    if esperado is not None and descargado != esperado:
+        logger.info(f"Descarga incompleta de {url}: {descargado} de {esperado} bytes")
+        METRICAS.incrementar("fetcher_descargas_total", resultado="incompleta")
+        return False
+    os.replace(ruta_parcial, output_path)
+    METRICAS.observar("fetcher_descarga_segundos", time.perf_counter() - comienzo)
+    METRICAS.incrementar("fetcher_descargas_total", resultado="ok")
+    if manifiesto is not None:
+        manifiesto.registrar(url, output_path, response.headers.get("ETag"),
+                             response.headers.get("Last-Modified"), huella.hexdigest())
+    return True
+def download_pdf(url, output_path,logger,session=None,timeout=30,manifiesto=None,reintentos=None,
+                 limitador=None, esperar_circuito=False):
+    """
     Descarga un archivo PDF desde una URL y lo guarda en una ruta especificada.
 
+    La respuesta se escribe por bloques en un archivo temporal `<output_path>.part` que solo
+    se renombra al destino final, de forma atómica, cuando el tamaño coincide con el
+    Content-Length anunciado. Si existe un `.part` de una descarga interrumpida se pide al
+    servidor el resto del archivo con una cabecera Range en lugar de empezar de cero.
+
+    Con un manifiesto se envían cabeceras condicionales (ETag / Last-Modified) cuando el
+    archivo ya existe, y al terminar se registran sus metadatos y su sha256.
+
+    Con `reintentos` los fallos pasajeros (errores de conexión, timeouts, descargas
+    incompletas y respuestas 408, 429 y 5xx) se repiten con backoff exponencial y jitter,
+    respetando Retry-After, y cada reintento continúa el `.part` del anterior. Los timeouts
+    de conexión y lectura se ajustan a la latencia del host, y si su cortacircuitos está
+    abierto (o se abre con el fallo) la URL no se sigue pidiendo. Las URLs que agotan los
+    intentos o se quedan sin pedir por el cortacircuitos pasan a la cola de fallidos de
+    `reintentos`.
+
     Args:
         url (str): URL del archivo PDF a descargar.
         output_path (str): Ruta donde se guardará el archivo PDF descargado.
         logger (logging.Logger): Objeto de registro para registrar información sobre errores.
+        session (requests.Session, opcional): Sesión con la que reutilizar conexiones. Si no
+            se indica se usa una petición suelta de `requests`.
+        timeout (float, opcional): Tiempo máximo de espera de la petición en segundos. Con
+            `reintentos` se usan sus timeouts adaptativos.
+        manifiesto (FetchManifest, opcional): Manifiesto donde consultar y registrar la descarga.
+        reintentos (utils.Reintentos.Reintentos, opcional): Política de reintentos,
+            cortacircuitos y timeouts por host. Sin ella se hace un solo intento.
+        limitador (LimitadorPorHost, opcional): Limitador que se respeta antes de cada intento.
+        esperar_circuito (bool, opcional): Si el cortacircuitos del host está abierto, espera
+            a que se pueda probar de nuevo (como mucho tres enfriamientos, ver
+            `Reintentos.turno`) en lugar de dejar la URL en la cola de fallidos.
 
     Returns:
-        bool: 
-            - `True` si el archivo se descarga y guarda correctamente.
-            - `False` si ocurre un error durante el proceso de descarga.
+        bool:
+            - `True` si el archivo se descarga y guarda correctamente, o si el servidor
+              responde 304 porque la copia local sigue vigente.
+            - `False` si ocurre un error durante el proceso de descarga o el archivo queda
+              incompleto (el `.part` se conserva para reanudarlo).
 
     Raises:
-        requests.exceptions.RequestException: Si ocurre un error durante la solicitud HTTP 
+        requests.exceptions.RequestException: Si ocurre un error durante la solicitud HTTP
         y no es manejado internamente.
     """
+    url = url.strip()
+    host = urlparse(url).netloc
+    cliente = session if session is not None else requests
+    intentos = reintentos.politica.intentos if reintentos is not None else 1
     try:
-        response = requests.get(url.strip(), timeout=30)
-        response.raise_for_status()
-        with open(output_path, "wb") as file:
-            file.write(response.content)
-        return True
+        for intento in range(intentos):
+            if reintentos is not None and not reintentos.turno(host, esperar_circuito):
+                METRICAS.log_muestreado(logger, "fetcher_circuito_abierto_total",
+                                        f"Cortacircuitos abierto para {host}, {url} se reintentará al final")
+                reintentos.fallida(url)
+                return False
+            if limitador is not None:
+                limitador.esperar(host)
+            retry_after = None
+            try:
+                if _intento_descarga(url, output_path, logger, cliente,
+                                     reintentos.timeouts.timeout(host) if reintentos is not None else timeout,
+                                     manifiesto, reintentos.timeouts if reintentos is not None else None):
+                    if reintentos is not None:
+                        reintentos.circuito.exito(host)
+                    return True
+                motivo = "incompleta"
+            except requests.exceptions.HTTPError as e:
+                estado = e.response.status_code if e.response is not None else None
+                logger.info(f"Error descargando {url}: {str(e)}")
+                METRICAS.incrementar("fetcher_descargas_total", resultado="error")
+                if estado not in ESTADOS_REINTENTABLES:
+                    # El servidor responde, así que el host está bien aunque el archivo no
+                    if reintentos is not None:
+                        reintentos.circuito.exito(host)
+                    return False
+                retry_after = segundos_retry_after(e.response.headers.get("Retry-After"))
+                motivo = str(estado)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                logger.info(f"Error descargando {url}: {str(e)}")
+                METRICAS.incrementar("fetcher_descargas_total", resultado="error")
+                if reintentos is not None and isinstance(e, requests.exceptions.Timeout):
+                    reintentos.timeouts.agotado(host)
+                motivo = type(e).__name__
+            except (requests.exceptions.RequestException, OSError) as e:
+                logger.info(f"Error descargando {url}: {str(e)}")
+                METRICAS.incrementar("fetcher_descargas_total", resultado="error")
+                return False
+            if reintentos is None:
+                return False
+            if reintentos.circuito.fallo(host):
+                logger.info(f"Cortacircuitos abierto para {host} durante {reintentos.circuito.enfriamiento:g} s")
+            if intento + 1 == intentos or reintentos.circuito.abierto(host):
+                break
+            METRICAS.incrementar("fetcher_reintentos_total", motivo=motivo)
+            time.sleep(reintentos.politica.espera(intento, retry_after))
+        logger.info(f"{url} sigue fallando, se reintentará al final")
+        reintentos.fallida(url)
+        return False
+    finally:
+        if reintentos is not None:
+            # Una prueba del circuito semiabierto que acaba sin éxito ni fallo no puede quedar pendiente
+            reintentos.circuito.liberar(host)
+def descargar_contenido(url, logger, session=None, timeout=30):
+    """
+    Descarga un PDF en memoria, sin escribirlo en disco. Lo usa el modo pipeline cuando
+    no se guardan archivos intermedios.
+
+    Args:
+        url (str): URL del archivo PDF a descargar.
+        logger (logging.Logger): Objeto de registro para registrar información sobre errores.
+        session (requests.Session, opcional): Sesión con la que reutilizar conexiones.
+        timeout (float, opcional): Tiempo máximo de espera de la petición en segundos.
+
+    Returns:
+        bytes | None: Contenido del PDF, o None si la descarga falla o queda incompleta.
+    """
+    url = url.strip()
+    comienzo = time.perf_counter()
+    try:
+        cliente = session if session is not None else requests
+        with cliente.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            esperado = _tamano_esperado(response, 0)
+            contenido = b"".join(response.iter_content(chunk_size=TAM_BLOQUE))
+        METRICAS.incrementar("fetcher_bytes_total", len(contenido))
+        if esperado is not None and len(contenido) != esperado:
+            logger.info(f"Descarga incompleta de {url}: {len(contenido)} de {esperado} bytes")
+            METRICAS.incrementar("fetcher_descargas_total", resultado="incompleta")
+            return None
+        METRICAS.observar("fetcher_descarga_segundos", time.perf_counter() - comienzo)
+        METRICAS.incrementar("fetcher_descargas_total", resultado="ok")
+        return contenido
     except requests.exceptions.RequestException as e:
         logger.info(f"Error descargando {url}: {str(e)}")
-        return False
-def execute():
-      """
+        METRICAS.incrementar("fetcher_descargas_total", resultado="error")
+        return None
+def descargar_enlaces(enlaces, output_dir, logger, concurrencia=8, peticiones_por_segundo=5.0,
+                      manifiesto=None, revalidar=False, indice=None, reintentos=None):
+    """
+    Descarga en paralelo una lista de enlaces con un pool acotado de hilos.
+
+    Cada host comparte una única sesión keep-alive y las peticiones contra él se
+    espacian según `peticiones_por_segundo`. Con un manifiesto, los archivos que ya están
+    en disco y coinciden con lo registrado no se vuelven a pedir.
+
+    Los fallos pasajeros se reintentan según `reintentos` (ver `download_pdf`) y las URLs
+    que terminan en la cola de fallidos se vuelven a pedir una vez al final, en serie por
+    host y esperando a que su cortacircuitos deje probar de nuevo. Si la prueba falla, el
+    resto de URLs de ese host se dan por perdidas en esta ejecución.
+
+    Args:
+        enlaces (list): URLs de los PDF a descargar.
+        output_dir (str): Directorio donde se guardan los PDF.
+        logger (logging.Logger): Objeto de registro del proceso.
+        concurrencia (int, opcional): Número de descargas simultáneas.
+        peticiones_por_segundo (float, opcional): Límite de peticiones por segundo y host.
+            None o 0 desactiva el límite.
+        manifiesto (FetchManifest, opcional): Manifiesto de descargas previas.
+        revalidar (bool, opcional): Si es True los archivos verificados no se saltan, sino
+            que se piden con cabeceras condicionales por si han cambiado en el servidor.
+        indice (LinkIndex, opcional): Índice de enlaces donde se marcan como descargados los
+            archivos bajados y los que el manifiesto da por buenos.
+        reintentos (utils.Reintentos.Reintentos, opcional): Política de reintentos,
+            cortacircuitos y timeouts compartidos por las descargas. Por defecto
+            `Reintentos()`.
+
+    Returns:
+        int: Número de archivos descargados (o revalidados) correctamente.
+    """
+    # Se eliminan duplicados para que dos hilos no escriban a la vez el mismo archivo
+    enlaces = list(dict.fromkeys(url.strip() for url in enlaces if url.strip()))
+    if manifiesto is not None and not revalidar:
+        pendientes = [url for url in enlaces
+                      if not manifiesto.verificado(url, os.path.join(output_dir, os.path.basename(url)))]
+        if len(pendientes) < len(enlaces):
+            logger.info(f"{len(enlaces) - len(pendientes)} archivos ya verificados, se omiten")
+            if indice is not None:
+                indice.marcar_descargados(set(enlaces) - set(pendientes))
+        enlaces = pendientes
+    total = len(enlaces)
+    sesiones = SesionesPorHost(tam_pool=concurrencia)
+    limitador = LimitadorPorHost(peticiones_por_segundo)
+    reintentos = reintentos if reintentos is not None else Reintentos()
+    def tarea(url, esperar_circuito=False):
+        nombre_archivo = os.path.basename(url)
+        ruta_salida = os.path.join(output_dir, nombre_archivo)
+        return url, nombre_archivo, download_pdf(url, ruta_salida, logger, session=sesiones.obtener(url),
+                                                 manifiesto=manifiesto, reintentos=reintentos,
+                                                 limitador=limitador, esperar_circuito=esperar_circuito)
+    descargados = 0
+    bajados = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as pool:
+            futuros = [pool.submit(tarea, url) for url in enlaces]
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                url, nombre_archivo, ok = futuro.result()
+                if ok:
+                    descargados += 1
+                    bajados.append(url)
+                # Progreso cada INTERVALO_PROGRESO archivos en lugar de una línea por archivo
+                if i % INTERVALO_PROGRESO == 0 or i == total:
+                    logger.info(f"Descargados {descargados} de {i} archivos procesados ({i}/{total}), último {nombre_archivo}")
+            # Cola de fallidos: una segunda vuelta al final, cuando el servidor ha tenido tiempo de recuperarse
+            fallidos = reintentos.extraer_fallidos()
+            if fallidos:
+                logger.info(f"Reintentando al final {len(fallidos)} archivos fallidos")
+                por_host = {}
+                for url in fallidos:
+                    por_host.setdefault(urlparse(url).netloc, []).append(url)
+                def repetir(urls):
+                    recuperados = []
+                    for posicion, url in enumerate(urls):
+                        if tarea(url, esperar_circuito=True)[2]:
+                            recuperados.append(url)
+                        elif reintentos.circuito.abierto(urlparse(url).netloc):
+                            # El host sigue caído: no se insiste con el resto de sus URLs
+                            for resto in urls[posicion + 1:]:
+                                reintentos.fallida(resto)
+                            break
+                    return recuperados
+                for recuperados in pool.map(repetir, por_host.values()):
+                    descargados += len(recuperados)
+                    bajados.extend(recuperados)
+                perdidos = reintentos.extraer_fallidos()
+                METRICAS.incrementar("fetcher_fallidos_total", len(perdidos))
+                if perdidos:
+                    logger.info(f"{len(perdidos)} archivos no se han podido descargar: {', '.join(perdidos)}")
+    finally:
+        sesiones.cerrar()
+        if manifiesto is not None:
+            manifiesto.guardar()
+        if indice is not None:
+            indice.marcar_descargados(bajados)
+    return descargados
+def execute(concurrencia=8, peticiones_por_segundo=5.0, ruta_enlaces=RUTA_ENLACES, output_dir=DIRECTORIO_PDF,
+            ruta_manifiesto=RUTA_MANIFIESTO, revalidar=False, ruta_indice=RUTA_INDICE, desde=None, hasta=None):
+    """
     Ejecuta el proceso de descarga de archivos PDF desde una lista de enlaces y registra el progreso.
     Args:
-        No recibe argumentos directamente, pero espera que los siguientes elementos estén 
-        disponibles en las rutas definidas:
-        - `../data/outputs/links.txt`: Archivo de texto que contiene las URLs a descargar.
-        - `../data/outputs/PDF`: Directorio donde se guardarán los archivos descargados.
-        - `../data/logs/Fetcherlogs`: Directorio donde se almacenarán los registros del proceso.
+        concurrencia (int, opcional): Número de descargas simultáneas. Con 1 se descarga en serie.
+        peticiones_por_segundo (float, opcional): Límite de peticiones por segundo contra cada host.
+        ruta_enlaces (str, opcional): Archivo de texto que contiene las URLs a descargar.
+            Por defecto `../data/outputs/links.txt`.
+        output_dir (str, opcional): Directorio donde se guardarán los archivos descargados.
+            Por defecto `../data/outputs/PDF`.
+        ruta_manifiesto (str, opcional): Manifiesto de descargas con el que saltar los PDF que
+            ya se bajaron en ejecuciones anteriores. Por defecto `../data/outputs/fetch_manifest.json`.
+            Con None se descarga todo de nuevo.
+        revalidar (bool, opcional): Pide los PDF ya descargados con cabeceras condicionales en
+            lugar de saltarlos.
+        ruta_indice (str, opcional): Índice de enlaces del Spyder (`utils.Enlaces.LinkIndex`).
+            Se le añaden los enlaces de `ruta_enlaces`, si existe, y se descargan solo los
+            que aún no constan como descargados o cuyo PDF falta en `output_dir`. Con None se descargan todos los enlaces
+            de `ruta_enlaces`, como antes de existir el índice.
+        desde (str, opcional): Con índice, fecha mínima de boletín (aaaa-mm-dd) a descargar.
+        hasta (str, opcional): Con índice, fecha máxima de boletín (aaaa-mm-dd) a descargar.
 
     Logs:
         - Registra el inicio y finalización del proceso de descarga.
-        - Registra cada archivo descargado con su progreso.
-        - Informa si el archivo de enlaces no se encuentra, si hay errores de E/S o cualquier 
+        - Registra el progreso cada `INTERVALO_PROGRESO` archivos.
+        - Informa si el archivo de enlaces no se encuentra, si hay errores de E/S o cualquier
           otro error inesperado.
+        Los registros se guardan en `../data/logs/Fetcherlogs`.
+
+    Métricas:
+        - Bytes descargados, latencia de cada descarga y descargas por resultado, en
+          `../data/metrics/Fetcher.json` y `../data/metrics/Fetcher.prom`.
 
     Exceptions:
         - Captura y maneja `FileNotFoundError` si el archivo de enlaces no se encuentra.
@@ -59,25 +454,37 @@ def execute():
     dir="../data/logs/Fetcherlogs"
     logger_instance=Logger("Practica12",dir)
     logger=logger_instance.launch_logging()
+    METRICAS.reiniciar()
     try:
         # Crear directorio de salida si no existe
-        output_dir = "../data/outputs/PDF"
         if not exists(output_dir):
             makedirs(output_dir)
-        # Leer y procesar enlaces
-        with open("../data/outputs/links.txt", "r", encoding="utf-8") as archivo:
-            enlaces = archivo.readlines()
-            total = len(enlaces)
-            logger.info(f"Iniciando descarga de {total} archivos")
-            for i, url in enumerate(enlaces, 1):
-                url = url.strip()
-                if not url:
-                    continue
-                nombre_archivo = os.path.basename(url)
-                ruta_salida = os.path.join(output_dir, nombre_archivo)
-                if download_pdf(url, ruta_salida,logger):
-                    logger.info(f"Descargado {nombre_archivo} ({i}/{total})")
-        logger.info("Proceso de descarga completado")
+        indice = LinkIndex(ruta_indice) if ruta_indice else None
+        try:
+            # Leer y procesar enlaces
+            if indice is None:
+                with open(ruta_enlaces, "r", encoding="utf-8") as archivo:
+                    enlaces = archivo.readlines()
+            else:
+                if exists(ruta_enlaces):
+                    nuevos = indice.importar(ruta_enlaces)
+                    if nuevos:
+                        logger.info(f"{nuevos} enlaces de {ruta_enlaces} añadidos al índice")
+                # Pendientes son los no descargados y los descargados cuyo PDF ya no está; al
+                # revalidar se vuelven a pedir todos
+                enlaces = [enlace["url"] for enlace in indice.entre(desde, hasta)
+                           if revalidar or not enlace["descargado"]
+                           or not exists(os.path.join(output_dir, enlace["archivo"]))]
+            logger.info(f"Iniciando descarga de {len(enlaces)} archivos")
+            manifiesto = FetchManifest(ruta_manifiesto) if ruta_manifiesto else None
+            with METRICAS.cronometro("etapa_segundos", etapa="Fetcher"):
+                descargar_enlaces(enlaces, output_dir, logger, concurrencia, peticiones_por_segundo,
+                                  manifiesto=manifiesto, revalidar=revalidar, indice=indice)
+        finally:
+            if indice is not None:
+                indice.cerrar()
+        logger.info(f"Proceso de descarga completado: {METRICAS.total('fetcher_bytes_total')} bytes descargados")
+        logger.info(f"Métricas guardadas en {METRICAS.volcar('Fetcher')}")
     except FileNotFoundError:
         logger.info("El archivo de enlaces no se encuentra.")
     except IOError:
@@ -85,4 +492,4 @@ def execute():
     except Exception as e:
         logger.info(f"Error inesperado: {str(e)}")
 if __name__ == "__main__":
-    execute()
\ No newline at end of file
+    execute()
@@ -2,17 +2,27 @@ import sys
 from Spyder import procesar_borme as execute_spider
 from Fetcher import execute as execute_fetcher
 from Crawler import run as execute_crawler
-from Wrangler import run as execute_wrangler
+from Wrangler import run as execute_wrangler, consultar as execute_query
+from Pipeline import run as execute_pipeline
 if __name__ == "__main__":
  arguments = sys.argv
  if "SPIDER" in arguments:
- 	execute_spider(arguments[-1])
+ 	execute_spider(arguments[-1], backend="http" if "HTTP" in arguments else "selenium")
  if "FETCHER" in arguments:
   	execute_fetcher()
  if "CRAWLER" in arguments:
- 	execute_crawler()
+ 	compresiones = [compresion for compresion in ("GZIP", "ZSTD") if compresion in arguments]
+ 	execute_crawler(forzar="FORZAR" in arguments, por_dia="DIARIO" in arguments,
+ 	                compresion=compresiones[0].lower() if compresiones else None)
  if "WRANGLER" in arguments:
- 	execute_wrangler()
+ 	formatos = [formato for formato in ("PARQUET", "ARROW", "SQLITE") if formato in arguments]
+ 	execute_wrangler(formato=formatos[0].lower() if formatos else "csv", forzar="FORZAR" in arguments,
+ 	                 trabajadores=None if "PARALELO" in arguments else 1)
+ if "PIPELINE" in arguments:
+ 	execute_pipeline(arguments[-1], guardar_intermedios="INTERMEDIOS" in arguments)
+ if "QUERY" in arguments:
+ 	indice = arguments.index("QUERY")
+ 	execute_query(*arguments[indice + 1:])
 
 
 
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Modo pipeline: ejecuta Spyder, Fetcher, Crawler y Wrangler a la vez, unidos por colas acotadas.
+Los enlaces descubiertos pasan al Fetcher, cada PDF descargado pasa al Crawler en cuanto llega
+y sus registros van directos al Wrangler, sin esperar a que termine la etapa anterior.
+"""
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from os.path import join
+from urllib.parse import urlparse
+from utils.Loger import Logger
+from utils.Metricas import METRICAS
+from utils.Estado import StateLedger, RUTA_ESTADO
+from utils.Manifest import FetchManifest
+from utils.Enlaces import LinkIndex, RUTA_INDICE
+from utils.Jsonlines import borrar_jsonlines, completo
+from Spyder import leer_fechas, _fecha_o_none
+from Sumario import descargar_sumario
+from Fetcher import SesionesPorHost, LimitadorPorHost, descargar_contenido, download_pdf, DIRECTORIO_PDF, RUTA_MANIFIESTO
+from Crawler import (save_nested_to_jsonlines, dia_boletin, _iniciar_trabajador, _extraer_contenido, RUTA_CACHE,
+                     DIRECTORIO_JSONLINES, VERSION_CRAWLER)
+from Wrangler import limpiar_datos, list_to_csv, VERSION_WRANGLER
+FIN = None  # Marca de fin de cada cola
+def etapa_descubrimiento(fechas, enlaces, descargadores, logger, limitador, sesion, descubiertos=None):
+    """
+    Pide el sumario de cada fecha y pasa sus enlaces, sin duplicados, a la cola del Fetcher.
+
+    Args:
+        fechas (list): Fechas a procesar.
+        enlaces (queue.Queue): Cola de salida de URLs.
+        descargadores (int): Número de hilos descargadores, que reciben cada uno una marca de fin.
+        logger (logging.Logger): Objeto de registro del proceso.
+        limitador (LimitadorPorHost): Limitador de peticiones a boe.es.
+        sesion (requests.Session): Sesión keep-alive con boe.es.
+        descubiertos (list, opcional): Lista donde se añaden tuplas (fecha, enlaces) para
+            registrarlas después en el índice de enlaces.
+    """
+    vistos = set()
+    try:
+        for fecha in fechas:
+            enlaces_fecha = descargar_sumario(fecha, logger, sesion, limitador)
+            if descubiertos is not None:
+                descubiertos.append((fecha, enlaces_fecha))
+            for enlace in enlaces_fecha:
+                if enlace not in vistos:
+                    vistos.add(enlace)
+                    enlaces.put(enlace)
+    finally:
+        for _ in range(descargadores):
+            enlaces.put(FIN)
+def etapa_descarga(enlaces, pdfs, logger, limitador, sesiones, guardar_intermedios, manifiesto=None, bajados=None):
+    """
+    Hilo descargador: toma URLs de la cola, descarga el PDF en memoria y lo pasa al Crawler.
+
+    Con `guardar_intermedios` el PDF se descarga como en el Fetcher (`download_pdf`, con su
+    `.part` y el manifiesto) en data/outputs/PDF, y si el manifiesto ya lo da por bueno no se
+    vuelve a pedir.
+
+    Args:
+        enlaces (queue.Queue): Cola de entrada de URLs.
+        pdfs (queue.Queue): Cola de salida de tuplas (nombre_pdf, contenido).
+        logger (logging.Logger): Objeto de registro del proceso.
+        limitador (LimitadorPorHost): Limitador de peticiones por host.
+        sesiones (SesionesPorHost): Sesiones keep-alive por host.
+        guardar_intermedios (bool): Si es True el PDF también se guarda en data/outputs/PDF.
+        manifiesto (FetchManifest, opcional): Manifiesto de descargas del Fetcher.
+        bajados (list, opcional): Lista donde se añaden las URLs de los PDF guardados.
+    """
+    while True:
+        url = enlaces.get()
+        if url is FIN:
+            return
+        nombre = os.path.basename(url)
+        if nombre.endswith("99.pdf"):
+            continue  # Índice alfabético, el Crawler tampoco lo procesa
+        if guardar_intermedios:
+            ruta = join(DIRECTORIO_PDF, nombre)
+            if not (manifiesto is not None and manifiesto.verificado(url, ruta)) and not download_pdf(
+                    url, ruta, logger, session=sesiones.obtener(url), manifiesto=manifiesto, limitador=limitador):
+                continue
+            with open(ruta, "rb") as archivo:
+                contenido = archivo.read()
+            if bajados is not None:
+                bajados.append(url)
+        else:
+            limitador.esperar(urlparse(url).netloc)
+            contenido = descargar_contenido(url, logger, sesiones.obtener(url))
+            if contenido is None:
+                continue
+        pdfs.put((nombre, contenido))
+def etapa_crawler(pdfs, pendientes, pool):
+    """
+    Envía cada PDF recibido al pool de procesos del Crawler.
+
+    Args:
+        pdfs (queue.Queue): Cola de entrada de tuplas (nombre_pdf, contenido).
+        pendientes (queue.Queue): Cola acotada de futuros en curso, en orden de envío. Al
+            estar llena frena el envío de más PDF al pool.
+        pool (ProcessPoolExecutor): Pool de procesos del Crawler.
+    """
+    try:
+        while True:
+            item = pdfs.get()
+            if item is FIN:
+                break
+            pendientes.put(pool.submit(_extraer_contenido, *item))
+    finally:
+        pendientes.put(FIN)
+def etapa_resultados(pendientes, registros, logger, guardar_intermedios, estado=None):
+    """
+    Recoge los resultados del Crawler en el orden de envío y los pasa al Wrangler.
+
+    Args:
+        pendientes (queue.Queue): Cola de futuros del pool del Crawler.
+        registros (queue.Queue): Cola de salida de tuplas (nombre_pdf, lista_registros).
+        logger (logging.Logger): Objeto de registro del proceso.
+        guardar_intermedios (bool): Si es True los registros también se guardan en jsonlines.
+        estado (StateLedger, opcional): Registro de estado donde se apuntan los jsonlines
+            guardados, igual que en `Crawler.run`.
+    """
+    try:
+        while True:
+            futuro = pendientes.get()
+            if futuro is FIN:
+                break
+            try:
+                nombre, lista, instantanea = futuro.result()
+            except Exception as e:
+                logger.info(f"Error en un proceso del Crawler: {e}")
+                continue
+            METRICAS.fusionar(instantanea)
+            if not lista:
+                continue
+            if guardar_intermedios and save_nested_to_jsonlines(lista, nombre, logger):
+                # El jsonlines por día del boletín repetiría los registros (ver `Crawler.run`)
+                if dia_boletin(nombre) != nombre:
+                    borrar_jsonlines(join(DIRECTORIO_JSONLINES, f"{dia_boletin(nombre)}.json"))
+                if estado is not None:
+                    estado.registrar("crawler", nombre, join(DIRECTORIO_PDF, nombre),
+                                     join(DIRECTORIO_JSONLINES, f"{nombre}.json"), VERSION_CRAWLER)
+            registros.put((nombre, lista))
+    finally:
+        registros.put(FIN)
+def run(input_fecha, descargadores=8, trabajadores=None, tam_cola=16, guardar_intermedios=False,
+        peticiones_por_segundo=5.0):
+    """
+    Ejecuta todas las etapas en streaming para una fecha o un archivo de fechas.
+
+    Las etapas se comunican por colas de tamaño `tam_cola`: si el Crawler o el Wrangler van
+    más lentos, las colas se llenan y las etapas anteriores esperan (backpressure), así que
+    la memoria queda acotada. Los PDF viajan en memoria y por defecto no se escribe ningún
+    archivo intermedio, solo los CSV finales. Con `guardar_intermedios` los PDF, jsonlines y
+    CSV quedan apuntados como si los hubieran generado las etapas por separado: en el
+    manifiesto del Fetcher, en el índice de enlaces y en el registro de estado, así que una
+    ejecución posterior de las etapas no los repite.
+
+    Args:
+        input_fecha (str): Ruta de un archivo con fechas (una por línea) o una fecha individual.
+        descargadores (int, opcional): Hilos de descarga de PDF.
+        trabajadores (int, opcional): Procesos del Crawler. Por defecto uno por núcleo.
+        tam_cola (int, opcional): Capacidad de cada cola entre etapas.
+        guardar_intermedios (bool, opcional): Guarda también los PDF y los jsonlines, igual
+            que la ejecución por etapas.
+        peticiones_por_segundo (float, opcional): Límite de peticiones por segundo a boe.es.
+    Returns:
+        int: Número de CSV escritos.
+    """
+    dir="../data/logs/Pipelinelogs"
+    logger_instance=Logger("Practica12",dir)
+    logger=logger_instance.launch_logging(queued=True)
+    inicio = time.monotonic()
+    METRICAS.reiniciar()
+    estado = manifiesto = None
+    descubiertos = []
+    bajados = []
+    if guardar_intermedios:
+        os.makedirs(DIRECTORIO_PDF, exist_ok=True)
+        os.makedirs(DIRECTORIO_JSONLINES, exist_ok=True)
+        estado = StateLedger(RUTA_ESTADO)
+        manifiesto = FetchManifest(RUTA_MANIFIESTO)
+    enlaces = queue.Queue(maxsize=tam_cola)
+    pdfs = queue.Queue(maxsize=tam_cola)
+    pendientes = queue.Queue(maxsize=tam_cola)
+    registros = queue.Queue(maxsize=tam_cola)
+    sesiones = SesionesPorHost(tam_pool=descargadores)
+    limitador = LimitadorPorHost(peticiones_por_segundo)
+    escritos = 0
+    with multiprocessing.Manager() as gestor:
+        cola_logs = gestor.Queue()
+        listener = logger_instance.launch_queue_listener(cola_logs)
+        try:
+            with ProcessPoolExecutor(max_workers=trabajadores or os.cpu_count() or 1,
+                                     initializer=_iniciar_trabajador, initargs=(cola_logs, RUTA_CACHE)) as pool:
+                hilos_descarga = [threading.Thread(target=etapa_descarga, daemon=True,
+                                                   args=(enlaces, pdfs, logger, limitador, sesiones,
+                                                         guardar_intermedios, manifiesto, bajados))
+                                  for _ in range(descargadores)]
+                hilos = [threading.Thread(target=etapa_descubrimiento, daemon=True,
+                                          args=(leer_fechas(input_fecha), enlaces, descargadores, logger,
+                                                limitador, sesiones.obtener("https://www.boe.es/"),
+                                                descubiertos if guardar_intermedios else None)),
+                         threading.Thread(target=etapa_crawler, daemon=True, args=(pdfs, pendientes, pool)),
+                         threading.Thread(target=etapa_resultados, daemon=True,
+                                          args=(pendientes, registros, logger, guardar_intermedios, estado))]
+                for hilo in hilos + hilos_descarga:
+                    hilo.start()
+                def cerrar_descargas():
+                    for hilo in hilos_descarga:
+                        hilo.join()
+                    pdfs.put(FIN)
+                threading.Thread(target=cerrar_descargas, daemon=True).start()
+                # El Wrangler trabaja en el hilo principal
+                while True:
+                    item = registros.get()
+                    if item is FIN:
+                        break
+                    nombre, lista = item
+                    try:
+                        salida = list_to_csv(f"{nombre}.json", limpiar_datos(lista, logger), logger)
+                        ruta_jsonlines = join(DIRECTORIO_JSONLINES, f"{nombre}.json")
+                        if estado is not None and completo(ruta_jsonlines):
+                            estado.registrar("wrangler-csv", f"{nombre}.json", ruta_jsonlines, salida, VERSION_WRANGLER)
+                        escritos += 1
+                        if escritos == 1:
+                            logger.info(f"Primer CSV escrito a los {time.monotonic() - inicio:.1f} s")
+                    except Exception as e:
+                        logger.error(f"Error al procesar datos del archivo {nombre}: {e}")
+        finally:
+            listener.stop()
+            sesiones.cerrar()
+            if guardar_intermedios:
+                # El índice se escribe aquí y no en los hilos, ya que su conexión SQLite es de este hilo
+                with LinkIndex(RUTA_INDICE) as indice:
+                    for fecha, enlaces_fecha in descubiertos:
+                        indice.registrar(enlaces_fecha, _fecha_o_none(fecha))
+                    indice.marcar_descargados(bajados)
+                manifiesto.guardar()
+                estado.guardar()
+    METRICAS.observar("etapa_segundos", time.monotonic() - inicio, etapa="Pipeline")
+    logger.info(f"Pipeline completado: {escritos} CSV en {time.monotonic() - inicio:.1f} s")
+    logger.info(f"Métricas guardadas en {METRICAS.volcar('Pipeline')}")
+    logger_instance.stop_logging()
+    return escritos
+if __name__ == "__main__":
+    arguments = sys.argv
+    run(arguments[-1], guardar_intermedios="INTERMEDIOS" in arguments)
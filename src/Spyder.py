@@ -6,11 +6,74 @@ Permite la extracción tanto de una fecha específica como de múltiples fechas
 """
 from selenium import webdriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException
-import time
 import os
+import queue
 import sys
+import threading
 from utils.Loger import Logger
+from utils.Enlaces import LinkIndex, RUTA_INDICE
+from Sumario import extraer_enlaces_http, normalizar_fecha
+URL_BASE = "https://www.boe.es/diario_borme/"
+RUTA_SALIDA = "../data/outputs/links.txt"
+ESPERA_MAXIMA = 10
+def crear_driver(headless=True):
+    """
+    Crea una instancia de Chrome para el Spyder.
+    Args:
+        headless (bool, opcional): Si es True el navegador se lanza sin ventana.
+    Returns:
+        selenium.webdriver.Chrome: Controlador listo para navegar.
+    """
+    opciones = webdriver.ChromeOptions()
+    if headless:
+        opciones.add_argument("--headless=new")
+    return webdriver.Chrome(options=opciones)
+def buscar_enlaces_borme(driver, fecha, logger, espera=ESPERA_MAXIMA):
+    """
+    Busca en boe.es los enlaces de Actos inscritos de una fecha y los devuelve.
+
+    En lugar de pausas fijas, cada paso del formulario espera explícitamente a que el
+    elemento siguiente esté disponible, hasta un máximo de `espera` segundos.
+
+    Args:
+        driver (selenium.webdriver): Instancia del controlador de Selenium para la navegación web.
+        fecha (str): Fecha de búsqueda en formato "dd/mm/aaaa".
+        logger (logging.Logger): Objeto de registro para registrar información sobre el proceso.
+        espera (float, opcional): Segundos máximos de espera por cada elemento.
+    Returns:
+        list: Enlaces encontrados. Lista vacía si no hay boletín o si ocurre un error.
+
+    Exceptions:
+        - Captura `NoSuchElementException` y `TimeoutException` si no hay boletín para la fecha indicada.
+        - Captura cualquier otra excepción y registra el mensaje de error correspondiente.
+    """
+    try:
+        esperar = WebDriverWait(driver, espera)
+        # Navegación a la página y búsqueda por fecha
+        driver.get(URL_BASE)
+        campo_fecha = esperar.until(EC.presence_of_element_located((By.ID, "fechaBORME")))
+        campo_fecha.send_keys(fecha)
+        # Realizar búsqueda
+        esperar.until(EC.element_to_be_clickable((By.CLASS_NAME, "boton"))).click()
+        # Filtrar por Actos Inscritos
+        esperar.until(EC.element_to_be_clickable((By.ID, "dropDownSec"))).click()
+        esperar.until(EC.element_to_be_clickable(
+            (By.XPATH, "//li[normalize-space()='Actos inscritos']"))).click()
+        # Extraer enlaces
+        sumario = esperar.until(EC.presence_of_element_located((By.CLASS_NAME, "sumario")))
+        elementos = sumario.find_elements(By.TAG_NAME, "li")
+        enlaces = [elemento.find_element(By.TAG_NAME, "a").get_attribute("href")
+                  for elemento in elementos]
+        logger.info(f"Descarga completada de la fecha: {fecha}")
+        return enlaces
+    except (NoSuchElementException, TimeoutException):
+        logger.info(f"No hay Boletín para la fecha: {fecha}")
+    except Exception as e:
+        logger.info(f"Error inesperado procesando la fecha {fecha}: {str(e)}")
+    return []
 def extraer_enlaces_borme(driver, fecha, logger,modo_escritura='w'):
     """
     Extrae y guarda enlaces de los boletines del BORME correspondientes a una fecha específica.
@@ -18,7 +81,7 @@ def extraer_enlaces_borme(driver, fecha, logger,modo_escritura='w'):
         driver (selenium.webdriver): Instancia del controlador de Selenium para la navegación web.
         fecha (str): Fecha de búsqueda en formato "dd/mm/aaaa".
         logger (logging.Logger): Objeto de registro para registrar información sobre el proceso.
-        modo_escritura (str, opcional): Modo de apertura del archivo de salida. Por defecto es 'w' 
+        modo_escritura (str, opcional): Modo de apertura del archivo de salida. Por defecto es 'w'
             (sobrescribir el contenido), pero se puede usar 'a' para agregar enlaces.
     Returns:
         None: No devuelve ningún valor. Los enlaces extraídos se guardan en un archivo de texto.
@@ -28,62 +91,136 @@ def extraer_enlaces_borme(driver, fecha, logger,modo_escritura='w'):
         - Informa si no se encuentra boletín para la fecha proporcionada.
         - Registra cualquier error inesperado durante la ejecución.
 
-    Exceptions:
-        - Captura y maneja `NoSuchElementException` si no hay boletín para la fecha indicada.
-        - Captura cualquier otra excepción y registra el mensaje de error correspondiente.
-    
     Archivo de salida:
         - ../data/outputs/links.txt: Archivo de texto donde se almacenan los enlaces extraídos.
     """
-    URL_BASE = "https://www.boe.es/diario_borme/"
-    RUTA_SALIDA = "../data/outputs/links.txt"
+    enlaces = buscar_enlaces_borme(driver, fecha, logger)
+    with open(RUTA_SALIDA, modo_escritura, encoding="utf-8") as archivo:
+        for enlace in enlaces:
+            archivo.write(f"{enlace}\n")
+def _fecha_o_none(fecha):
+    """Fecha de entrada como `date`, o None si no tiene un formato reconocible"""
     try:
-        # Navegación a la página y búsqueda por fecha
-        driver.get(URL_BASE)
-        campo_fecha = driver.find_element(By.ID, "fechaBORME")
-        campo_fecha.send_keys(fecha)
-        time.sleep(1)
-        # Realizar búsqueda
-        driver.find_elements(By.CLASS_NAME, "boton")[0].click()
-        time.sleep(1)
-        # Filtrar por Actos Inscritos
-        driver.find_element("id", "dropDownSec").click()
-        elementos_lista = driver.find_elements(By.TAG_NAME, "li")
-        for elemento in elementos_lista:
-            if elemento.text == "Actos inscritos":
-                elemento.click()
+        return normalizar_fecha(fecha)
+    except ValueError:
+        return None
+def escribir_enlaces(resultados, total, ruta, logger, fechas=None, indice=None):
+    """
+    Escritor único de enlaces. Recibe de la cola los resultados de los trabajadores, los
+    ordena por fecha y los escribe sin duplicados en el archivo de salida y, si se indica,
+    en el índice de enlaces.
+
+    Args:
+        resultados (queue.Queue): Cola de tuplas (indice_fecha, enlaces). Una tupla
+            (None, None) indica que no llegarán más resultados.
+        total (int): Número de fechas que se van a recibir.
+        ruta (str): Archivo donde se escriben los enlaces.
+        logger (logging.Logger): Objeto de registro del proceso.
+        fechas (list, opcional): Fechas consultadas, en el orden de los índices.
+        indice (LinkIndex, opcional): Índice donde se registran los enlaces de cada fecha.
+    Returns:
+        int: Número de enlaces distintos escritos.
+    """
+    pendientes = {}
+    vistos = set()
+    siguiente = 0
+    def registrar(posicion, enlaces):
+        if indice is not None:
+            indice.registrar(enlaces, _fecha_o_none(fechas[posicion]) if fechas else None)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        while siguiente < total:
+            posicion, enlaces = resultados.get()
+            if posicion is None:
                 break
-        time.sleep(1)
-        # Extraer enlaces
-        sumario = driver.find_element(By.CLASS_NAME, "sumario")
-        elementos = sumario.find_elements(By.TAG_NAME, "li")
-        enlaces = [elemento.find_element(By.TAG_NAME, "a").get_attribute("href") 
-                  for elemento in elementos]
-        # Guardar enlaces
-        with open(RUTA_SALIDA, modo_escritura, encoding="utf-8") as archivo:
-            for enlace in enlaces:
-                archivo.write(f"{enlace}\n") 
-        logger.info(f"Descarga completada de la fecha: {fecha}")    
-    except NoSuchElementException:
-        logger.info(f"No hay Boletín para la fecha: {fecha}")
+            pendientes[posicion] = enlaces
+            # Se escribe en orden de fecha en cuanto llega el bloque que toca
+            while siguiente in pendientes:
+                registrar(siguiente, pendientes[siguiente])
+                for enlace in pendientes.pop(siguiente):
+                    if enlace not in vistos:
+                        vistos.add(enlace)
+                        archivo.write(f"{enlace}\n")
+                siguiente += 1
+            archivo.flush()
+        # Fechas sueltas que quedaran detrás de una que no llegó a procesarse
+        for posicion in sorted(pendientes):
+            registrar(posicion, pendientes[posicion])
+            for enlace in pendientes[posicion]:
+                if enlace not in vistos:
+                    vistos.add(enlace)
+                    archivo.write(f"{enlace}\n")
+    logger.info(f"Guardados {len(vistos)} enlaces únicos en {ruta}")
+    return len(vistos)
+def trabajador_selenium(fechas, resultados, logger, headless=True):
+    """
+    Hilo trabajador con su propio Chrome: toma fechas de la cola hasta vaciarla y envía
+    los enlaces encontrados al escritor.
+
+    Args:
+        fechas (queue.Queue): Cola de tuplas (indice_fecha, fecha) pendientes.
+        resultados (queue.Queue): Cola donde se envían las tuplas (indice_fecha, enlaces).
+        logger (logging.Logger): Objeto de registro del proceso.
+        headless (bool, opcional): Lanzar Chrome sin ventana.
+    """
+    try:
+        driver = crear_driver(headless)
     except Exception as e:
-        logger.ino(f"Error inesperado procesando la fecha {fecha}: {str(e)}")
-def procesar_borme(input_fecha):
-        """
+        logger.info(f"Error al iniciar el navegador: {str(e)}")
+        return
+    try:
+        while True:
+            try:
+                indice, fecha = fechas.get_nowait()
+            except queue.Empty:
+                break
+            resultados.put((indice, buscar_enlaces_borme(driver, fecha, logger)))
+    finally:
+        driver.quit()
+def leer_fechas(input_fecha):
+    """
+    Devuelve la lista de fechas a procesar.
+    Args:
+        input_fecha (str): Ruta de un archivo con una fecha por línea, o una fecha individual.
+    Returns:
+        list: Fechas en el orden en que aparecen, sin líneas vacías.
+    """
+    if os.path.isfile(input_fecha):
+        with open(input_fecha, "r", encoding="utf-8") as archivo:
+            return [linea.strip() for linea in archivo if linea.strip()]
+    return [input_fecha]
+def procesar_borme(input_fecha, backend="selenium", concurrencia=8, drivers=1, headless=True,
+                   ruta_indice=RUTA_INDICE, forzar=False):
+    """
     Procesa boletines del BORME (Boletín Oficial del Registro Mercantil) para una o múltiples fechas.
 
     Funcionalidad principal:
-    - Si `input_fecha` es un archivo, procesa todas las fechas que contiene, extrayendo los enlaces 
+    - Si `input_fecha` es un archivo, procesa todas las fechas que contiene, extrayendo los enlaces
       del BORME para cada una de ellas.
     - Si `input_fecha` es una cadena con una única fecha, extrae los enlaces del BORME para esa fecha específica.
+    - Los enlaces de todas las fechas pasan por un único escritor que los guarda por orden de
+      fecha y sin duplicados en data/outputs/links.txt y en el índice de enlaces
+      (data/outputs/links.db, ver `utils.Enlaces.LinkIndex`), del que lee el Fetcher.
+    - Las fechas que ya constan en el índice no se vuelven a consultar, así que una recarga
+      de un periodo largo solo pide las que faltan. Sus enlaces se toman del índice, de modo
+      que links.txt contiene siempre los enlaces de todas las fechas pedidas.
 
     Args:
-        input_fecha (str): 
+        input_fecha (str):
             - Ruta de un archivo que contiene múltiples fechas (una por línea).
             - O una fecha individual en formato "dd/mm/aaaa".
+        backend (str, opcional): Forma de obtener los enlaces.
+            - "selenium" (por defecto): recorre el formulario de boe.es con Chrome.
+            - "http": pide directamente el sumario XML de cada fecha, sin navegador y
+              con varias fechas en paralelo (ver Sumario.py).
+        concurrencia (int, opcional): Número de fechas que se piden a la vez con el backend "http".
+        drivers (int, opcional): Número de navegadores Chrome que trabajan en paralelo con el
+            backend "selenium". Cada uno toma fechas de una cola común.
+        headless (bool, opcional): Lanzar los navegadores sin ventana.
+        ruta_indice (str, opcional): Índice de enlaces. Con None solo se escribe links.txt.
+        forzar (bool, opcional): Consulta también las fechas que ya están en el índice.
 
     Logs:
-        - Registra el inicio del proceso, el progreso de la extracción de enlaces y cualquier error 
+        - Registra el inicio del proceso, el progreso de la extracción de enlaces y cualquier error
           durante la ejecución.
 
     Exceptions:
@@ -95,22 +232,46 @@ def procesar_borme(input_fecha):
     dir="../data/logs/Spyderlogs"
     logger_instance=Logger("Practica12",dir)
     logger=logger_instance.launch_logging()
+    fechas = leer_fechas(input_fecha)
+    resultados = queue.Queue()
+    indice_enlaces = LinkIndex(ruta_indice) if ruta_indice else None
     try:
-        driver = webdriver.Chrome()
-        if os.path.isfile(input_fecha):
-            # Procesar archivo con múltiples fechas
-            with open(input_fecha, "r", encoding="utf-8") as archivo:
-                for i, linea in enumerate(archivo):
-                    fecha = linea.strip()
-                    modo = 'w' if i == 0 else 'a'
-                    extraer_enlaces_borme(driver, fecha, logger,modo)
+        # Fechas ya descubiertas: sus enlaces se leen del índice en lugar de volver a consultarlas
+        omitidas = {}
+        if indice_enlaces is not None and not forzar:
+            descubiertas = indice_enlaces.fechas_descubiertas()
+            for posicion, fecha in enumerate(fechas):
+                dia = str(_fecha_o_none(fecha) or fecha)
+                if dia in descubiertas:
+                    omitidas[posicion] = [enlace["url"] for enlace in indice_enlaces.entre(dia, dia)]
+            if omitidas:
+                logger.info(f"{len(omitidas)} fechas ya están en el índice de enlaces, se omiten")
+        for posicion, enlaces in omitidas.items():
+            resultados.put((posicion, enlaces))
+        consultar = [(posicion, fecha) for posicion, fecha in enumerate(fechas) if posicion not in omitidas]
+        if backend == "http":
+            for (posicion, _), enlaces in zip(consultar, extraer_enlaces_http([fecha for _, fecha in consultar],
+                                                                              logger, concurrencia)):
+                resultados.put((posicion, enlaces))
         else:
-            # Procesar fecha individual
-            extraer_enlaces_borme(driver, input_fecha, logger,'w')
+            pendientes = queue.Queue()
+            for posicion, fecha in consultar:
+                pendientes.put((posicion, fecha))
+            hilos = [threading.Thread(target=trabajador_selenium, args=(pendientes, resultados, logger, headless),
+                                      daemon=True) for _ in range(min(max(1, drivers), len(consultar)))]
+            for hilo in hilos:
+                hilo.start()
+            def cerrar_cola():
+                for hilo in hilos:
+                    hilo.join()
+                resultados.put((None, None))
+            threading.Thread(target=cerrar_cola, daemon=True).start()
+        escribir_enlaces(resultados, len(fechas), RUTA_SALIDA, logger, fechas, indice_enlaces)
     except Exception as e:
         logger.info(f"Error en la ejecución: {str(e)}")
     finally:
-        driver.quit()
+        if indice_enlaces is not None:
+            indice_enlaces.cerrar()
 if __name__ == "__main__":
     arguments = sys.argv
-    procesar_borme(arguments[-1])
\ No newline at end of file
+    procesar_borme(arguments[-1], backend="http" if "HTTP" in arguments else "selenium")
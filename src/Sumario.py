@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Cliente HTTP del sumario diario del BORME.
+Obtiene los enlaces de los boletines sin navegador, pidiendo directamente el XML del sumario
+a la API de datos abiertos del BOE.
+"""
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import requests
+from Fetcher import SesionesPorHost, LimitadorPorHost
+URL_SUMARIO = "https://www.boe.es/datosabiertos/api/borme/sumario/{fecha}"
+SECCION_ACTOS_INSCRITOS = "A"
+def normalizar_fecha(fecha):
+    """
+    Convierte una fecha de entrada en un objeto `date`.
+
+    Args:
+        fecha (str): Fecha en formato "dd/mm/aaaa" o "ddmmaaaa" (el de data/inputs/fechas.txt).
+    Returns:
+        datetime.date: Fecha normalizada.
+    Raises:
+        ValueError: Si la fecha no tiene ninguno de los formatos admitidos.
+    """
+    fecha = fecha.strip()
+    formato = "%d/%m/%Y" if "/" in fecha else "%d%m%Y"
+    return datetime.strptime(fecha, formato).date()
+def construir_url_sumario(fecha):
+    """
+    Construye la URL del sumario XML del BORME para una fecha.
+
+    Args:
+        fecha (str): Fecha en formato "dd/mm/aaaa" o "ddmmaaaa".
+    Returns:
+        str: URL de la API de datos abiertos del BOE.
+    """
+    return URL_SUMARIO.format(fecha=normalizar_fecha(fecha).strftime("%Y%m%d"))
+def parsear_sumario(contenido, seccion=SECCION_ACTOS_INSCRITOS):
+    """
+    Extrae los enlaces a los PDF de una sección del sumario XML del BORME.
+
+    Args:
+        contenido (bytes | str): Cuerpo XML de la respuesta del sumario.
+        seccion (str, opcional): Código de la sección a extraer. Por defecto "A"
+            (Actos inscritos), la misma que se filtra en el formulario web.
+    Returns:
+        list: URLs de los PDF de la sección, en el orden del sumario. Lista vacía si el
+        sumario no tiene esa sección.
+    Raises:
+        xml.etree.ElementTree.ParseError: Si el contenido no es un XML válido.
+    """
+    raiz = ET.fromstring(contenido)
+    enlaces = []
+    for nodo_seccion in raiz.iter("seccion"):
+        if nodo_seccion.get("codigo") != seccion:
+            continue
+        for item in nodo_seccion.iter("item"):
+            url_pdf = item.findtext("url_pdf")
+            if url_pdf:
+                enlaces.append(url_pdf.strip())
+    return enlaces
+def descargar_sumario(fecha, logger, session=None, limitador=None, timeout=30):
+    """
+    Descarga y parsea el sumario de una fecha.
+
+    Args:
+        fecha (str): Fecha en formato "dd/mm/aaaa" o "ddmmaaaa".
+        logger (logging.Logger): Objeto de registro del proceso.
+        session (requests.Session, opcional): Sesión keep-alive a reutilizar.
+        limitador (LimitadorPorHost, opcional): Limitador de peticiones por host.
+        timeout (float, opcional): Tiempo máximo de espera de la petición en segundos.
+    Returns:
+        list: URLs de los PDF de Actos inscritos. Lista vacía si no hay boletín ese día
+        o si la petición falla (el error queda registrado).
+    """
+    try:
+        url = construir_url_sumario(fecha)
+        if limitador is not None:
+            limitador.esperar("www.boe.es")
+        cliente = session if session is not None else requests
+        response = cliente.get(url, headers={"Accept": "application/xml"}, timeout=timeout)
+        if response.status_code == 404:
+            logger.info(f"No hay Boletín para la fecha: {fecha}")
+            return []
+        response.raise_for_status()
+        enlaces = parsear_sumario(response.content)
+        logger.info(f"Descarga completada de la fecha: {fecha}")
+        return enlaces
+    except (requests.exceptions.RequestException, ET.ParseError, ValueError) as e:
+        logger.info(f"Error inesperado procesando la fecha {fecha}: {str(e)}")
+        return []
+def extraer_enlaces_http(fechas, logger, concurrencia=8, peticiones_por_segundo=5.0):
+    """
+    Obtiene en paralelo los enlaces de varias fechas a través de la API del sumario.
+
+    Args:
+        fechas (list): Fechas en formato "dd/mm/aaaa" o "ddmmaaaa".
+        logger (logging.Logger): Objeto de registro del proceso.
+        concurrencia (int, opcional): Número de sumarios que se piden a la vez.
+        peticiones_por_segundo (float, opcional): Límite de peticiones por segundo a boe.es.
+    Returns:
+        list: Lista de listas de enlaces, una por fecha y en el mismo orden que `fechas`.
+    """
+    sesiones = SesionesPorHost(tam_pool=concurrencia)
+    limitador = LimitadorPorHost(peticiones_por_segundo)
+    sesion = sesiones.obtener(URL_SUMARIO)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as pool:
+            return list(pool.map(lambda fecha: descargar_sumario(fecha, logger, sesion, limitador), fechas))
+    finally:
+        sesiones.cerrar()
@@ -1,10 +1,85 @@
 #!/usr/bin/env python
 # coding: utf-8
 import json
+import contextlib
 import csv
+import itertools
+import logging
+import multiprocessing
+import shutil
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
+import re
+import numpy as np
+import pandas as pd
 from utils.Loger import Logger
+from utils.Store import CompanyStore
+from utils.Estado import StateLedger, RUTA_ESTADO
+from utils.Metricas import METRICAS
+from utils.Normalizacion import Domicilio, parsear_domicilio, tipo_sociedad
+from utils.Enlaces import LinkIndex, RUTA_INDICE, fecha_url
+from utils.Jsonlines import abrir, completo, comprimido, nombre_logico
+try:
+    import orjson
+    decodificar_json = orjson.loads
+except ImportError:  # Sin orjson se usa el decodificador de la biblioteca estándar
+    decodificar_json = json.loads
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow solo hace falta para la salida Parquet / Arrow
+    pa = None
+# Reparaciones de codificación que se aplican a cada valor, las mismas que en clean_datos
+REEMPLAZOS = {"Ã³": "ó", "Ã'": "Ñ", "Ã\xad": "í", "Ãº": "ú", ",": ""}
+PATRON_REEMPLAZOS = "|".join(re.escape(origen) for origen in REEMPLAZOS)
+# Nombre de los PDF del BORME: BORME-<sección>-<año>-<número>-<provincia>.pdf
+PATRON_NOMBRE_PDF = re.compile(r"BORME-(?P<seccion>[A-Z])-(?P<anio>\d{4})-(?P<numero>\d+)-(?P<provincia>\d+)\.pdf")
+RUTA_COLUMNAR = "../data/outputs/{formato}"
+RUTA_BASE_DATOS = "../data/outputs/borme.db"
+# Versión de la limpieza; subirla hace que el registro de estado vuelva a convertir todos los archivos
+VERSION_WRANGLER = "2"
+if pa is not None:
+    ESQUEMA_COLUMNAR = pa.schema([
+        ("Nombre", pa.string()), ("TipoDeSociedad", pa.string()), ("ComienzoDeOperaciones", pa.date32()),
+        ("DomicilioCompleto", pa.string()), ("Ciudad", pa.string()), ("Tipodevia", pa.string()),
+        ("Numero", pa.int64()), ("Nombredevia", pa.string()), ("CapitalSocial", pa.int64())])
+    # Particionado hive del dataset; se usa también para leerlo: ds.dataset(ruta, partitioning=PARTICION_COLUMNAR)
+    PARTICION_COLUMNAR = ds.partitioning(
+        pa.schema([("FechaBoletin", pa.date32()), ("Provincia", pa.string())]), flavor="hive")
+CAMPOS_CSV = ["Nombre", "TipoDeSociedad", "ComienzoDeOperaciones",
+              'DomicilioCompleto', 'Ciudad', 'Tipodevia', 'Numero',
+              'Nombredevia', 'CapitalSocial']
+# Los jsonlines por día del Crawler (BORME-A-2024-168.json) llevan el PDF de cada registro
+PATRON_JSONLINES_DIA = re.compile(r"BORME-[A-Z]-\d{4}-\d+\.json")
+CAMPOS_CSV_DIA = ["Archivo"] + CAMPOS_CSV
+# Registros que se leen, limpian y escriben de una vez en `run`
+TAM_BLOQUE = 10000
+# Tamaño en bytes a partir del cual un jsonlines se reparte en trozos entre varios procesos
+TAM_TROZO = 64 * 1024 * 1024
+# Con SQLite los trozos vuelven al proceso padre como registros en memoria, así que son más pequeños
+TAM_TROZO_SQLITE = 8 * 1024 * 1024
+# Trozos enviados al pool por trabajador sin recoger todavía su resultado
+TAREAS_EN_VUELO = 2
+# Contadores de registros o líneas con error, para el resumen de cada trabajador
+CONTADORES_ERROR = ("wrangler_json_invalido_total", "wrangler_fallos_linea_total", "wrangler_fallos_registro_total",
+                    "wrangler_no_diccionario_total", "wrangler_fallos_fila_csv_total")
+# Registros a partir de los cuales `clean_datos_vectorizado` es más rápido que `clean_datos`:
+# por debajo pesa más el coste fijo de montar el DataFrame (ver `limpiar_datos`)
+UMBRAL_VECTORIZADO = 2000
+# Campos del domicilio cuando no se puede separar
+DOMICILIO_VACIO = Domicilio(None, None, None, None)
+# Marca de campo ausente, para distinguirlo de un campo presente con valor None
+_FALTA = object()
+def _fecha(valor):
+    """Fecha de comienzo de operaciones ("02.09.24"). Raises ValueError si no es válida"""
+    return datetime.strptime(valor, '%d.%m.%y').date()
+def _capital(valor):
+    """Importe del capital ("Capital: 3000"), ya sin comas. Raises ValueError o IndexError si no es válido"""
+    return int(valor.split(":", 1)[1].replace(".", ""))
 def clean_datos(lista_datos,logger):
     """
     Procesa y limpia una lista de datos de empresas, normalizando caracteres especiales
@@ -26,13 +101,15 @@ def clean_datos(lista_datos,logger):
     for indice, datos in enumerate(lista_datos):
         try:
             if not isinstance(datos, dict):
-                logger.warning(f"Elemento {indice} no es un diccionario, se omite")
+                METRICAS.log_muestreado(logger, "wrangler_no_diccionario_total", nivel=logging.WARNING,
+                                        mensaje=f"Elemento {indice} no es un diccionario, se omite")
                 continue
             new_dict = {}
             for clave, valor in datos.items():
                 try:
                     if not isinstance(valor, str):
-                        logger.warning(f"Valor no string en clave {clave}, se convierte a string")
+                        METRICAS.log_muestreado(logger, "wrangler_valor_no_texto_total", nivel=logging.WARNING,
+                                                mensaje=f"Valor no string en clave {clave}, se convierte a string")
                         valor = str(valor)
                     # Limpieza de caracteres especiales
                     clave = clave.replace("Ã³", "ó")
@@ -44,83 +121,190 @@ def clean_datos(lista_datos,logger):
                     # Procesamiento de fecha de operaciones
                     if clave == "Comienzo de operaciones":
                         try:
-                            valor = datetime.strptime(valor, '%d.%m.%y').date()
-                            new_dict["ComienzoDeOperaciones"] = valor
+                            new_dict["ComienzoDeOperaciones"] = _fecha(valor)
                         except ValueError as e:
-                            logger.error(f"Error al procesar fecha de operaciones: {e}")
+                            METRICAS.log_muestreado(logger, "wrangler_fallos_fecha_total", nivel=logging.ERROR,
+                                                    mensaje=f"Error al procesar fecha de operaciones: {e}")
                             new_dict["ComienzoDeOperaciones"] = None
 
                     # Procesamiento de capital
                     elif clave == "Capital":
                         try:
-                            valor = valor.split(":", 1)[1]
-                            valor = int(valor.replace(".", ""))
-                            new_dict["CapitalSocial"] = valor
+                            new_dict["CapitalSocial"] = _capital(valor)
                         except (ValueError, IndexError) as e:
-                            logger.error(f"Error al procesar capital: {e}")
+                            METRICAS.log_muestreado(logger, "wrangler_fallos_capital_total", nivel=logging.ERROR,
+                                                    mensaje=f"Error al procesar capital: {e}")
                             new_dict["CapitalSocial"] = None
                     # Procesamiento de nombre y tipo de sociedad
+                    elif clave == "Archivo":
+                        new_dict["Archivo"] = valor
                     elif clave == 'nombre':
                         new_dict["Nombre"] = valor
-                        if "SL." in valor:
-                            new_dict["TipoDeSociedad"] = "Sociedad Limitada"
-                        elif "SA." in valor:
-                            new_dict["TipoDeSociedad"] = "Sociedad Anonima"
-                        else:
-                            new_dict["TipoDeSociedad"] = "No especificado"
+                        new_dict["TipoDeSociedad"] = tipo_sociedad(valor)
                     # Procesamiento de domicilio
                     elif clave == "Domicilio":
+                        new_dict["DomicilioCompleto"] = valor
                         try:
-                            new_dict["DomicilioCompleto"] = valor
-                            via = "No especificada"
-                            # Separar ciudad
-                            try:
-                                [valor, ciudad] = valor.split("(", 1)
-                                ciudad = ciudad.replace(")", "")
-                                new_dict["Ciudad"] = ciudad.lower()
-                            except ValueError:
-                                logger.warning("No se pudo extraer la ciudad del domicilio")
-                                new_dict["Ciudad"] = None
-                            # Identificar tipo de vía
-                            if valor[0:2] == "C/":
-                                via = "Calle"
-                                valor = valor.replace("C/", "")
-                            elif valor[0:5] == "PLAZA":
-                                via = "Plaza"
-                            elif valor[0:4] == "CTRA":
-                                via = "Carretera"
-                            elif valor[0:4] == "AVDA":
-                                via = "Avenida"
-                            elif valor[0:5] == "PASEO":
-                                via = "Paseo"
-                            new_dict["Tipodevia"] = via
-                            # Extraer número y nombre de vía
-                            palabras = valor.split(" ")
-                            nombre_via = ""
-                            numero = None
-                            for palabra in palabras:
-                                if palabra.isdigit():
-                                    numero = int(palabra)
-                                    break
-                                else:
-                                    nombre_via += palabra + " "
-                            new_dict["Numero"] = numero
-                            new_dict["Nombredevia"] = nombre_via.lower().strip()
+                            domicilio = parsear_domicilio(valor)
                         except Exception as e:
-                            logger.error(f"Error al procesar domicilio: {e}")
-                            new_dict["DomicilioCompleto"] = valor
-                            new_dict["Ciudad"] = None
-                            new_dict["Tipodevia"] = None
-                            new_dict["Numero"] = None
-                            new_dict["Nombredevia"] = None
+                            METRICAS.log_muestreado(logger, "wrangler_fallos_domicilio_total", nivel=logging.ERROR,
+                                                    mensaje=f"Error al procesar domicilio: {e}")
+                            domicilio = DOMICILIO_VACIO
+                        else:
+                            if domicilio.ciudad is None:
+                                METRICAS.log_muestreado(logger, "wrangler_sin_ciudad_total", nivel=logging.WARNING,
+                                                        mensaje="No se pudo extraer la ciudad del domicilio")
+                        new_dict["Ciudad"] = domicilio.ciudad
+                        new_dict["Tipodevia"] = domicilio.tipo_via
+                        new_dict["Numero"] = domicilio.numero
+                        new_dict["Nombredevia"] = domicilio.nombre_via
                 except Exception as e:
-                    logger.error(f"Error al procesar clave {clave}: {e}")
+                    METRICAS.log_muestreado(logger, "wrangler_fallos_clave_total", nivel=logging.ERROR,
+                                            mensaje=f"Error al procesar clave {clave}: {e}")
                     continue
             new_lista.append(new_dict)
         except Exception as e:
-            logger.error(f"Error al procesar registro {indice}: {e}")
+            METRICAS.log_muestreado(logger, "wrangler_fallos_registro_total", nivel=logging.ERROR,
+                                    mensaje=f"Error al procesar registro {indice}: {e}")
             continue
     return new_lista
+def _columna(registros, clave, logger):
+    """
+    Extrae una clave de todos los registros y la reduce a sus valores distintos.
+
+    Las operaciones de texto se hacen después solo sobre los valores únicos (fechas, capitales
+    y domicilios se repiten mucho entre registros) y se expanden con `codigos`.
+
+    Returns:
+        tuple: (unicos, codigos, presente) donde `unicos` es una serie con los valores distintos
+        convertidos a str y con las reparaciones de `REEMPLAZOS`, `codigos` indica qué valor
+        único corresponde a cada registro y `presente` es una máscara con los registros que
+        contienen la clave.
+    """
+    presente = np.fromiter((clave in d for d in registros), dtype=bool, count=len(registros))
+    valores = [d.get(clave, "") for d in registros]
+    codigos, unicos = pd.factorize(pd.Series(valores, dtype=object), use_na_sentinel=False)
+    unicos = pd.Series(unicos, dtype=object)
+    no_texto = ~unicos.map(type).eq(str)
+    if no_texto.any():
+        logger.warning(f"Valores no string en clave {clave}, se convierten a string")
+        METRICAS.incrementar("wrangler_valor_no_texto_total", int(no_texto.sum()))
+        unicos = unicos.where(~no_texto, unicos.astype(str))
+    unicos = unicos.str.replace(PATRON_REEMPLAZOS, lambda m: REEMPLAZOS[m.group(0)], regex=True)
+    return unicos, codigos, pd.Series(presente)
+def _expandir(unicos, codigos):
+    """Pasa una serie calculada sobre los valores únicos a una serie con un valor por registro"""
+    return pd.Series(unicos.to_numpy(dtype=object)[codigos], dtype=object)
+def _convertir(unicos, conversion):
+    """
+    Aplica a cada valor único la misma conversión que `clean_datos`, para que las dos
+    versiones den el mismo resultado, y deja None donde falla.
+    """
+    def convertir(valor):
+        try:
+            return conversion(valor)
+        except (ValueError, IndexError):
+            return None
+    return pd.Series([convertir(valor) for valor in unicos], dtype=object)
+def clean_datos_vectorizado(lista_datos, logger):
+    """
+    Versión columnar de `clean_datos`: carga el lote completo en pandas y hace la reparación
+    de caracteres, el parseo de fechas y capital, la detección del tipo de sociedad y la
+    separación del domicilio con operaciones sobre columnas en lugar de registro a registro.
+    Cada columna se procesa sobre sus valores distintos y después se expande a los registros.
+
+    Produce exactamente los mismos campos y valores que `clean_datos` para los registros que
+    genera el Crawler, así que el CSV resultante es idéntico. Los errores se registran
+    agregados (un mensaje con el número de casos) en lugar de uno por registro.
+
+    Args:
+        lista_datos (list): Lista de diccionarios con información de empresas.
+        logger (logging.Logger): Objeto de registro del proceso.
+
+    Returns:
+        list: Lista de diccionarios con los datos procesados y estructurados.
+
+    Raises:
+        ValueError: Si la lista de entrada está vacía o no es válida
+    """
+    if not lista_datos or not isinstance(lista_datos, list):
+        raise ValueError("La lista de datos está vacía o no es válida")
+    registros = [datos for datos in lista_datos if isinstance(datos, dict)]
+    if len(registros) < len(lista_datos):
+        logger.warning(f"{len(lista_datos) - len(registros)} elementos no son diccionarios, se omiten")
+        METRICAS.incrementar("wrangler_no_diccionario_total", len(lista_datos) - len(registros))
+    if not registros:
+        return []
+    columnas = {}
+    # Procesamiento de fecha de operaciones
+    unicos, codigos, presente = _columna(registros, "Comienzo de operaciones", logger)
+    fechas = _expandir(_convertir(unicos, _fecha), codigos)
+    fallos = presente & fechas.isna()
+    if fallos.any():
+        logger.error(f"Error al procesar fecha de operaciones en {int(fallos.sum())} registros")
+        METRICAS.incrementar("wrangler_fallos_fecha_total", int(fallos.sum()))
+    columnas["ComienzoDeOperaciones"] = (fechas, presente)
+    # Procesamiento de capital
+    unicos, codigos, presente = _columna(registros, "Capital", logger)
+    capital = _expandir(_convertir(unicos, _capital), codigos)
+    fallos = presente & capital.isna()
+    if fallos.any():
+        logger.error(f"Error al procesar capital en {int(fallos.sum())} registros")
+        METRICAS.incrementar("wrangler_fallos_capital_total", int(fallos.sum()))
+    columnas["CapitalSocial"] = (capital, presente)
+    # Procesamiento de nombre y tipo de sociedad
+    unicos, codigos, presente = _columna(registros, "nombre", logger)
+    columnas["Nombre"] = (_expandir(unicos, codigos), presente)
+    columnas["TipoDeSociedad"] = (_expandir(unicos.map(tipo_sociedad), codigos), presente)
+    # Procesamiento de domicilio, con la misma función (y caché) que clean_datos
+    unicos, codigos, presente = _columna(registros, "Domicilio", logger)
+    fallos = 0
+    def separar(domicilio):
+        nonlocal fallos
+        try:
+            return parsear_domicilio(domicilio)
+        except Exception:
+            fallos += 1
+            return DOMICILIO_VACIO
+    domicilios = pd.DataFrame([separar(domicilio) for domicilio in unicos], columns=Domicilio._fields, dtype=object)
+    if fallos:
+        logger.error(f"Error al procesar domicilio en {fallos} domicilios distintos")
+        METRICAS.incrementar("wrangler_fallos_domicilio_total", fallos)
+    ciudad = _expandir(domicilios["ciudad"], codigos)
+    sin_ciudad = presente & ciudad.isna()
+    if sin_ciudad.any():
+        logger.warning(f"No se pudo extraer la ciudad del domicilio en {int(sin_ciudad.sum())} registros")
+        METRICAS.incrementar("wrangler_sin_ciudad_total", int(sin_ciudad.sum()))
+    columnas["DomicilioCompleto"] = (_expandir(unicos, codigos), presente)
+    columnas["Ciudad"] = (ciudad, presente)
+    columnas["Tipodevia"] = (_expandir(domicilios["tipo_via"], codigos), presente)
+    columnas["Numero"] = (_expandir(domicilios["numero"], codigos), presente)
+    columnas["Nombredevia"] = (_expandir(domicilios["nombre_via"], codigos), presente)
+    # PDF de origen, solo en los jsonlines por día
+    unicos, codigos, presente = _columna(registros, "Archivo", logger)
+    columnas["Archivo"] = (_expandir(unicos, codigos), presente)
+    # Reconstrucción de los registros, omitiendo los campos cuya clave no venía en el original
+    claves = list(columnas)
+    filas = zip(*(np.where(presente, serie.to_numpy(dtype=object), _FALTA).tolist()
+                  for serie, presente in columnas.values()))
+    return [{clave: valor for clave, valor in zip(claves, fila) if valor is not _FALTA} for fila in filas]
+def limpiar_datos(lista_datos, logger):
+    """
+    Limpia un bloque con `clean_datos_vectorizado` si tiene al menos `UMBRAL_VECTORIZADO`
+    registros y con `clean_datos` si es más pequeño, como los jsonlines de un solo PDF, en
+    los que el coste fijo de pandas hace más lenta la versión vectorizada. El resultado es el
+    mismo con cualquiera de las dos.
+
+    Args:
+        lista_datos (list): Lista de diccionarios con información de empresas.
+        logger (logging.Logger): Objeto de registro del proceso.
+
+    Returns:
+        list: Lista de diccionarios con los datos procesados y estructurados.
+    """
+    if isinstance(lista_datos, list) and len(lista_datos) >= UMBRAL_VECTORIZADO:
+        return clean_datos_vectorizado(lista_datos, logger)
+    return clean_datos(lista_datos, logger)
 def list_to_csv(nombre_archivo, datos,logger):
     """
     Convierte una lista de diccionarios a un archivo CSV.
@@ -128,6 +312,9 @@ def list_to_csv(nombre_archivo, datos,logger):
     Args:
         nombre_archivo (str): Nombre del archivo a crear
         datos (list): Lista de diccionarios con los datos a escribir
+
+    Returns:
+        str: Ruta del CSV escrito
         
     Raises:
         ValueError: Si los datos de entrada no son válidos
@@ -139,99 +326,687 @@ def list_to_csv(nombre_archivo, datos,logger):
             raise ValueError("El nombre del archivo no puede estar vacío")
         if not datos or not isinstance(datos, list):
             raise ValueError("Los datos deben ser una lista no vacía")
-            
-        campos = ["Nombre", "TipoDeSociedad", "ComienzoDeOperaciones", 
-                 'DomicilioCompleto', 'Ciudad', 'Tipodevia', 'Numero', 
-                 'Nombredevia', 'CapitalSocial']
-        path = "../data/outputs/csv/"
-        try:
-            os.makedirs(path, exist_ok=True)
-        except OSError as e:
-            logger.error(f"Error al crear el directorio {path}: {e}")
-            raise
-        archivo_path = os.path.join(path, f"{nombre_archivo}.csv")
-        try:
-            with open(archivo_path, mode="w", newline="", encoding='utf-8') as archivo:
-                escritor = csv.DictWriter(archivo, fieldnames=campos)
-                try:
-                    escritor.writeheader()
-                    for i, fila in enumerate(datos, 1):
+        return stream_to_csv(nombre_archivo, [datos], logger)
+    except Exception as e:
+        logger.error(f"Error general en list_to_csv: {e}")
+        raise
+def stream_to_csv(nombre_archivo, bloques, logger, campos=CAMPOS_CSV):
+    """
+    Escribe un CSV a partir de bloques de diccionarios, a medida que se van recibiendo,
+    de forma que solo hay un bloque en memoria. El resultado es el mismo que el de
+    `list_to_csv` con todos los bloques concatenados.
+
+    Args:
+        nombre_archivo (str): Nombre del archivo a crear
+        bloques (iterable): Listas de diccionarios con los datos a escribir
+        campos (list, opcional): Columnas del CSV (ver `campos_csv`)
+
+    Returns:
+        str: Ruta del CSV escrito
+
+    Raises:
+        OSError: Si hay problemas con la escritura del archivo
+    """
+    path = "../data/outputs/csv/"
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError as e:
+        logger.error(f"Error al crear el directorio {path}: {e}")
+        raise
+    archivo_path = os.path.join(path, f"{nombre_archivo}.csv")
+    try:
+        with open(archivo_path, mode="w", newline="", encoding='utf-8') as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=campos)
+            try:
+                escritor.writeheader()
+                escritas = 0
+                i = 0
+                for bloque in bloques:
+                    for fila in bloque:
+                        i += 1
                         try:
                             fila_procesada = {campo: fila.get(campo, 'None') for campo in campos}
                             escritor.writerow(fila_procesada)
+                            escritas += 1
                         except Exception as e:
-                            logger.error(f"Error procesando fila {i}: {e}")
+                            METRICAS.log_muestreado(logger, "wrangler_fallos_fila_csv_total", nivel=logging.ERROR,
+                                                    mensaje=f"Error procesando fila {i}: {e}")
                             continue
-                    # Registro de estadísticas
-                    logger.info(f"Archivo {archivo_path} creado exitosamente")
-                except csv.Error as e:
-                    logger.error(f"Error escribiendo CSV: {e}")
-                    raise
-        except PermissionError:
-            logger.error(f"Error de permisos al escribir en {archivo_path}")
-            raise
-        except OSError as e:
-            logger.error(f"Error de E/S escribiendo archivo {archivo_path}: {e}")
-            raise
-            
-    except Exception as e:
-        logger.error(f"Error general en list_to_csv: {e}")
+                # Registro de estadísticas
+                METRICAS.incrementar("wrangler_filas_escritas_total", escritas, formato="csv")
+                logger.info(f"Archivo {archivo_path} creado exitosamente")
+                return archivo_path
+            except csv.Error as e:
+                logger.error(f"Error escribiendo CSV: {e}")
+                raise
+    except PermissionError:
+        logger.error(f"Error de permisos al escribir en {archivo_path}")
+        raise
+    except OSError as e:
+        logger.error(f"Error de E/S escribiendo archivo {archivo_path}: {e}")
         raise
-def run():
+def campos_csv(nombre_archivo):
+    """Columnas del CSV de un jsonlines: las de un jsonlines por día llevan además el PDF de origen"""
+    return CAMPOS_CSV_DIA if PATRON_JSONLINES_DIA.fullmatch(nombre_archivo) else CAMPOS_CSV
+def fechas_boletines(ruta_enlaces="../data/outputs/links.txt", ruta_indice=RUTA_INDICE):
+    """
+    Obtiene la fecha de publicación de cada PDF a partir de las URLs del Spyder
+    (https://www.boe.es/borme/dias/2024/09/02/pdfs/BORME-A-2024-168-03.pdf), tanto las del
+    índice de enlaces como las de links.txt.
+
+    Args:
+        ruta_enlaces (str, opcional): Archivo de enlaces generado por el Spyder.
+        ruta_indice (str, opcional): Índice de enlaces (`utils.Enlaces.LinkIndex`).
+    Returns:
+        dict: Nombre del PDF, y también nombre del boletín del día (BORME-A-2024-168) ->
+        `datetime.date`. Vacío si no existe ninguno de los dos.
+    """
+    urls = []
+    if ruta_indice and os.path.exists(ruta_indice):
+        with LinkIndex(ruta_indice) as indice:
+            urls.extend(enlace["url"] for enlace in indice.entre())
+    if os.path.exists(ruta_enlaces):
+        with open(ruta_enlaces, "r", encoding="utf-8") as archivo:
+            urls.extend(archivo)
+    fechas = {}
+    for url in urls:
+        fecha = fecha_url(url)
+        if fecha is not None:
+            nombre = os.path.basename(url.strip())
+            fechas[nombre] = fecha
+            pdf = PATRON_NOMBRE_PDF.fullmatch(nombre)
+            if pdf:
+                fechas[f"BORME-{pdf['seccion']}-{pdf['anio']}-{pdf['numero']}"] = fecha
+    return fechas
+def datos_pdf(nombre_archivo):
+    """
+    Obtiene el nombre del PDF y el código de provincia a partir del nombre del jsonlines.
+    Args:
+        nombre_archivo (str): Nombre del jsonlines (BORME-A-2024-168-03.pdf.json)
+    Returns:
+        tuple: (nombre_pdf, provincia). La provincia es None si el nombre no sigue el formato del BORME.
+    """
+    nombre_pdf = nombre_archivo[:-len(".json")] if nombre_archivo.endswith(".json") else nombre_archivo
+    coincidencia = PATRON_NOMBRE_PDF.search(nombre_pdf)
+    return nombre_pdf, coincidencia.group("provincia") if coincidencia else None
+def list_to_columnar(nombre_archivo, datos, logger, formato="parquet", fecha_boletin=None):
+    """
+    Escribe una lista de diccionarios en formato columnar (Parquet o Arrow IPC) comprimido
+    con zstd, dentro de un dataset particionado por fecha de boletín y provincia:
+    ../data/outputs/<formato>/FechaBoletin=2024-09-02/Provincia=03/<pdf>.<formato>
+
+    A diferencia del CSV las columnas llevan tipo: `ComienzoDeOperaciones` es una fecha,
+    `CapitalSocial` y `Numero` son enteros y los valores ausentes quedan como nulos.
+
+    Args:
+        nombre_archivo (str): Nombre del jsonlines de origen (<pdf>.json)
+        datos (list): Lista de diccionarios con los datos limpios
+        logger (logging.Logger): Objeto de registro del proceso
+        formato (str, opcional): "parquet" o "arrow"
+        fecha_boletin (datetime.date, opcional): Fecha de publicación del boletín
+
+    Returns:
+        str: Ruta del archivo escrito dentro del dataset
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+        ValueError: Si los datos de entrada o el formato no son válidos
+    """
+    if pa is None:
+        raise ImportError("La salida Parquet/Arrow necesita pyarrow (ver requirements.txt)")
+    if formato not in ("parquet", "arrow"):
+        raise ValueError(f"Formato columnar no soportado: {formato}")
+    if not datos or not isinstance(datos, list):
+        raise ValueError("Los datos deben ser una lista no vacía")
+    return stream_to_columnar(nombre_archivo, [datos], logger, formato, fecha_boletin)
+def stream_to_columnar(nombre_archivo, bloques, logger, formato="parquet", fecha_boletin=None, parte=None):
+    """
+    Versión por bloques de `list_to_columnar`: cada bloque de diccionarios se convierte en
+    un lote de Arrow y se escribe en cuanto llega, sin reunir antes todo el archivo.
+
+    Args:
+        nombre_archivo (str): Nombre del jsonlines de origen (<pdf>.json)
+        bloques (iterable): Listas de diccionarios con los datos limpios
+        logger (logging.Logger): Objeto de registro del proceso
+        formato (str, opcional): "parquet" o "arrow"
+        fecha_boletin (datetime.date, opcional): Fecha de publicación del boletín
+        parte (int, opcional): Número del trozo cuando el archivo se convierte en varios
+            procesos; cada trozo se escribe como un fragmento distinto de la partición
+
+    Returns:
+        str | None: Ruta del archivo escrito dentro del dataset. Si el archivo entero (sin
+        `parte`) no tiene registros se escribe un fragmento vacío en la partición de su
+        boletín, para que tenga una salida; un trozo sin registros devuelve None.
+
+    Raises:
+        ImportError: Si pyarrow no está instalado
+        ValueError: Si el formato no es válido
+    """
+    if pa is None:
+        raise ImportError("La salida Parquet/Arrow necesita pyarrow (ver requirements.txt)")
+    if formato not in ("parquet", "arrow"):
+        raise ValueError(f"Formato columnar no soportado: {formato}")
+    nombre_pdf, provincia = datos_pdf(nombre_archivo)
+    esquema = ESQUEMA_COLUMNAR.append(pa.field("FechaBoletin", pa.date32())).append(pa.field("Provincia", pa.string()))
+    filas = 0
+    def lotes():
+        nonlocal filas
+        for bloque in bloques:
+            if not bloque:
+                continue
+            tabla = pa.Table.from_pylist(bloque, schema=ESQUEMA_COLUMNAR)
+            tabla = tabla.append_column("FechaBoletin", pa.array([fecha_boletin] * len(tabla), pa.date32()))
+            # En los jsonlines por día la provincia sale del PDF de cada registro
+            provincias = [datos_pdf(fila["Archivo"])[1] if "Archivo" in fila else provincia for fila in bloque]
+            tabla = tabla.append_column("Provincia", pa.array(provincias, pa.string()))
+            filas += len(tabla)
+            yield from tabla.to_batches()
+    if formato == "parquet":
+        formato_ds = ds.ParquetFileFormat()
+        opciones = formato_ds.make_write_options(compression="zstd")
+    else:
+        formato_ds = ds.IpcFileFormat()
+        opciones = formato_ds.make_write_options(compression="zstd")
+    path = RUTA_COLUMNAR.format(formato=formato)
+    escritos = []
+    base = os.path.splitext(nombre_pdf)[0] + (f"-p{parte:04d}" if parte is not None else "")
+    ds.write_dataset(lotes(), path, schema=esquema, format=formato_ds, file_options=opciones,
+                     partitioning=PARTICION_COLUMNAR,
+                     basename_template=f"{base}-{{i}}.{formato}",
+                     existing_data_behavior="overwrite_or_ignore",
+                     file_visitor=lambda archivo: escritos.append(archivo.path))
+    if not escritos and parte is None:
+        # write_dataset no escribe nada sin lotes: el fragmento vacío (con las columnas del
+        # dataset menos las de la partición, como los demás) se escribe directamente
+        particion = PARTICION_COLUMNAR.format((ds.field("FechaBoletin") == pa.scalar(fecha_boletin, pa.date32()))
+                                              & (ds.field("Provincia") == pa.scalar(provincia, pa.string())))[0]
+        vacio = os.path.join(path, particion, f"{base}-0.{formato}")
+        os.makedirs(os.path.dirname(vacio), exist_ok=True)
+        if formato == "parquet":
+            pq.write_table(ESQUEMA_COLUMNAR.empty_table(), vacio, compression="zstd")
+        else:
+            with pa.ipc.new_file(vacio, ESQUEMA_COLUMNAR, options=pa.ipc.IpcWriteOptions(compression="zstd")):
+                pass
+        escritos.append(vacio)
+    METRICAS.incrementar("wrangler_filas_escritas_total", filas, formato=formato)
+    logger.info(f"Archivo {nombre_pdf} añadido al dataset {path}")
+    return escritos[0] if escritos else None
+def guardar_en_base_datos(store, nombre_archivo, pares, fechas, logger):
+    """
+    Guarda en la base de datos los registros de un jsonlines, todos en una sola transacción
+    aunque lleguen en varios bloques. En los jsonlines por día cada registro se guarda con el
+    PDF indicado en su campo "Archivo", con su provincia.
+
+    Args:
+        store (CompanyStore): Base de datos de destino
+        nombre_archivo (str): Nombre del jsonlines de origen
+        pares (iterable): Tuplas (bloque leído, bloque limpio), ver `bloques_limpios`
+        fechas (dict): Fechas de los boletines (ver `fechas_boletines`)
+        logger (logging.Logger): Objeto de registro del proceso
+    Returns:
+        int: Número de registros guardados
+    """
+    nombre_pdf, _ = datos_pdf(nombre_archivo)
+    guardados = 0
+    with store.transaccion():
+        for lista_datos, new_lista in pares:
+            for archivo, grupo in itertools.groupby(zip(lista_datos, new_lista),
+                                                    key=lambda par: par[0].get("Archivo", nombre_pdf)):
+                brutos, limpios = zip(*grupo)
+                guardados += store.guardar(archivo, list(brutos), list(limpios), fechas.get(archivo),
+                                           datos_pdf(archivo)[1])
+    METRICAS.incrementar("wrangler_filas_escritas_total", guardados, formato="sqlite")
+    logger.info(f"Guardados {guardados} registros de {nombre_pdf} en {RUTA_BASE_DATOS}")
+    return guardados
+def borrar_salidas_huerfanas(estado, etapa, formato, actuales, logger):
+    """
+    Borra las salidas de los jsonlines que ya no existen. Al cambiar el Crawler entre un
+    jsonlines por PDF y uno por día (ver `Crawler.run`) se borran los del otro modo, y sus
+    CSV o fragmentos columnares repetirían los registros de los nuevos. En SQLite no hace
+    falta, porque los registros se guardan por PDF y se sobrescriben.
+
+    Args:
+        estado (StateLedger): Registro de estado con las salidas de la etapa
+        etapa (str): Etapa del registro ("wrangler-csv"...)
+        formato (str): "csv", "parquet", "arrow" o "sqlite"
+        actuales (set): Nombres lógicos (ver `utils.Jsonlines.nombre_logico`) de los jsonlines que existen
+        logger (logging.Logger): Objeto de registro del proceso
+    Returns:
+        int: Número de archivos de salida borrados
+    """
+    huerfanos = {a: salida for a, salida in estado.salidas(etapa).items() if a not in actuales}
+    borrados = 0
+    for a, salida in huerfanos.items():
+        if formato == "csv":
+            rutas = [salida]
+        elif formato in ("parquet", "arrow"):
+            # Un jsonlines puede tener fragmentos en varias particiones y, si se convirtió por
+            # trozos, uno por trozo: <base>[-p0001]-<i>.<formato>
+            base = os.path.splitext(datos_pdf(a)[0])[0]
+            patron = re.compile(re.escape(base) + r"(-p\d{4})?-\d+\." + formato)
+            rutas = [os.path.join(directorio, nombre)
+                     for directorio, _, nombres in os.walk(RUTA_COLUMNAR.format(formato=formato))
+                     for nombre in nombres if patron.fullmatch(nombre)]
+        else:
+            rutas = []
+        for ruta in rutas:
+            try:
+                os.remove(ruta)
+                borrados += 1
+            except FileNotFoundError:
+                pass
+        estado.olvidar(etapa, a)
+    if borrados:
+        logger.info(f"Borradas {borrados} salidas en {formato} de {len(huerfanos)} jsonlines que ya no existen")
+    return borrados
+def leer_jsonlines(archivo_path, logger, inicio=0, fin=None):
+    """
+    Lee un archivo jsonlines registro a registro, sin cargarlo entero en memoria. Usa orjson
+    si está instalado. Las líneas que no son JSON válido se cuentan y se omiten. Los .gz y
+    .zst se descomprimen al vuelo (y solo se leen enteros).
+
+    Args:
+        archivo_path (str): Ruta del archivo jsonlines
+        logger (logging.Logger): Objeto de registro del proceso
+        inicio (int, opcional): Byte en el que empieza la lectura; debe ser principio de línea
+        fin (int, opcional): Byte en el que termina la lectura (ver `trozos_archivo`)
+    Yields:
+        dict: Cada registro del archivo
+    Raises:
+        OSError: Si el archivo no se puede abrir
+    """
+    a = os.path.basename(archivo_path)
+    desde = f" (desde el byte {inicio})" if inicio else ""
+    with abrir(archivo_path) as archivo:
+        if inicio:
+            archivo.seek(inicio)
+        posicion = inicio
+        for num_linea, linea in enumerate(archivo, 1):
+            if fin is not None and posicion >= fin:
+                return
+            posicion += len(linea)
+            if not linea.strip():
+                continue
+            try:
+                yield decodificar_json(linea)
+            except json.JSONDecodeError as e:
+                METRICAS.log_muestreado(logger, "wrangler_json_invalido_total", nivel=logging.ERROR,
+                                        mensaje=f"Error al decodificar JSON en archivo {a}, línea {num_linea}{desde}: {e}")
+            except Exception as e:
+                METRICAS.log_muestreado(logger, "wrangler_fallos_linea_total", nivel=logging.ERROR,
+                                        mensaje=f"Error inesperado procesando línea {num_linea}{desde} en {a}: {e}")
+def trozos_archivo(archivo_path, tam_trozo=TAM_TROZO):
+    """
+    Divide un archivo en rangos de bytes de unos `tam_trozo` bytes que empiezan siempre al
+    principio de una línea, para repartir un jsonlines grande entre varios procesos.
+
+    Returns:
+        list: Tuplas (inicio, fin); una sola si el archivo no supera `tam_trozo` o si está
+        comprimido, ya que entonces no se puede empezar a leer a mitad.
+    """
+    tam = os.path.getsize(archivo_path)
+    if comprimido(archivo_path):
+        return [(0, None)]
+    limites = [0]
+    with open(archivo_path, "rb") as archivo:
+        while limites[-1] + tam_trozo < tam:
+            archivo.seek(limites[-1] + tam_trozo)
+            archivo.readline()  # Se avanza hasta el final de la línea en curso
+            if archivo.tell() >= tam:
+                break
+            limites.append(archivo.tell())
+    limites.append(tam)
+    return list(zip(limites, limites[1:]))
+def en_bloques(registros, tam_bloque=TAM_BLOQUE):
+    """
+    Agrupa un iterable de registros en listas de como mucho `tam_bloque` elementos.
+    """
+    registros = iter(registros)
+    while True:
+        bloque = list(itertools.islice(registros, tam_bloque))
+        if not bloque:
+            return
+        yield bloque
+def bloques_limpios(bloques, limpiar, logger, solo_diccionarios=False):
+    """
+    Limpia cada bloque de registros del Crawler.
+
+    Args:
+        bloques (iterable): Listas de registros leídos del jsonlines
+        limpiar (callable): `limpiar_datos` o `clean_datos`
+        logger (logging.Logger): Objeto de registro del proceso
+        solo_diccionarios (bool, opcional): Descarta antes los elementos que la limpieza
+            omitiría, para que cada registro limpio siga emparejado con el suyo del Crawler
+            (necesario para guardarlos en la base de datos)
+    Yields:
+        tuple: (bloque leído, bloque limpio)
+    """
+    for lista_datos in bloques:
+        if solo_diccionarios:
+            lista_datos = [datos for datos in lista_datos if isinstance(datos, dict)]
+            if not lista_datos:
+                continue
+        with METRICAS.cronometro("wrangler_limpieza_segundos"):
+            new_lista = limpiar(lista_datos,logger)
+        yield lista_datos, new_lista
+def unir_partes(partes, destino):
+    """
+    Concatena en orden los CSV parciales de un archivo en `destino`, con la cabecera solo
+    una vez, y borra las partes.
+    """
+    with open(destino, "wb") as salida:
+        for i, parte in enumerate(partes):
+            with open(parte, "rb") as entrada:
+                if i:
+                    entrada.readline()  # Cabecera repetida
+                shutil.copyfileobj(entrada, salida)
+            os.remove(parte)
+    return destino
+# Logger del proceso trabajador del pool
+_logger_trabajador = None
+def _iniciar_trabajador(cola_logs):
+    """Prepara el logger de un proceso trabajador para que envíe sus registros al proceso padre"""
+    global _logger_trabajador
+    _logger_trabajador = Logger.launch_worker_logging("Practica12", cola_logs)
+    METRICAS.reiniciar()  # No arrastrar las métricas que tuviera el padre al hacer fork
+def _convertir_trozo(archivo_path, a, parte, partes, inicio, fin, formato, vectorizado, tam_bloque, fecha_boletin):
+    """
+    Tarea de un proceso trabajador: lee, limpia y escribe un trozo de un jsonlines.
+
+    Returns:
+        tuple: (archivo, parte, salida, error, pid, métricas). `salida` es la ruta escrita, o
+        la lista de pares (leídos, limpios) con formato "sqlite", que guarda el proceso padre
+        para que haya un solo escritor. `error` es None si el trozo se procesó bien.
+    """
+    logger = _logger_trabajador
+    limpiar = limpiar_datos if vectorizado else clean_datos
+    salida = error = None
+    try:
+        bloques = en_bloques(leer_jsonlines(archivo_path, logger, inicio, fin), tam_bloque)
+        primero = next(bloques, None)
+        if primero is None and partes == 1:
+            logger.info(f"{a} no tiene registros, se escribe una salida vacía")
+        pares = bloques_limpios(itertools.chain([primero] if primero else [], bloques), limpiar, logger,
+                                formato == "sqlite")
+        if formato == "csv":
+            salida = stream_to_csv(a if partes == 1 else f"{a}.parte{parte:04d}",
+                                   (new_lista for _, new_lista in pares), logger, campos_csv(a))
+        elif formato == "sqlite":
+            salida = list(pares)
+        else:
+            salida = stream_to_columnar(a, (new_lista for _, new_lista in pares), logger, formato,
+                                        fecha_boletin, None if partes == 1 else parte)
+    except Exception as e:
+        error = str(e)
+        logger.error(f"Error al procesar datos del archivo {a} (parte {parte + 1} de {partes}): {e}")
+    if error is not None:
+        METRICAS.incrementar("wrangler_errores_total")
+    return a, parte, salida, error, os.getpid(), _instantanea_trabajador()
+def en_orden_acotado(pool, funcion, tareas, en_vuelo):
+    """
+    Como `pool.map`, pero sin enviar todas las tareas de golpe: como mucho hay `en_vuelo`
+    tareas enviadas cuyo resultado no se ha recogido, de forma que los resultados no se
+    acumulan en el proceso padre mientras este los va guardando.
+
+    Args:
+        pool (concurrent.futures.Executor): Pool de procesos
+        funcion (callable): Tarea que se ejecuta en cada trabajador
+        tareas (iterable): Tuplas de argumentos de cada tarea
+        en_vuelo (int): Máximo de tareas enviadas sin recoger
+    Returns:
+        generator: Resultados de las tareas, en el mismo orden en que se enviaron
+    """
+    enviadas = deque()
+    for argumentos in tareas:
+        if len(enviadas) >= en_vuelo:
+            yield enviadas.popleft().result()
+        enviadas.append(pool.submit(funcion, *argumentos))
+    while enviadas:
+        yield enviadas.popleft().result()
+def _instantanea_trabajador():
+    """Métricas acumuladas por el trabajador desde la tarea anterior, para sumarlas en el padre"""
+    instantanea = METRICAS.instantanea()
+    METRICAS.reiniciar()
+    return instantanea
+def convertir_en_paralelo(pendientes, formato, vectorizado, tam_bloque, fechas, store, estado, etapa,
+                          logger_instance, logger, trabajadores, tam_trozo=TAM_TROZO):
+    """
+    Reparte los archivos, o los trozos de los archivos grandes (ver `trozos_archivo`), entre
+    un pool de procesos. Los resultados se recogen en el mismo orden en que se envían, así
+    que la salida no depende de qué trabajador acabe antes: los CSV parciales de un archivo
+    se unen en orden en su CSV, los registros de la base de datos se insertan en orden y los
+    trozos de un dataset Parquet / Arrow quedan como fragmentos numerados de su partición.
+
+    Solo hay `TAREAS_EN_VUELO` trozos por trabajador enviados sin recoger (ver
+    `en_orden_acotado`), y con SQLite cada trozo (de `TAM_TROZO_SQLITE` bytes como mucho) se
+    guarda en cuanto llega, así que la memoria del proceso padre no depende del número de
+    archivos. Un jsonlines comprimido no se puede trocear y llega entero.
+
+    Args:
+        pendientes (list): Tuplas (nombre, ruta) de los jsonlines a convertir, ya ordenadas
+        estado (StateLedger): Registro de estado donde se apuntan los archivos convertidos
+        trabajadores (int): Número de procesos
+        tam_trozo (int, opcional): Tamaño en bytes a partir del cual un archivo se reparte
+    Returns:
+        dict: PID de cada trabajador -> Counter con los trozos procesados ("trozos"), los
+        que fallaron ("trozos_fallidos") y los registros o líneas con error ("registros_con_error")
+    """
+    tareas = []
+    rutas = dict(pendientes)
+    if formato == "sqlite":
+        tam_trozo = min(tam_trozo, TAM_TROZO_SQLITE)
+    for a, archivo_path in pendientes:
+        rangos = trozos_archivo(archivo_path, tam_trozo)
+        fecha = fechas.get(a[:-len(".json")])
+        tareas += [(archivo_path, a, parte, len(rangos), inicio, fin, formato, vectorizado, tam_bloque, fecha)
+                   for parte, (inicio, fin) in enumerate(rangos)]
+    por_trabajador = {}
+    with multiprocessing.Manager() as gestor:
+        cola_logs = gestor.Queue()
+        listener = logger_instance.launch_queue_listener(cola_logs)
+        try:
+            with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_trabajador,
+                                     initargs=(cola_logs,)) as pool:
+                resultados = en_orden_acotado(pool, _convertir_trozo, tareas, TAREAS_EN_VUELO * trabajadores)
+                # Los trozos de cada archivo llegan seguidos y en orden
+                for a, grupo in itertools.groupby(resultados, key=lambda resultado: resultado[0]):
+                    salidas = []
+                    fallido = False
+                    # Con SQLite los trozos de un archivo se guardan en una sola transacción
+                    with store.transaccion() if formato == "sqlite" else contextlib.nullcontext():
+                        for _, _, salida, error, pid, instantanea in grupo:
+                            METRICAS.fusionar(instantanea)
+                            cuenta = por_trabajador.setdefault(pid, Counter())
+                            cuenta["trozos"] += 1
+                            cuenta["trozos_fallidos"] += error is not None
+                            cuenta["registros_con_error"] += sum(valor for (nombre, _), valor in instantanea["contadores"]
+                                                                 if nombre in CONTADORES_ERROR)
+                            fallido = fallido or error is not None
+                            if formato != "sqlite":
+                                salidas.append(salida)
+                            elif not fallido:
+                                # Los registros del trozo se guardan ya, sin esperar al resto del archivo
+                                try:
+                                    guardar_en_base_datos(store, a, salida, fechas, logger)
+                                except Exception as e:
+                                    fallido = True
+                                    METRICAS.incrementar("wrangler_errores_total")
+                                    logger.error(f"Error al procesar datos del archivo {a}: {e}")
+                        if fallido and formato == "sqlite":
+                            # Si falla un trozo no queda guardado ninguno de los anteriores
+                            store.deshacer()
+                    if fallido:
+                        if formato == "csv" and len(salidas) > 1:
+                            for parte in salidas:
+                                if parte is not None and os.path.exists(parte):
+                                    os.remove(parte)
+                        continue
+                    archivo_path = rutas[a]
+                    try:
+                        if formato == "csv":
+                            salida = salidas[0] if len(salidas) == 1 else unir_partes(
+                                salidas, os.path.join(os.path.dirname(salidas[0]), f"{a}.csv"))
+                        elif formato == "sqlite":
+                            salida = RUTA_BASE_DATOS
+                        else:
+                            salida = next((salida for salida in salidas if salida is not None), None)
+                        if salida is not None:
+                            estado.registrar(etapa, a, archivo_path, salida, VERSION_WRANGLER)
+                    except Exception as e:
+                        METRICAS.incrementar("wrangler_errores_total")
+                        logger.error(f"Error al procesar datos del archivo {a}: {e}")
+        finally:
+            listener.stop()
+    # En una sola línea para que el log agrupado no junte los resúmenes de varios trabajadores
+    logger.info("Resumen por trabajador: " + "; ".join(
+        f"{pid}: {cuenta['trozos']} trozos, {cuenta['trozos_fallidos']} fallidos, "
+        f"{cuenta['registros_con_error']} registros con error" for pid, cuenta in sorted(por_trabajador.items())))
+    return por_trabajador
+def run(vectorizado=True, formato="csv", forzar=False, tam_bloque=TAM_BLOQUE, trabajadores=1, tam_trozo=TAM_TROZO):
     """
     Procesa archivos jsonlines de un directorio, limpia los datos y los convierte a CSV.
     Incluye manejo de errores para operaciones de archivos y procesamiento de datos.
+
+    Cada archivo se lee, se limpia y se escribe por bloques de `tam_bloque` registros, de
+    modo que la memoria usada no depende del tamaño del archivo (se pueden convertir
+    jsonlines mensuales consolidados) y la salida es la misma que procesándolo entero.
+
+    Args:
+        vectorizado (bool, opcional): Limpia los bloques grandes con `clean_datos_vectorizado`
+            y los pequeños con `clean_datos` (por defecto, ver `limpiar_datos`). Con False se
+            usa siempre el `clean_datos` registro a registro.
+        formato (str, opcional): "csv" (por defecto, un CSV por archivo), "parquet" o
+            "arrow" (dataset columnar particionado, ver `list_to_columnar`) o "sqlite" (base
+            de datos consolidada e indexada en data/outputs/borme.db, ver `consultar`).
+        forzar (bool, opcional): Convierte todos los archivos aunque el registro de estado
+            (`utils.Estado.StateLedger`) indique que su salida en este formato ya está al día.
+        tam_bloque (int, opcional): Registros por bloque.
+        trabajadores (int, opcional): Número de procesos. Con 1 (por defecto) se convierte
+            todo en serie en el proceso actual; con None uno por núcleo. Con varios, los
+            archivos y los trozos de los archivos grandes se reparten entre un pool de
+            procesos (ver `convertir_en_paralelo`) y la salida es la misma que en serie.
+        tam_trozo (int, opcional): Tamaño en bytes a partir del cual un archivo se reparte
+            entre varios procesos.
     """
+    limpiar = limpiar_datos if vectorizado else clean_datos
     dir="../data/logs/Wranglerlogs"
     logger_instance=Logger("Practica12",dir)
-    logger=logger_instance.launch_logging()
+    logger=logger_instance.launch_logging(queued=True)
+    METRICAS.reiniciar()
+    inicio = time.perf_counter()
+    store = None
+    estado = StateLedger(RUTA_ESTADO)
+    etapa = f"wrangler-{formato}"
     try:
+        fechas = fechas_boletines() if formato != "csv" else {}
+        if formato == "sqlite":
+            store = CompanyStore(RUTA_BASE_DATOS)
         ruta = "../data/outputs/jsonlines"
         # Verificar si el directorio existe
         if not os.path.exists(ruta):
             raise FileNotFoundError(f"El directorio {ruta} no existe")
         # Listar archivos del directorio
         try:
-            archivos = os.listdir(ruta)
+            archivos = sorted(os.listdir(ruta))
             if not archivos:
                 logger.error(f"Advertencia: No se encontraron archivos en {ruta}")
                 return
         except PermissionError as e:
             logger.error(f"Error de permisos al acceder al directorio: {e}")
             return
+        borrar_salidas_huerfanas(estado, etapa, formato, {nombre_logico(nombre) for nombre in archivos}, logger)
+        # Solo se convierten los jsonlines que el Crawler terminó de escribir (ver `utils.Jsonlines`)
+        pendientes = []
+        for nombre in archivos:
+            a = nombre_logico(nombre)
+            if a is None:
+                continue
+            archivo_path = os.path.join(ruta, nombre)
+            if completo(archivo_path):
+                pendientes.append((a, archivo_path))
+            else:
+                METRICAS.incrementar("wrangler_incompletos_total")
+                logger.warning(f"{nombre} está incompleto o no tiene el sidecar de cuenta, se omite "
+                               f"(se regenera al volver a ejecutar el Crawler)")
+        archivos = [a for a, _ in pendientes]
+        if not forzar:
+            pendientes = [(a, archivo_path) for a, archivo_path in pendientes
+                          if not estado.al_dia(etapa, a, archivo_path, VERSION_WRANGLER)]
+        omitidos = len(archivos) - len(pendientes)
+        trabajadores = trabajadores or os.cpu_count() or 1
+        if trabajadores > 1 and pendientes:
+            convertir_en_paralelo(pendientes, formato, vectorizado, tam_bloque, fechas, store, estado, etapa,
+                                  logger_instance, logger, trabajadores, tam_trozo)
+            pendientes = []
         # Procesar cada archivo
-        for a in archivos:
-            lista_datos = []
-            archivo_path = os.path.join(ruta, a)
+        for a, archivo_path in pendientes:
             try:
-                with open(archivo_path, 'r', encoding='utf-8') as archivo:
-                    for num_linea, linea in enumerate(archivo, 1):
-                        try:
-                            datos = json.loads(linea.strip())
-                            lista_datos.append(datos)
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Error al decodificar JSON en archivo {a}, línea {num_linea}: {e}")
-                            continue
-                        except Exception as e:
-                            logger.error(f"Error inesperado procesando línea {num_linea} en {a}: {e}")
-                            continue
-                # Procesar datos solo si se cargaron correctamente
-                if lista_datos:
-                    try:
-                        new_lista = clean_datos(lista_datos,logger)
-                        list_to_csv(a, new_lista,logger)
-                    except Exception as e:
-                        logger.error(f"Error al procesar datos del archivo {a}: {e}")
-                else:
-                    logger.error(f"No se pudieron cargar datos del archivo {a}")
-                    
+                bloques = en_bloques(leer_jsonlines(archivo_path, logger), tam_bloque)
+                primero = next(bloques, None)
+                if primero is None:
+                    # Un jsonlines completo sin registros también tiene su salida, vacía, y queda registrado
+                    logger.info(f"{a} no tiene registros, se escribe una salida vacía")
+                try:
+                    pares = bloques_limpios(itertools.chain([primero] if primero is not None else [], bloques),
+                                            limpiar, logger, formato == "sqlite")
+                    if formato == "csv":
+                        salida = stream_to_csv(a, (new_lista for _, new_lista in pares), logger, campos_csv(a))
+                    elif formato == "sqlite":
+                        guardar_en_base_datos(store, a, pares, fechas, logger)
+                        salida = RUTA_BASE_DATOS
+                    else:
+                        salida = stream_to_columnar(a, (new_lista for _, new_lista in pares), logger, formato,
+                                                    fechas.get(a[:-len(".json")]))
+                    if salida is not None:
+                        estado.registrar(etapa, a, archivo_path, salida, VERSION_WRANGLER)
+                except Exception as e:
+                    logger.error(f"Error al procesar datos del archivo {a}: {e}")
             except FileNotFoundError:
                 logger.error(f"No se encontró el archivo: {archivo_path}")
             except PermissionError:
                 logger.error(f"Error de permisos al acceder al archivo: {archivo_path}")
             except Exception as e:
                 logger.error(f"Error inesperado al procesar el archivo {a}: {e}")
+        if omitidos:
+            logger.info(f"{omitidos} archivos ya convertidos a {formato} con la versión {VERSION_WRANGLER}, se omiten")
     except Exception as e:
         logger.error(f"Error general en la ejecución: {e}")
+    finally:
+        estado.guardar()
+        if store is not None:
+            store.cerrar()
+        METRICAS.observar("etapa_segundos", time.perf_counter() - inicio, etapa="Wrangler")
+        logger.info(f"Métricas guardadas en {METRICAS.volcar('Wrangler')}")
+        logger_instance.stop_logging()
+def consultar(tipo, *argumentos, ruta=RUTA_BASE_DATOS):
+    """
+    Consulta la base de datos generada con `run(formato="sqlite")` e imprime una línea JSON
+    por registro encontrado.
+
+    Args:
+        tipo (str): Tipo de consulta:
+            - "NOMBRE <nombre>": todos los actos de una empresa.
+            - "ID <id>": registros con ese Id de inscripción.
+            - "CIUDAD <ciudad> <desde> <hasta>": constituciones en una ciudad entre dos
+              fechas de boletín (aaaa-mm-dd).
+            - "TEXTO <consulta>": búsqueda de texto completo en nombre y objeto social.
+        *argumentos (str): Argumentos de la consulta.
+        ruta (str, opcional): Base de datos a consultar.
+    Returns:
+        list: Registros encontrados.
+    Raises:
+        FileNotFoundError: Si la base de datos no existe.
+        ValueError: Si el tipo de consulta no existe.
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"La base de datos {ruta} no existe, ejecute antes WRANGLER SQLITE")
+    consultas = {"NOMBRE": "por_nombre", "ID": "por_id", "CIUDAD": "constituciones", "TEXTO": "buscar"}
+    if tipo.upper() not in consultas:
+        raise ValueError(f"Consulta no soportada: {tipo}")
+    with CompanyStore(ruta) as store:
+        resultados = getattr(store, consultas[tipo.upper()])(*argumentos)
+    for fila in resultados:
+        print(json.dumps(fila, ensure_ascii=False))
+    return resultados
 if __name__ == "__main__":
     run()
\ No newline at end of file
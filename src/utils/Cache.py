@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import json
+import os
+class TextCache:
+    def __init__(self, directorio, max_bytes=1024 ** 3):
+        '''
+        Caché en disco del texto extraído de los PDF, direccionada por contenido: la clave
+        es el sha256 del PDF más la versión del extractor, así que un PDF repetido o ya
+        procesado no se vuelve a decodificar y un cambio del extractor invalida las entradas.
+        Cuando supera `max_bytes` se eliminan las entradas usadas hace más tiempo (LRU).
+        Args:
+            directorio (str): Carpeta donde se guardan las entradas
+            max_bytes (int): Tamaño máximo aproximado de la caché en disco
+        '''
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+    @staticmethod
+    def clave(contenido, version):
+        '''
+        Calcula la clave de un PDF.
+        Args:
+            contenido (bytes): Bytes del PDF (o cualquier objeto con interfaz de buffer)
+            version (str): Versión del extractor que genera las líneas
+        Returns:
+            str: Clave de la entrada
+        '''
+        return f"{hashlib.sha256(contenido).hexdigest()}-{version}"
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], f"{clave}.json.gz")
+    def obtener(self, clave):
+        '''
+        Devuelve las líneas guardadas para la clave y el número de páginas del PDF, o None si
+        no están en la caché. Las entradas antiguas, que solo guardaban las líneas, cuentan
+        como ausentes y se reescriben al volver a extraer el PDF.
+        Returns:
+            tuple | None: (lineas, paginas)
+        '''
+        ruta = self._ruta(clave)
+        try:
+            with gzip.open(ruta, "rt", encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entrada, dict):
+            return None
+        # Se actualiza la fecha de modificación para que la expulsión sea LRU
+        try:
+            os.utime(ruta)
+        except OSError:
+            pass
+        return entrada["lineas"], entrada["paginas"]
+    def guardar(self, clave, lineas, paginas):
+        '''
+        Guarda las líneas de un PDF y su número de páginas, para que las métricas cuenten
+        igual las páginas de un PDF leído de la caché. Se escribe a un temporal y se renombra
+        para que dos procesos que guardan la misma clave no dejen una entrada a medias.
+        '''
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with gzip.open(temporal, "wt", encoding="utf-8", compresslevel=3) as f:
+            json.dump({"paginas": paginas, "lineas": lineas}, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+    def recortar(self):
+        '''
+        Elimina las entradas menos usadas hasta dejar la caché por debajo de `max_bytes`.
+        Returns:
+            int: Número de entradas eliminadas
+        '''
+        entradas = []
+        total = 0
+        for raiz, _, archivos in os.walk(self.directorio):
+            for archivo in archivos:
+                ruta = os.path.join(raiz, archivo)
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    continue
+                entradas.append((estado.st_mtime, estado.st_size, ruta))
+                total += estado.st_size
+        eliminadas = 0
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except OSError:
+                continue
+            total -= tamano
+            eliminadas += 1
+        return eliminadas
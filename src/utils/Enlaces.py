@@ -0,0 +1,141 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+RUTA_INDICE = "../data/outputs/links.db"
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS enlaces (
+    url TEXT NOT NULL UNIQUE,
+    archivo TEXT NOT NULL,
+    fecha TEXT,
+    seccion TEXT,
+    provincia TEXT,
+    descargado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_enlaces_fecha ON enlaces (fecha);
+CREATE INDEX IF NOT EXISTS idx_enlaces_pendientes ON enlaces (descargado, fecha);
+CREATE TABLE IF NOT EXISTS fechas (
+    fecha TEXT PRIMARY KEY,
+    enlaces INTEGER NOT NULL,
+    descubierta TEXT NOT NULL
+);
+'''
+# Fecha del boletín en la ruta de boe.es: .../borme/dias/2024/09/02/pdfs/...
+PATRON_FECHA_URL = re.compile(r"/dias/(\d{4})/(\d{2})/(\d{2})/")
+# Nombre de los PDF del BORME: BORME-<sección>-<año>-<número>-<provincia>.pdf
+PATRON_NOMBRE_PDF = re.compile(r"BORME-(?P<seccion>[A-Z])-\d{4}-\d+-(?P<provincia>\d+)\.pdf")
+def fecha_url(url):
+    '''
+    Devuelve la fecha del boletín que aparece en la URL de un PDF, o None si no la lleva.
+    '''
+    coincidencia = PATRON_FECHA_URL.search(url)
+    if coincidencia is None:
+        return None
+    return date(*(int(parte) for parte in coincidencia.groups()))
+class LinkIndex:
+    def __init__(self, ruta):
+        '''
+        Índice SQLite de los enlaces descubiertos por el Spyder, con la fecha, la sección y
+        la provincia de cada PDF. La URL es única, así que volver a descubrir una fecha no
+        duplica enlaces, y guarda qué fechas ya se consultaron y qué enlaces ya se
+        descargaron, para que una recarga de un periodo largo solo pida lo que falta.
+        Args:
+            ruta (str): Ruta del archivo de la base de datos
+        '''
+        self.ruta = ruta
+        directorio = os.path.dirname(ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+    def __enter__(self):
+        return self
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    def cerrar(self):
+        self.conexion.close()
+    def registrar(self, enlaces, fecha=None):
+        '''
+        Añade enlaces al índice; los que ya estaban se ignoran.
+
+        Args:
+            enlaces (list): URLs de los PDF
+            fecha (datetime.date, opcional): Fecha consultada. Si se indica y hay enlaces,
+                la fecha queda como descubierta (ver `fechas_descubiertas`). Si no, la fecha
+                de cada enlace se toma de su URL.
+        Returns:
+            int: Número de enlaces nuevos
+        '''
+        filas = []
+        for url in enlaces:
+            url = url.strip()
+            if not url:
+                continue
+            archivo = os.path.basename(url)
+            pdf = PATRON_NOMBRE_PDF.fullmatch(archivo)
+            fecha_enlace = fecha or fecha_url(url)
+            filas.append((url, archivo, fecha_enlace.isoformat() if fecha_enlace else None,
+                          pdf["seccion"] if pdf else None, pdf["provincia"] if pdf else None))
+        with self.conexion:
+            antes = self.conexion.total_changes
+            self.conexion.executemany("INSERT OR IGNORE INTO enlaces (url, archivo, fecha, seccion, provincia) "
+                                      "VALUES (?, ?, ?, ?, ?)", filas)
+            nuevos = self.conexion.total_changes - antes
+            if fecha is not None and filas:
+                self.conexion.execute("INSERT OR REPLACE INTO fechas (fecha, enlaces, descubierta) VALUES (?, ?, ?)",
+                                      (fecha.isoformat(), len(filas), datetime.now().isoformat(timespec="seconds")))
+        return nuevos
+    def importar(self, ruta_enlaces):
+        '''
+        Añade al índice los enlaces de un archivo de texto (una URL por línea, como el
+        antiguo links.txt), con la fecha que lleve cada URL.
+        Returns:
+            int: Número de enlaces nuevos
+        '''
+        with open(ruta_enlaces, "r", encoding="utf-8") as archivo:
+            return self.registrar(archivo)
+    @staticmethod
+    def _rango(desde, hasta):
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append("fecha >= ?")
+            parametros.append(str(desde))
+        if hasta is not None:
+            condiciones.append("fecha <= ?")
+            parametros.append(str(hasta))
+        return condiciones, parametros
+    def fechas_descubiertas(self, desde=None, hasta=None):
+        '''
+        Devuelve las fechas (aaaa-mm-dd) cuyo sumario ya se consultó con resultado.
+        '''
+        condiciones, parametros = self._rango(desde, hasta)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return {fila[0] for fila in self.conexion.execute(f"SELECT fecha FROM fechas{donde}", parametros)}
+    def entre(self, desde=None, hasta=None):
+        '''
+        Devuelve los enlaces publicados entre dos fechas (aaaa-mm-dd, incluidas), por orden
+        de fecha, como diccionarios con url, archivo, fecha, seccion, provincia y descargado.
+        '''
+        condiciones, parametros = self._rango(desde, hasta)
+        donde = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        cursor = self.conexion.execute(f"SELECT url, archivo, fecha, seccion, provincia, descargado FROM enlaces"
+                                       f"{donde} ORDER BY fecha, rowid", parametros)
+        columnas = [columna[0] for columna in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor]
+    def pendientes(self, desde=None, hasta=None):
+        '''
+        Devuelve las URLs que aún no se han descargado, por orden de fecha.
+        '''
+        condiciones, parametros = self._rango(desde, hasta)
+        donde = " AND ".join(["descargado = 0"] + condiciones)
+        return [fila[0] for fila in self.conexion.execute(
+            f"SELECT url FROM enlaces WHERE {donde} ORDER BY fecha, rowid", parametros)]
+    def marcar_descargados(self, urls):
+        '''
+        Marca como descargadas las URLs indicadas.
+        '''
+        with self.conexion:
+            self.conexion.executemany("UPDATE enlaces SET descargado = 1 WHERE url = ?",
+                                      [(url.strip(),) for url in urls])
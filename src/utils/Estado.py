@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from utils.Manifest import sha256_archivo
+RUTA_ESTADO = "../data/outputs/state.json"
+def huella(ruta):
+    '''
+    Calcula la huella de un archivo: tamaño, fecha de modificación y sha256.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Returns:
+        dict: Huella del archivo.
+    '''
+    estado = os.stat(ruta)
+    return {"size": estado.st_size, "mtime_ns": estado.st_mtime_ns, "sha256": sha256_archivo(ruta)}
+class StateLedger:
+    def __init__(self, ruta):
+        '''
+        Registro persistente del trabajo hecho por cada etapa. Guarda por cada artefacto la
+        huella del archivo de entrada, el archivo de salida y la versión de la etapa que lo
+        generó, de forma que en la siguiente ejecución solo se repite lo que ha cambiado.
+
+        Como la entrada se compara por contenido, un cambio de versión de una etapa solo
+        obliga a rehacer en las etapas siguientes los artefactos cuya salida cambió de verdad.
+        Args:
+            ruta (str): Ruta del archivo JSON donde se guarda el registro
+        '''
+        self.ruta = ruta
+        self.entradas = {}
+        self._lock = threading.Lock()
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                self.entradas = json.load(f)
+    @staticmethod
+    def _clave(etapa, artefacto):
+        return f"{etapa}:{artefacto}"
+    def al_dia(self, etapa, artefacto, ruta_entrada, version, ruta_salida=None):
+        '''
+        Comprueba si un artefacto ya está procesado con la entrada y la versión actuales.
+
+        Si el tamaño y la fecha de modificación de la entrada no han cambiado se da por buena
+        sin releerla; en otro caso se recalcula el sha256 y se compara con el registrado.
+
+        Args:
+            etapa (str): Nombre de la etapa ("crawler", "wrangler-csv"...)
+            artefacto (str): Identificador del artefacto dentro de la etapa
+            ruta_entrada (str): Archivo del que se genera la salida
+            version (str): Versión actual de la etapa
+            ruta_salida (str, opcional): Archivo o directorio que debería haberse generado.
+                Si no se indica solo se comprueba que siga existiendo el registrado.
+
+        Returns:
+            bool: True si no hace falta volver a procesarlo.
+        '''
+        with self._lock:
+            entrada = self.entradas.get(self._clave(etapa, artefacto))
+        if entrada is None or entrada["version"] != version:
+            return False
+        if ruta_salida is not None and entrada["salida"] != ruta_salida:
+            return False
+        if not os.path.exists(ruta_entrada) or not os.path.exists(entrada["salida"]):
+            return False
+        estado = os.stat(ruta_entrada)
+        registrada = entrada["entrada"]
+        if estado.st_size != registrada["size"]:
+            return False
+        if estado.st_mtime_ns == registrada["mtime_ns"]:
+            return True
+        if sha256_archivo(ruta_entrada) != registrada["sha256"]:
+            return False
+        with self._lock:
+            registrada["mtime_ns"] = estado.st_mtime_ns
+        return True
+    def registrar(self, etapa, artefacto, ruta_entrada, ruta_salida, version):
+        '''
+        Guarda en memoria que el artefacto se ha procesado con la entrada actual.
+        '''
+        valor = {"entrada": huella(ruta_entrada), "salida": ruta_salida, "version": version}
+        with self._lock:
+            self.entradas[self._clave(etapa, artefacto)] = valor
+    def salidas(self, etapa):
+        '''
+        Returns:
+            dict: Artefacto -> archivo de salida registrado, de todos los artefactos de la etapa.
+        '''
+        prefijo = self._clave(etapa, "")
+        with self._lock:
+            return {clave[len(prefijo):]: entrada["salida"] for clave, entrada in self.entradas.items()
+                    if clave.startswith(prefijo)}
+    def olvidar(self, etapa, artefacto):
+        '''
+        Borra del registro en memoria un artefacto que ya no existe.
+        '''
+        with self._lock:
+            self.entradas.pop(self._clave(etapa, artefacto), None)
+    def guardar(self):
+        '''
+        Escribe el registro en disco de forma atómica.
+        '''
+        with self._lock:
+            contenido = json.dumps(self.entradas, ensure_ascii=False, indent=1)
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, self.ruta)
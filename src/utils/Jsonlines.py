@@ -0,0 +1,204 @@
+import gzip
+import io
+import json
+import os
+try:
+    import orjson
+    def codificar_json(registro):
+        return orjson.dumps(registro)
+except ImportError:  # Sin orjson se usa el codificador de la biblioteca estándar
+    def codificar_json(registro):
+        return json.dumps(registro, ensure_ascii=False).encode("utf-8")
+try:
+    import zstandard
+except ImportError:  # zstandard solo hace falta para escribir o leer jsonlines .zst
+    zstandard = None
+# Extensión que añade cada compresión al nombre del jsonlines (<pdf>.json.gz, <pdf>.json.zst)
+EXTENSIONES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+EXTENSION_CUENTA = ".count"
+EXTENSION_TEMPORAL = ".tmp"
+# Registros que se serializan juntos y se escriben con una sola llamada
+TAM_LOTE = 1000
+def ruta_comprimida(ruta, compresion=None):
+    '''
+    Ruta del jsonlines `ruta` (<pdf>.json) escrito con la compresión indicada.
+    '''
+    if compresion not in EXTENSIONES:
+        raise ValueError(f"Compresión no soportada: {compresion}")
+    return ruta + EXTENSIONES[compresion]
+def comprobar_compresion(compresion):
+    '''
+    Comprueba que se puede escribir con la compresión indicada.
+    Raises:
+        ValueError: Si la compresión no está soportada
+        ImportError: Si es zstd y zstandard no está instalado
+    '''
+    if compresion not in EXTENSIONES:
+        raise ValueError(f"Compresión no soportada: {compresion}")
+    if compresion == "zstd" and zstandard is None:
+        raise ImportError("Hace falta zstandard para comprimir con zstd")
+def nombre_logico(nombre):
+    '''
+    Nombre del jsonlines sin la extensión de compresión (BORME-A-2024-168-03.pdf.json.gz ->
+    BORME-A-2024-168-03.pdf.json), o None si el archivo no es un jsonlines (sidecars de
+    cuenta, temporales...).
+    '''
+    for extension in EXTENSIONES.values():
+        if extension and nombre.endswith(extension):
+            nombre = nombre[:-len(extension)]
+            break
+    return nombre if nombre.endswith(".json") else None
+def comprimido(ruta):
+    '''
+    Indica si el jsonlines está comprimido, y por tanto no se puede leer por rangos de bytes.
+    '''
+    return any(extension and ruta.endswith(extension) for extension in EXTENSIONES.values())
+def abrir(ruta):
+    '''
+    Abre un jsonlines para leerlo en binario, descomprimiéndolo según su extensión.
+    Raises:
+        OSError: Si el archivo no se puede abrir
+        ImportError: Si es un .zst y zstandard no está instalado
+    '''
+    if ruta.endswith(EXTENSIONES["gzip"]):
+        return gzip.open(ruta, "rb")
+    if ruta.endswith(EXTENSIONES["zstd"]):
+        if zstandard is None:
+            raise ImportError(f"Hace falta zstandard para leer {ruta}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(ruta, "rb"), closefd=True))
+    return open(ruta, "rb")
+def leer_cuenta(ruta):
+    '''
+    Lee el sidecar `<ruta>.count` que deja `JsonlinesWriter` al terminar un archivo.
+    Returns:
+        dict: {"registros": n, "bytes": tamaño del archivo}, o None si no existe o no se entiende
+    '''
+    try:
+        with open(ruta + EXTENSION_CUENTA, "r", encoding="utf-8") as f:
+            cuenta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return cuenta if isinstance(cuenta, dict) and "registros" in cuenta and "bytes" in cuenta else None
+def completo(ruta):
+    '''
+    Comprueba que un jsonlines se terminó de escribir: tiene sidecar de cuenta y su tamaño
+    coincide con el anotado. Un archivo a medias, de otra escritura o de una versión anterior
+    del Crawler (sin sidecar) no está completo.
+    '''
+    cuenta = leer_cuenta(ruta)
+    try:
+        return cuenta is not None and os.path.getsize(ruta) == cuenta["bytes"]
+    except OSError:
+        return False
+def _escribir_atomico(ruta, contenido):
+    temporal = ruta + EXTENSION_TEMPORAL
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(contenido)
+    os.replace(temporal, ruta)
+def _borrar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+def borrar_jsonlines(ruta, excepto=None):
+    '''
+    Borra un jsonlines (<pdf>.json) en todas sus compresiones, con sus sidecars de cuenta.
+    Args:
+        ruta (str): Ruta del jsonlines sin extensión de compresión
+        excepto (str, opcional): Ruta comprimida que se conserva
+    '''
+    for extension in EXTENSIONES.values():
+        otra = ruta + extension
+        if otra != excepto:
+            _borrar(otra)
+            _borrar(otra + EXTENSION_CUENTA)
+class JsonlinesWriter:
+    def __init__(self, ruta, compresion=None, tam_lote=TAM_LOTE):
+        '''
+        Escritor de jsonlines a prueba de caídas. Los registros se serializan por lotes (con
+        orjson si está instalado) y cada lote se escribe con una sola llamada, opcionalmente
+        comprimido con gzip o zstd, en un archivo temporal. Al cerrar sin errores el temporal
+        se renombra de forma atómica al destino y se escribe el sidecar `<destino>.count` con
+        el número de registros y el tamaño del archivo, así que un archivo sin sidecar o que
+        no coincide con él es de una escritura que no terminó (ver `completo`). Si hay un
+        error el temporal se borra y el destino anterior, si lo había, queda intacto.
+
+        Se usa como gestor de contexto:
+            with JsonlinesWriter("../data/outputs/jsonlines/X.pdf.json", "gzip") as escritor:
+                escritor.escribir_todos(registros)
+        Args:
+            ruta (str): Ruta del jsonlines sin extensión de compresión (<pdf>.json)
+            compresion (str, opcional): None, "gzip" o "zstd"
+            tam_lote (int, opcional): Registros por escritura
+        Raises:
+            ValueError: Si la compresión no está soportada
+            ImportError: Si se pide zstd y zstandard no está instalado
+        '''
+        comprobar_compresion(compresion)
+        self.ruta_base = ruta
+        self.ruta = ruta_comprimida(ruta, compresion)
+        self.compresion = compresion
+        self.tam_lote = max(1, tam_lote)
+        self.registros = 0
+        self._lote = []
+        self._archivo = None
+        self._salida = None
+    def __enter__(self):
+        self._archivo = open(self.ruta + EXTENSION_TEMPORAL, "wb")
+        if self.compresion == "gzip":
+            self._salida = gzip.GzipFile(fileobj=self._archivo, mode="wb", mtime=0)
+        elif self.compresion == "zstd":
+            self._salida = zstandard.ZstdCompressor().stream_writer(self._archivo, closefd=False)
+        else:
+            self._salida = self._archivo
+        return self
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
+    def escribir(self, registro):
+        self._lote.append(codificar_json(registro))
+        if len(self._lote) >= self.tam_lote:
+            self._volcar()
+    def escribir_todos(self, registros):
+        for registro in registros:
+            self.escribir(registro)
+    def _volcar(self):
+        if self._lote:
+            self._salida.write(b"\n".join(self._lote) + b"\n")
+            self.registros += len(self._lote)
+            self._lote = []
+    def cerrar(self):
+        '''
+        Termina el archivo: vuelca el último lote, lo lleva a disco, lo renombra al destino y
+        escribe el sidecar. Borra las versiones del mismo jsonlines con otra compresión.
+        '''
+        try:
+            self._volcar()
+            if self._salida is not self._archivo:
+                self._salida.close()
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._archivo.close()
+        except BaseException:
+            self.descartar()
+            raise
+        # Sin el sidecar anterior, una caída antes de escribir el nuevo deja el archivo como incompleto
+        _borrar(self.ruta + EXTENSION_CUENTA)
+        os.replace(self.ruta + EXTENSION_TEMPORAL, self.ruta)
+        _escribir_atomico(self.ruta + EXTENSION_CUENTA, json.dumps(
+            {"registros": self.registros, "bytes": os.path.getsize(self.ruta)}))
+        borrar_jsonlines(self.ruta_base, excepto=self.ruta)
+    def descartar(self):
+        '''
+        Abandona la escritura y borra el temporal.
+        '''
+        try:
+            if self._salida is not None and self._salida is not self._archivo:
+                self._salida.close()
+        except Exception:
+            pass
+        if self._archivo is not None:
+            self._archivo.close()
+        _borrar(self.ruta + EXTENSION_TEMPORAL)
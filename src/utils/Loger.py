@@ -1,38 +1,225 @@
-import logging
-class Logger:
-    def __init__(self, project_name, logs_pathname):
-        '''
-        Initializes the Logger with project name and log file path.
-        Args:
-            project_name (str): The name of the project that will be displayed
-            logs_pathname (str): Where the log files will be stored
-        '''
-        self.project_name = project_name
-        self.logs_pathname = logs_pathname
-        self.logger = None
-    def launch_logging(self):
-        '''
-        Initializes and launches the logger with the given name
-
-        Returns:
-            logging.Logger: Configured logger instance
-        '''
-        # Define the logger's name and logging level.
-        self.logger = logging.getLogger(self.project_name)
-        self.logger.setLevel(logging.DEBUG)
-        # Console handler, for debug messages inside code
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        # File handler, for logging file creation and storage
-        file_handler = logging.FileHandler(self.logs_pathname)
-        file_handler.setLevel(logging.INFO)
-        # Create formatters and add them to the handlers
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
-        # Add the handlers to the logger (avoiding duplicate handlers)
-        if not self.logger.handlers:  # Prevent adding handlers multiple times
-            self.logger.addHandler(console_handler)
-            self.logger.addHandler(file_handler)
-        return self.logger
-    
\ No newline at end of file
+import atexit
+import logging
+import queue
+import re
+import time
+from logging.handlers import QueueHandler, QueueListener
+class AggregatingHandler(logging.Handler):
+    def __init__(self, targets, window=5.0, max_per_second=50):
+        '''
+        Handler that sits in front of the real handlers in the background writer thread.
+        Repeated messages (same level and same text once the numbers are ignored) are
+        written only once per time window, followed by a summary such as
+        "412× Error al procesar fecha de operaciones: ..." when the window closes (with
+        the numbers replaced by #, as they may differ between the repeats). On top
+        of that, at most max_per_second records are written per second; the rest are
+        counted into the summary of their message instead of being dropped silently.
+        Args:
+            targets (list): Handlers that actually write the records (console, file)
+            window (float): Seconds during which repeats of a message are aggregated
+            max_per_second (int): Maximum records written per second, None for no limit
+        '''
+        super().__init__()
+        self.targets = targets
+        self.window = window
+        self.max_per_second = max_per_second
+        self.pending = {}  # key -> [first record, records not written yet, window start, first written]
+        self.tokens = max_per_second or 0
+        self.last_refill = time.monotonic()
+    @staticmethod
+    def _key(record):
+        return record.levelno, re.sub(r"\d+", "#", record.getMessage())
+    def _write(self, record):
+        for handler in self.targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+    def _allowed(self, now):
+        if not self.max_per_second:
+            return True
+        self.tokens = min(self.max_per_second, self.tokens + (now - self.last_refill) * self.max_per_second)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+    def _summary(self, record, repeats):
+        summary = logging.makeLogRecord(record.__dict__)
+        summary.msg = f"{repeats}× {self._key(record)[1]}"
+        summary.args = None
+        summary.created = time.time()
+        summary.msecs = (summary.created - int(summary.created)) * 1000
+        return summary
+    def flush_expired(self, everything=False):
+        '''
+        Writes the summary of every message whose aggregation window has closed.
+        Args:
+            everything (bool): Close all windows, used when logging stops
+        '''
+        now = time.monotonic()
+        for key, (record, unwritten, start, written) in list(self.pending.items()):
+            if everything or now - start >= self.window:
+                del self.pending[key]
+                if unwritten == 1 and not written:
+                    self._write(record)  # Held back by the rate limit and never repeated
+                elif unwritten:
+                    self._write(self._summary(record, unwritten))
+    def emit(self, record):
+        now = time.monotonic()
+        self.flush_expired()
+        key = self._key(record)
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[1] += 1
+        elif self._allowed(now):
+            self.pending[key] = [record, 0, now, True]
+            self._write(record)
+        else:
+            # Over the rate limit: the record is written when its window closes, alone or
+            # inside the summary of its message
+            self.pending[key] = [record, 1, now, False]
+    def flush(self):
+        self.flush_expired()
+        for handler in self.targets:
+            handler.flush()
+    def close(self):
+        self.flush_expired(everything=True)
+        for handler in self.targets:
+            handler.flush()
+            handler.close()
+        super().close()
+class AggregatingListener(QueueListener):
+    # Returned by dequeue when the queue stays empty for a whole poll interval
+    _IDLE = object()
+    def __init__(self, records, aggregator, poll=0.5):
+        '''
+        QueueListener for the background writer thread. While the queue is idle it wakes up
+        every poll seconds to write the summaries of the windows that have closed, so a burst
+        of repeats is reported when its window ends and not only when the next record arrives
+        or logging stops.
+        Args:
+            records (queue.SimpleQueue): Queue the logger puts its records on
+            aggregator (AggregatingHandler): Handler that receives the records
+            poll (float): Seconds to wait for a record before checking the windows
+        '''
+        super().__init__(records, aggregator)
+        self.aggregator = aggregator
+        self.poll = poll
+    def dequeue(self, block):
+        try:
+            return self.queue.get(block, self.poll)
+        except queue.Empty:
+            return self._IDLE
+    def handle(self, record):
+        if record is not self._IDLE:
+            super().handle(record)
+            return
+        # Other listeners (worker processes) also write through the aggregator
+        self.aggregator.acquire()
+        try:
+            self.aggregator.flush_expired()
+        finally:
+            self.aggregator.release()
+class Logger:
+    def __init__(self, project_name, logs_pathname):
+        '''
+        Initializes the Logger with project name and log file path.
+        Args:
+            project_name (str): The name of the project that will be displayed
+            logs_pathname (str): Where the log files will be stored
+        '''
+        self.project_name = project_name
+        self.logs_pathname = logs_pathname
+        self.logger = None
+        self.listener = None
+        self.aggregator = None
+    def launch_logging(self, queued=False, window=5.0, max_per_second=50):
+        '''
+        Initializes and launches the logger with the given name
+
+        With queued=True the logger itself only puts each record on an in-memory queue;
+        a background thread writes them to the console and the file, aggregating repeated
+        messages and rate limiting (see AggregatingHandler), so logging inside hot loops
+        does not wait on disk or terminal I/O. Call stop_logging() when the stage ends
+        (it is also called at interpreter exit).
+        Args:
+            queued (bool): Use the queue-based background writer
+            window (float): Aggregation window in seconds, only with queued=True
+            max_per_second (int): Maximum records written per second, only with queued=True
+
+        Returns:
+            logging.Logger: Configured logger instance
+        '''
+        # Define the logger's name and logging level.
+        self.logger = logging.getLogger(self.project_name)
+        self.logger.setLevel(logging.DEBUG)
+        # Console handler, for debug messages inside code
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.DEBUG)
+        # File handler, for logging file creation and storage
+        file_handler = logging.FileHandler(self.logs_pathname)
+        file_handler.setLevel(logging.INFO)
+        # Create formatters and add them to the handlers
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        console_handler.setFormatter(formatter)
+        file_handler.setFormatter(formatter)
+        # Add the handlers to the logger (avoiding duplicate handlers)
+        if not self.logger.handlers:  # Prevent adding handlers multiple times
+            if queued:
+                self.aggregator = AggregatingHandler([console_handler, file_handler], window, max_per_second)
+                records = queue.SimpleQueue()
+                self.listener = AggregatingListener(records, self.aggregator)
+                self.listener.start()
+                self.logger.addHandler(QueueHandler(records))
+                atexit.register(self.stop_logging)
+            else:
+                self.logger.addHandler(console_handler)
+                self.logger.addHandler(file_handler)
+        return self.logger
+    def stop_logging(self):
+        '''
+        Stops the background writer started with launch_logging(queued=True): writes the
+        records still in the queue and the pending summaries, closes the handlers and
+        detaches them, so the next stage can launch its own logger and log file.
+        '''
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        self.aggregator.close()
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+    def launch_queue_listener(self, queue):
+        '''
+        Starts a listener that forwards the records sent by worker processes through
+        the queue to this logger's handlers, so only the parent process writes to the
+        console and the log file.
+        Args:
+            queue (multiprocessing.Queue): Queue shared with the worker processes
+        Returns:
+            logging.handlers.QueueListener: Started listener, call stop() when the workers finish
+        '''
+        if self.logger is None:
+            self.launch_logging()
+        # In queued mode the records go straight to the aggregating writer of this logger
+        handlers = [self.aggregator] if self.aggregator is not None else self.logger.handlers
+        listener = QueueListener(queue, *handlers, respect_handler_level=True)
+        listener.start()
+        return listener
+    @staticmethod
+    def launch_worker_logging(project_name, queue):
+        '''
+        Configures the logger inside a worker process so that every record is sent to
+        the parent process through the queue instead of being written directly.
+        Args:
+            project_name (str): The name of the project that will be displayed
+            queue (multiprocessing.Queue): Queue shared with the parent process
+        Returns:
+            logging.Logger: Configured logger instance
+        '''
+        logger = logging.getLogger(project_name)
+        logger.setLevel(logging.DEBUG)
+        # Handlers inherited from the parent (fork) would write to the same file concurrently
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(queue))
+        return logger
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+def sha256_archivo(ruta, tam_bloque=1024 * 1024):
+    '''
+    Calcula el sha256 de un archivo leyéndolo por bloques.
+
+    Args:
+        ruta (str): Ruta del archivo.
+        tam_bloque (int): Tamaño de cada lectura en bytes.
+
+    Returns:
+        str: Hash sha256 en hexadecimal.
+    '''
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tam_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+class FetchManifest:
+    def __init__(self, ruta):
+        '''
+        Manifiesto persistente de las descargas del Fetcher. Guarda por cada URL el ETag,
+        Last-Modified, tamaño y sha256 del archivo descargado para poder saltar los que
+        ya están verificados y lanzar peticiones condicionales en las siguientes ejecuciones.
+        Args:
+            ruta (str): Ruta del archivo JSON donde se guarda el manifiesto
+        '''
+        self.ruta = ruta
+        self.entradas = {}
+        self._lock = threading.Lock()
+        if os.path.exists(ruta):
+            with open(ruta, "r", encoding="utf-8") as f:
+                self.entradas = json.load(f)
+    def obtener(self, url):
+        '''
+        Devuelve la entrada del manifiesto de la URL o None si nunca se ha descargado.
+        '''
+        with self._lock:
+            return self.entradas.get(url)
+    def verificado(self, url, ruta_archivo):
+        '''
+        Comprueba si el archivo local coincide con lo registrado para la URL.
+
+        Si el tamaño y la fecha de modificación no han cambiado desde el registro se da por
+        bueno sin releerlo; en otro caso se recalcula el sha256 y se compara.
+
+        Returns:
+            bool: True si el archivo existe y coincide con el manifiesto.
+        '''
+        entrada = self.obtener(url)
+        if entrada is None or not os.path.exists(ruta_archivo):
+            return False
+        estado = os.stat(ruta_archivo)
+        if estado.st_size != entrada["size"]:
+            return False
+        if estado.st_mtime_ns == entrada.get("mtime_ns"):
+            return True
+        if sha256_archivo(ruta_archivo) != entrada["sha256"]:
+            return False
+        with self._lock:
+            entrada["mtime_ns"] = estado.st_mtime_ns
+        return True
+    def cabeceras_condicionales(self, url):
+        '''
+        Construye las cabeceras If-None-Match / If-Modified-Since de la URL.
+
+        Returns:
+            dict: Cabeceras HTTP (vacío si la URL no está en el manifiesto).
+        '''
+        entrada = self.obtener(url) or {}
+        cabeceras = {}
+        if entrada.get("etag"):
+            cabeceras["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            cabeceras["If-Modified-Since"] = entrada["last_modified"]
+        return cabeceras
+    def registrar(self, url, ruta_archivo, etag, last_modified, sha256):
+        '''
+        Guarda en memoria los metadatos de una descarga completada.
+        '''
+        estado = os.stat(ruta_archivo)
+        with self._lock:
+            self.entradas[url] = {
+                "archivo": os.path.basename(ruta_archivo),
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": estado.st_size,
+                "sha256": sha256,
+                "mtime_ns": estado.st_mtime_ns,
+            }
+    def guardar(self):
+        '''
+        Escribe el manifiesto en disco de forma atómica.
+        '''
+        with self._lock:
+            contenido = json.dumps(self.entradas, ensure_ascii=False, indent=1)
+        directorio = os.path.dirname(self.ruta)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, self.ruta)
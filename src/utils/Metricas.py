@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+RUTA_METRICAS = "../data/metrics"
+# Límites superiores (en segundos) de los cubos de los histogramas
+CUBOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+def _etiquetas(etiquetas):
+    return tuple(sorted((clave, str(valor)) for clave, valor in etiquetas.items()))
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+def _serie(nombre, etiquetas, extra=()):
+    '''Nombre de una serie en formato Prometheus: nombre{clave="valor",...}'''
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return nombre
+    return nombre + "{" + ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + "}"
+class Metricas:
+    def __init__(self):
+        '''
+        Registro de métricas de una ejecución: contadores, valores puntuales (gauges) e
+        histogramas, cada uno con etiquetas opcionales (por ejemplo acto="Constitución").
+        Se puede usar desde varios hilos. Cada proceso trabajador tiene el suyo y envía una
+        instantánea (`instantanea`) al proceso padre, que la suma con `fusionar`.
+        '''
+        self._lock = threading.Lock()
+        self.reiniciar()
+    def reiniciar(self):
+        '''
+        Borra todas las métricas registradas.
+        '''
+        with self._lock:
+            self.contadores = {}
+            self.valores = {}
+            self.histogramas = {}
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        '''
+        Suma `valor` a un contador.
+        '''
+        clave = (nombre, _etiquetas(etiquetas))
+        with self._lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+    def fijar(self, nombre, valor, **etiquetas):
+        '''
+        Guarda el valor puntual de una métrica, sustituyendo el anterior.
+        '''
+        with self._lock:
+            self.valores[(nombre, _etiquetas(etiquetas))] = valor
+    def observar(self, nombre, valor, **etiquetas):
+        '''
+        Añade una observación (normalmente una duración en segundos) a un histograma.
+        '''
+        clave = (nombre, _etiquetas(etiquetas))
+        with self._lock:
+            histograma = self.histogramas.get(clave)
+            if histograma is None:
+                histograma = self.histogramas[clave] = {"cubos": [0] * len(CUBOS), "suma": 0.0, "cuenta": 0}
+            for i, limite in enumerate(CUBOS):
+                if valor <= limite:
+                    histograma["cubos"][i] += 1
+            histograma["suma"] += valor
+            histograma["cuenta"] += 1
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        '''
+        Mide la duración del bloque `with` y la añade al histograma `nombre`.
+        '''
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+    def total(self, nombre):
+        '''
+        Devuelve la suma de un contador para todas sus etiquetas.
+        '''
+        with self._lock:
+            return sum(valor for (clave, _), valor in self.contadores.items() if clave == nombre)
+    def log_muestreado(self, logger, nombre, mensaje, cada=100, nivel=logging.INFO):
+        '''
+        Cuenta un suceso repetido en el contador `nombre` y solo lo registra en el log la
+        primera vez y después una de cada `cada`, con el número de veces que lleva. Sustituye
+        a las líneas de log por registro en los bucles de muchas iteraciones.
+        '''
+        clave = (nombre, ())
+        with self._lock:
+            veces = self.contadores[clave] = self.contadores.get(clave, 0) + 1
+        if veces == 1 or veces % cada == 0:
+            logger.log(nivel, f"{mensaje} ({veces} veces)" if veces > 1 else mensaje)
+    def instantanea(self):
+        '''
+        Devuelve una copia serializable de las métricas, para enviarla entre procesos.
+        '''
+        with self._lock:
+            return {"contadores": list(self.contadores.items()), "valores": list(self.valores.items()),
+                    "histogramas": [(clave, {"cubos": list(h["cubos"]), "suma": h["suma"], "cuenta": h["cuenta"]})
+                                    for clave, h in self.histogramas.items()]}
+    def fusionar(self, instantanea):
+        '''
+        Suma a este registro las métricas de otro proceso (ver `instantanea`).
+        '''
+        with self._lock:
+            for clave, valor in instantanea["contadores"]:
+                self.contadores[clave] = self.contadores.get(clave, 0) + valor
+            for clave, valor in instantanea["valores"]:
+                self.valores[clave] = valor
+            for clave, otro in instantanea["histogramas"]:
+                histograma = self.histogramas.setdefault(clave, {"cubos": [0] * len(CUBOS), "suma": 0.0, "cuenta": 0})
+                histograma["cubos"] = [a + b for a, b in zip(histograma["cubos"], otro["cubos"])]
+                histograma["suma"] += otro["suma"]
+                histograma["cuenta"] += otro["cuenta"]
+    def a_json(self):
+        '''
+        Devuelve las métricas como diccionario, con una entrada por serie.
+        '''
+        with self._lock:
+            return {
+                "contadores": {_serie(nombre, etiquetas): valor for (nombre, etiquetas), valor in self.contadores.items()},
+                "valores": {_serie(nombre, etiquetas): valor for (nombre, etiquetas), valor in self.valores.items()},
+                "histogramas": {_serie(nombre, etiquetas): {"cuenta": h["cuenta"], "suma": h["suma"],
+                                                            "cubos": dict(zip(map(str, CUBOS), h["cubos"]))}
+                                for (nombre, etiquetas), h in self.histogramas.items()},
+            }
+    def a_prometheus(self):
+        '''
+        Devuelve las métricas en el formato de texto de Prometheus (node_exporter textfile).
+        '''
+        lineas = []
+        with self._lock:
+            for tipo, series in (("counter", self.contadores), ("gauge", self.valores)):
+                for nombre in sorted({nombre for nombre, _ in series}):
+                    lineas.append(f"# TYPE {nombre} {tipo}")
+                    lineas += [f"{_serie(nombre, etiquetas)} {valor}"
+                               for (clave, etiquetas), valor in sorted(series.items()) if clave == nombre]
+            for nombre in sorted({nombre for nombre, _ in self.histogramas}):
+                lineas.append(f"# TYPE {nombre} histogram")
+                for (clave, etiquetas), h in sorted(self.histogramas.items()):
+                    if clave != nombre:
+                        continue
+                    for limite, acumulado in zip(CUBOS, h["cubos"]):
+                        lineas.append(f"{_serie(nombre + '_bucket', etiquetas, [('le', limite)])} {acumulado}")
+                    lineas.append(f"{_serie(nombre + '_bucket', etiquetas, [('le', '+Inf')])} {h['cuenta']}")
+                    lineas.append(f"{_serie(nombre + '_sum', etiquetas)} {h['suma']}")
+                    lineas.append(f"{_serie(nombre + '_count', etiquetas)} {h['cuenta']}")
+        return "\n".join(lineas) + "\n"
+    def volcar(self, etapa, directorio=RUTA_METRICAS):
+        '''
+        Escribe las métricas en `<directorio>/<etapa>.json` y `<directorio>/<etapa>.prom`.
+        Returns:
+            str: Ruta del archivo JSON
+        '''
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, etapa)
+        with open(f"{ruta}.json", "w", encoding="utf-8") as f:
+            json.dump(self.a_json(), f, ensure_ascii=False, indent=1)
+        with open(f"{ruta}.prom", "w", encoding="utf-8") as f:
+            f.write(self.a_prometheus())
+        return f"{ruta}.json"
+# Registro del proceso actual, compartido por todas las etapas
+METRICAS = Metricas()
@@ -0,0 +1,154 @@
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+# Domicilios distintos que se recuerdan ya separados; los de las empresas se repiten mucho
+TAM_CACHE_DOMICILIOS = 2 ** 16
+# Tipos de vía: (prefijo, tipo, exige separador). Los cinco primeros son los que reconocía
+# el Wrangler original y se comparan como prefijo sin más ("PLAZAS..." es una plaza); el
+# resto tiene que ir seguido de algo que no sea una letra, para que "AV" no case con "AVILA".
+TIPOS_VIA = (
+    ("C/", "Calle", False), ("PLAZA", "Plaza", False), ("CTRA", "Carretera", False),
+    ("AVDA", "Avenida", False), ("PASEO", "Paseo", False),
+    ("CALLE", "Calle", True), ("CL", "Calle", True), ("CARRER", "Calle", True), ("RUA", "Calle", True),
+    ("RÚA", "Calle", True), ("AVENIDA", "Avenida", True), ("AVD", "Avenida", True), ("AV", "Avenida", True),
+    ("AVINGUDA", "Avenida", True), ("PZA", "Plaza", True), ("PL", "Plaza", True), ("PLAÇA", "Plaza", True),
+    ("CARRETERA", "Carretera", True), ("CRTA", "Carretera", True), ("PS", "Paseo", True),
+    ("PASSEIG", "Paseo", True), ("RONDA", "Ronda", True), ("RDA", "Ronda", True), ("CAMINO", "Camino", True),
+    ("CMNO", "Camino", True), ("CAMI", "Camino", True), ("TRAVESIA", "Travesía", True),
+    ("TRAVESÍA", "Travesía", True), ("TRVA", "Travesía", True), ("GLORIETA", "Glorieta", True),
+    ("GTA", "Glorieta", True), ("POLIGONO", "Polígono", True), ("POLÍGONO", "Polígono", True),
+    ("POL", "Polígono", True), ("PG", "Polígono", True), ("URBANIZACION", "Urbanización", True),
+    ("URBANIZACIÓN", "Urbanización", True), ("URB", "Urbanización", True), ("PARQUE", "Parque", True),
+    ("PASAJE", "Pasaje", True), ("PJE", "Pasaje", True), ("RAMBLA", "Rambla", True),
+    ("CALLEJON", "Callejón", True), ("CALLEJÓN", "Callejón", True), ("CUESTA", "Cuesta", True),
+    ("ALAMEDA", "Alameda", True), ("AUTOVIA", "Autovía", True), ("AUTOVÍA", "Autovía", True),
+    ("BULEVAR", "Bulevar", True), ("BARRIO", "Barrio", True), ("LUGAR", "Lugar", True),
+    ("PARTIDA", "Partida", True), ("VIA", "Vía", True), ("VÍA", "Vía", True),
+)
+# Nombres oficiales de las ciudades que aparecen con más de una grafía (sin tildes en la clave)
+CIUDADES = {
+    "alacant": "alicante", "alicante/alacant": "alicante", "alacant/alicante": "alicante",
+    "la coruna": "a coruña", "coruna": "a coruña", "a coruna": "a coruña",
+    "gerona": "girona", "lerida": "lleida", "orense": "ourense", "bilbo": "bilbao",
+    "san sebastian": "donostia-san sebastián", "donostia": "donostia-san sebastián",
+    "donostia/san sebastian": "donostia-san sebastián", "donostia-san sebastian": "donostia-san sebastián",
+    "vitoria": "vitoria-gasteiz", "gasteiz": "vitoria-gasteiz", "vitoria gasteiz": "vitoria-gasteiz",
+    "vitoria-gasteiz": "vitoria-gasteiz",
+    "castellon": "castellón de la plana", "castellon de la plana": "castellón de la plana",
+    "castello de la plana": "castellón de la plana",
+    "castellon de la plana/castello de la plana": "castellón de la plana",
+    "valencia": "valencia", "elx": "elche", "elche/elx": "elche", "elx/elche": "elche",
+    "palma de mallorca": "palma", "pamplona/iruna": "pamplona", "iruna": "pamplona",
+    "las palmas": "las palmas de gran canaria", "hospitalet de llobregat": "l'hospitalet de llobregat",
+    "malaga": "málaga", "cordoba": "córdoba", "cadiz": "cádiz", "leon": "león", "avila": "ávila",
+    "caceres": "cáceres", "jaen": "jaén", "almeria": "almería", "logrono": "logroño",
+    "mostoles": "móstoles", "alcala de henares": "alcalá de henares", "mataro": "mataró",
+}
+# Formas jurídicas según la abreviatura con que terminan los nombres (sin puntos ni espacios)
+SUFIJOS_SOCIEDAD = {
+    "SL": "Sociedad Limitada", "SLU": "Sociedad Limitada", "SLL": "Sociedad Limitada",
+    "SLNE": "Sociedad Limitada", "SLP": "Sociedad Limitada", "SRL": "Sociedad Limitada",
+    "SA": "Sociedad Anonima", "SAU": "Sociedad Anonima", "SAL": "Sociedad Anonima", "SAP": "Sociedad Anonima",
+    "SCOOP": "Sociedad Cooperativa", "SCOOPAND": "Sociedad Cooperativa", "COOP": "Sociedad Cooperativa",
+    "AIE": "Agrupacion de Interes Economico",
+}
+Domicilio = namedtuple("Domicilio", ["ciudad", "tipo_via", "numero", "nombre_via"])
+def _construir_trie(tipos):
+    '''
+    Árbol de prefijos de los tipos de vía: un diccionario por letra, y en la clave None del
+    nodo en que termina un prefijo la tupla (tipo, exige separador).
+    '''
+    raiz = {}
+    for prefijo, tipo, separador in tipos:
+        nodo = raiz
+        for letra in prefijo:
+            nodo = nodo.setdefault(letra, {})
+        nodo[None] = (tipo, separador)
+    return raiz
+TRIE_VIAS = _construir_trie(TIPOS_VIA)
+def tipo_via(direccion):
+    '''
+    Busca el tipo de vía más largo con el que empieza la dirección, en una sola pasada.
+
+    Args:
+        direccion (str): Dirección sin la ciudad ("C/ MAYOR 5", "AVDA DE LA PAZ 3"...)
+    Returns:
+        str: Tipo de vía ("Calle", "Avenida"...) o "No especificada"
+    '''
+    nodo = TRIE_VIAS
+    encontrado = "No especificada"
+    for i, letra in enumerate(direccion):
+        nodo = nodo.get(letra)
+        if nodo is None:
+            break
+        final = nodo.get(None)
+        if final is not None:
+            tipo, separador = final
+            if not separador or i + 1 == len(direccion) or not direccion[i + 1].isalpha():
+                encontrado = tipo
+    return encontrado
+def _sin_tildes(texto):
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+@lru_cache(maxsize=4096)
+def ciudad_canonica(ciudad):
+    '''
+    Normaliza el nombre de una ciudad: minúsculas, sin el punto final ni espacios repetidos
+    y, si tiene varias grafías conocidas (ver `CIUDADES`), la oficial.
+
+    Args:
+        ciudad (str): Ciudad tal como aparece entre paréntesis en el domicilio
+    Returns:
+        str: Nombre normalizado
+    '''
+    ciudad = " ".join(ciudad.lower().split()).strip(" .")
+    return CIUDADES.get(_sin_tildes(ciudad), ciudad)
+@lru_cache(maxsize=TAM_CACHE_DOMICILIOS)
+def parsear_domicilio(domicilio):
+    '''
+    Separa un domicilio del BORME en ciudad, tipo de vía, número y nombre de la vía. El
+    resultado se guarda en una caché LRU, así que cada domicilio distinto se analiza una vez.
+
+    Args:
+        domicilio (str): Domicilio ya reparado ("C/ MAYOR 5 (MADRID).")
+    Returns:
+        Domicilio: Tupla (ciudad, tipo_via, numero, nombre_via). `ciudad` es None si el
+        domicilio no la indica y `numero` es None si la dirección no tiene número.
+    Raises:
+        ValueError: Si el número de la vía no se puede convertir a entero
+    '''
+    direccion, parentesis, ciudad = domicilio.partition("(")
+    ciudad = ciudad_canonica(ciudad.replace(")", "")) if parentesis else None
+    tipo = tipo_via(direccion)
+    if direccion[0:2] == "C/":
+        direccion = direccion.replace("C/", "")
+    # Número: primera palabra formada solo por dígitos; lo anterior es el nombre de la vía
+    nombre_via = []
+    numero = None
+    for palabra in direccion.split(" "):
+        if palabra.isdigit():
+            numero = int(palabra)
+            break
+        nombre_via.append(palabra)
+    return Domicilio(ciudad, tipo, numero, " ".join(nombre_via).lower().strip())
+@lru_cache(maxsize=TAM_CACHE_DOMICILIOS)
+def tipo_sociedad(nombre):
+    '''
+    Deduce la forma jurídica de una empresa por la abreviatura con que termina su nombre
+    ("SL.", "S.L.U.", "S. COOP."...). Si no termina en ninguna conocida se usa la regla
+    original: contiene "SL." o "SA.".
+
+    Args:
+        nombre (str): Nombre de la empresa
+    Returns:
+        str: Forma jurídica o "No especificado"
+    '''
+    palabras = nombre.upper().rstrip(" .").split()
+    for n in (1, 2, 3):
+        tipo = SUFIJOS_SOCIEDAD.get("".join(palabras[-n:]).replace(".", "")) if len(palabras) > n else None
+        if tipo is not None:
+            return tipo
+    if "SL." in nombre:
+        return "Sociedad Limitada"
+    if "SA." in nombre:
+        return "Sociedad Anonima"
+    return "No especificado"
@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+# Respuestas del servidor que indican un problema pasajero y merece la pena repetir
+ESTADOS_REINTENTABLES = frozenset({408, 425, 429, 500, 502, 503, 504})
+def segundos_retry_after(valor, ahora=None):
+    '''
+    Interpreta la cabecera Retry-After, que puede traer segundos ("120") o una fecha HTTP
+    ("Wed, 21 Oct 2015 07:28:00 GMT").
+
+    Args:
+        valor (str): Valor de la cabecera, o None si no viene
+        ahora (datetime, opcional): Instante de referencia para las fechas
+    Returns:
+        float: Segundos que pide esperar el servidor (0 si la fecha ya pasó), o None si
+        no hay cabecera o no se entiende
+    '''
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return max(0.0, (fecha - (ahora or datetime.now(timezone.utc))).total_seconds())
+class PoliticaReintentos:
+    def __init__(self, intentos=4, base=0.5, maximo=30.0, maximo_retry_after=120.0):
+        '''
+        Esperas entre intentos con backoff exponencial y jitter completo: antes del intento
+        n se espera un tiempo al azar entre 0 y min(maximo, base * 2**n), para que los hilos
+        que fallan a la vez no vuelvan a llegar juntos al servidor. Si el servidor manda
+        Retry-After se respeta, hasta `maximo_retry_after` segundos.
+        Args:
+            intentos (int): Número máximo de intentos por petición, contando el primero
+            base (float): Espera de referencia del primer reintento en segundos
+            maximo (float): Tope de la espera calculada por backoff
+            maximo_retry_after (float): Tope de la espera que puede imponer el servidor
+        '''
+        self.intentos = max(1, intentos)
+        self.base = base
+        self.maximo = maximo
+        self.maximo_retry_after = maximo_retry_after
+    def espera(self, intento, retry_after=None):
+        '''
+        Segundos a esperar antes de repetir tras el intento fallido número `intento` (desde 0).
+        '''
+        espera = random.uniform(0, min(self.maximo, self.base * 2 ** intento))
+        if retry_after is not None:
+            espera = max(espera, min(retry_after, self.maximo_retry_after))
+        return espera
+class CircuitoPorHost:
+    def __init__(self, umbral=5, enfriamiento=30.0):
+        '''
+        Cortacircuitos por host. Tras `umbral` fallos seguidos contra un host el circuito se
+        abre y durante `enfriamiento` segundos no se le lanzan peticiones; pasado ese tiempo
+        se deja pasar una sola de prueba (semiabierto): si sale bien el circuito se cierra y
+        si falla se vuelve a abrir.
+        Args:
+            umbral (int): Fallos consecutivos que abren el circuito
+            enfriamiento (float): Segundos que el circuito permanece abierto
+        '''
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self._fallos = {}
+        self._abierto_hasta = {}
+        # Host -> hilo que lanza la petición de prueba del circuito semiabierto
+        self._prueba_en_curso = {}
+        self._lock = threading.Lock()
+    def espera(self, host):
+        '''
+        Comprueba si se puede lanzar una petición al host.
+        Returns:
+            float: 0 si se puede (y, si el circuito estaba semiabierto, la petición queda
+            como prueba), o los segundos que faltan para poder intentarlo
+        '''
+        with self._lock:
+            hasta = self._abierto_hasta.get(host)
+            if hasta is None:
+                return 0.0
+            restante = hasta - time.monotonic()
+            if restante > 0:
+                return restante
+            if host in self._prueba_en_curso:
+                return self.enfriamiento / 10
+            self._prueba_en_curso[host] = threading.get_ident()
+            return 0.0
+    def abierto(self, host):
+        '''
+        Indica si el circuito del host está abierto (o con una prueba en curso).
+        '''
+        with self._lock:
+            return host in self._abierto_hasta
+    def exito(self, host):
+        with self._lock:
+            self._fallos.pop(host, None)
+            self._abierto_hasta.pop(host, None)
+            self._prueba_en_curso.pop(host, None)
+    def liberar(self, host):
+        '''
+        Suelta la prueba del host si la lanzó el hilo actual y terminó sin `exito` ni `fallo`
+        (por ejemplo, por un error al escribir el archivo), para que otro hilo pueda probar.
+        '''
+        with self._lock:
+            if self._prueba_en_curso.get(host) == threading.get_ident():
+                del self._prueba_en_curso[host]
+    def fallo(self, host):
+        '''
+        Registra un fallo contra el host.
+        Returns:
+            bool: True si con este fallo el circuito se abre
+        '''
+        with self._lock:
+            fallos = self._fallos.get(host, 0) + 1
+            self._fallos[host] = fallos
+            if host in self._prueba_en_curso or fallos >= self.umbral:
+                self._prueba_en_curso.pop(host, None)
+                self._abierto_hasta[host] = time.monotonic() + self.enfriamiento
+                return True
+            return False
+class TimeoutAdaptativo:
+    def __init__(self, conexion=10.0, lectura=30.0, minimo=5.0, maximo=120.0):
+        '''
+        Timeouts de conexión y lectura por host que se ajustan a la latencia observada, con
+        el mismo cálculo que TCP para su temporizador de retransmisión: media móvil de la
+        latencia (srtt) más cuatro veces su desviación (rttvar). Mientras no hay medidas se
+        usan los valores iniciales, y cada timeout agotado duplica los del host.
+        Args:
+            conexion (float): Timeout de conexión inicial en segundos
+            lectura (float): Timeout de lectura inicial en segundos
+            minimo (float): Valor mínimo de cualquiera de los dos timeouts
+            maximo (float): Valor máximo de cualquiera de los dos timeouts
+        '''
+        self.conexion = conexion
+        self.lectura = lectura
+        self.minimo = minimo
+        self.maximo = maximo
+        self._estimaciones = {}
+        self._factor = {}
+        self._lock = threading.Lock()
+    def _acotar(self, valor):
+        return min(self.maximo, max(self.minimo, valor))
+    def observar(self, host, segundos):
+        '''
+        Registra la latencia (hasta recibir las cabeceras) de una respuesta del host.
+        '''
+        with self._lock:
+            estimacion = self._estimaciones.get(host)
+            if estimacion is None:
+                self._estimaciones[host] = (segundos, segundos / 2)
+            else:
+                srtt, rttvar = estimacion
+                rttvar = 0.75 * rttvar + 0.25 * abs(srtt - segundos)
+                srtt = 0.875 * srtt + 0.125 * segundos
+                self._estimaciones[host] = (srtt, rttvar)
+            self._factor.pop(host, None)
+    def agotado(self, host):
+        '''
+        Registra que una petición al host agotó el timeout; los siguientes serán el doble.
+        '''
+        with self._lock:
+            self._factor[host] = min(self._factor.get(host, 1) * 2, 16)
+    def timeout(self, host):
+        '''
+        Returns:
+            tuple: (timeout de conexión, timeout de lectura) en segundos, como lo espera requests
+        '''
+        with self._lock:
+            estimacion = self._estimaciones.get(host)
+            factor = self._factor.get(host, 1)
+        if estimacion is None:
+            return self._acotar(self.conexion * factor), self._acotar(self.lectura * factor)
+        srtt, rttvar = estimacion
+        limite = srtt + 4 * rttvar
+        # La conexión es un solo viaje de ida y vuelta; la lectura incluye lo que tarde el servidor
+        return self._acotar(limite * factor), self._acotar(2 * limite * factor)
+class Reintentos:
+    def __init__(self, politica=None, circuito=None, timeouts=None):
+        '''
+        Estado compartido por todos los hilos de descarga: política de reintentos,
+        cortacircuitos y timeouts adaptativos por host, más la cola de URLs que agotaron
+        sus intentos (cola de fallidos) para repetirlas al final de la ejecución.
+        '''
+        self.politica = politica or PoliticaReintentos()
+        self.circuito = circuito or CircuitoPorHost()
+        self.timeouts = timeouts or TimeoutAdaptativo()
+        self._fallidos = []
+        self._lock = threading.Lock()
+    def turno(self, host, esperar=False, plazo=None):
+        '''
+        Comprueba el cortacircuitos del host antes de lanzarle una petición.
+        Args:
+            host (str): Host al que va la petición
+            esperar (bool): Si el circuito está abierto, duerme hasta que se pueda probar
+            plazo (float, opcional): Máximo de segundos que se espera. Por defecto tres
+                veces el enfriamiento del circuito
+        Returns:
+            bool: True si se puede lanzar la petición
+        '''
+        espera = self.circuito.espera(host)
+        if espera <= 0 or not esperar:
+            return espera <= 0
+        limite = time.monotonic() + (plazo if plazo is not None else 3 * self.circuito.enfriamiento)
+        while espera > 0:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return False
+            time.sleep(min(espera, restante))
+            espera = self.circuito.espera(host)
+        return True
+    def fallida(self, url):
+        '''
+        Añade a la cola de fallidos una URL que agotó sus intentos.
+        '''
+        with self._lock:
+            self._fallidos.append(url)
+    def extraer_fallidos(self):
+        '''
+        Devuelve y vacía la cola de fallidos, sin duplicados y en orden de llegada.
+        '''
+        with self._lock:
+            fallidos, self._fallidos = list(dict.fromkeys(self._fallidos)), []
+        return fallidos
@@ -0,0 +1,170 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS registros (
+    archivo TEXT NOT NULL,
+    id TEXT NOT NULL,
+    nombre TEXT,
+    tipo_sociedad TEXT,
+    actos TEXT,
+    actos_detalle TEXT,
+    comienzo_operaciones TEXT,
+    objeto_social TEXT,
+    domicilio TEXT,
+    ciudad TEXT,
+    tipo_via TEXT,
+    numero INTEGER,
+    nombre_via TEXT,
+    capital INTEGER,
+    fecha_boletin TEXT,
+    provincia TEXT,
+    PRIMARY KEY (archivo, id)
+);
+CREATE INDEX IF NOT EXISTS idx_registros_nombre ON registros (nombre);
+CREATE INDEX IF NOT EXISTS idx_registros_id ON registros (id);
+CREATE INDEX IF NOT EXISTS idx_registros_ciudad_fecha ON registros (ciudad, fecha_boletin);
+CREATE INDEX IF NOT EXISTS idx_registros_fecha ON registros (fecha_boletin);
+CREATE VIRTUAL TABLE IF NOT EXISTS registros_fts USING fts5 (
+    nombre, objeto_social, content='registros', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS registros_ai AFTER INSERT ON registros BEGIN
+    INSERT INTO registros_fts (rowid, nombre, objeto_social) VALUES (new.rowid, new.nombre, new.objeto_social);
+END;
+CREATE TRIGGER IF NOT EXISTS registros_ad AFTER DELETE ON registros BEGIN
+    INSERT INTO registros_fts (registros_fts, rowid, nombre, objeto_social)
+    VALUES ('delete', old.rowid, old.nombre, old.objeto_social);
+END;
+CREATE TRIGGER IF NOT EXISTS registros_au AFTER UPDATE ON registros BEGIN
+    INSERT INTO registros_fts (registros_fts, rowid, nombre, objeto_social)
+    VALUES ('delete', old.rowid, old.nombre, old.objeto_social);
+    INSERT INTO registros_fts (rowid, nombre, objeto_social) VALUES (new.rowid, new.nombre, new.objeto_social);
+END;
+'''
+COLUMNAS = ("archivo", "id", "nombre", "tipo_sociedad", "actos", "actos_detalle", "comienzo_operaciones",
+            "objeto_social", "domicilio", "ciudad", "tipo_via", "numero", "nombre_via", "capital",
+            "fecha_boletin", "provincia")
+# Campos del Crawler que no son actos ("Archivo" solo está en los jsonlines por día)
+CAMPOS_NO_ACTOS = {"Archivo", "Id", "nombre", "Acto legal", "Comienzo de operaciones", "Objeto social", "Domicilio", "Capital"}
+UPSERT = (f"INSERT INTO registros ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))}) "
+          f"ON CONFLICT (archivo, id) DO UPDATE SET "
+          + ", ".join(f"{columna} = excluded.{columna}" for columna in COLUMNAS[2:]))
+class CompanyStore:
+    def __init__(self, ruta, tam_lote=5000):
+        '''
+        Base de datos SQLite con todos los registros del BORME ya limpios, para consultar por
+        empresa, Id, ciudad o fecha sin recorrer los CSV. Se abre en modo WAL, de modo que las
+        consultas pueden leer mientras el Wrangler escribe, y los registros se insertan por
+        lotes dentro de una transacción por archivo.
+        Args:
+            ruta (str): Ruta del archivo de la base de datos
+            tam_lote (int): Número de filas por cada executemany
+        '''
+        self.ruta = ruta
+        self.tam_lote = tam_lote
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.row_factory = sqlite3.Row
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.executescript(ESQUEMA)
+        self._anidadas = 0
+    def __enter__(self):
+        return self
+    def __exit__(self, *excepcion):
+        self.cerrar()
+    def cerrar(self):
+        self.conexion.close()
+    @contextmanager
+    def transaccion(self):
+        '''
+        Agrupa varias llamadas a `guardar` (por ejemplo, los bloques de un mismo archivo) en
+        una sola transacción, que se confirma al salir del bloque o se deshace entera si sale
+        con una excepción. Dentro de otra transacción se une a la exterior.
+        '''
+        if self._anidadas:
+            yield self
+            return
+        self._anidadas += 1
+        try:
+            with self.conexion:
+                yield self
+        finally:
+            self._anidadas -= 1
+    def deshacer(self):
+        '''
+        Deshace lo guardado en la transacción en curso.
+        '''
+        self.conexion.rollback()
+    @staticmethod
+    def _fila(archivo, bruto, limpio, fecha_boletin, provincia):
+        '''
+        Combina el registro del Crawler (Id, actos, objeto social) con el limpio del Wrangler.
+        '''
+        fecha = limpio.get("ComienzoDeOperaciones")
+        actos = {clave: valor for clave, valor in bruto.items() if clave not in CAMPOS_NO_ACTOS}
+        return (archivo, str(bruto.get("Id")), limpio.get("Nombre"), limpio.get("TipoDeSociedad"),
+                bruto.get("Acto legal"), json.dumps(actos, ensure_ascii=False),
+                fecha.isoformat() if fecha else None, bruto.get("Objeto social"),
+                limpio.get("DomicilioCompleto"), limpio.get("Ciudad"), limpio.get("Tipodevia"), limpio.get("Numero"),
+                limpio.get("Nombredevia"),
+                limpio.get("CapitalSocial"), fecha_boletin.isoformat() if fecha_boletin else None, provincia)
+    def guardar(self, archivo, brutos, limpios, fecha_boletin=None, provincia=None):
+        '''
+        Inserta o actualiza registros de un PDF. Se confirman al terminar, salvo que se llame
+        dentro de `transaccion`, que es la que los confirma.
+
+        Args:
+            archivo (str): Nombre del PDF de origen; con el Id forma la clave de cada registro
+            brutos (list): Registros del Crawler, en el mismo orden que `limpios`
+            limpios (list): Los mismos registros tras `clean_datos` o `clean_datos_vectorizado`
+            fecha_boletin (datetime.date, opcional): Fecha de publicación del boletín
+            provincia (str, opcional): Código de provincia del PDF
+        Returns:
+            int: Número de registros guardados
+        Raises:
+            ValueError: Si las dos listas no tienen la misma longitud
+        '''
+        if len(brutos) != len(limpios):
+            raise ValueError("Los registros del Crawler y los limpios no se corresponden")
+        filas = [self._fila(archivo, bruto, limpio, fecha_boletin, provincia)
+                 for bruto, limpio in zip(brutos, limpios) if bruto.get("Id") is not None]
+        with self.transaccion():
+            for inicio in range(0, len(filas), self.tam_lote):
+                self.conexion.executemany(UPSERT, filas[inicio:inicio + self.tam_lote])
+        return len(filas)
+    def _consultar(self, sql, parametros, limite):
+        cursor = self.conexion.execute(f"{sql} LIMIT ?", (*parametros, limite))
+        return [dict(fila) for fila in cursor]
+    def por_nombre(self, nombre, limite=1000):
+        '''
+        Devuelve todos los registros (actos) de una empresa, por orden de publicación.
+        '''
+        return self._consultar("SELECT * FROM registros WHERE nombre = ? ORDER BY fecha_boletin, archivo",
+                               (nombre,), limite)
+    def por_id(self, id_registro, limite=1000):
+        '''
+        Devuelve los registros con un Id de inscripción.
+        '''
+        return self._consultar("SELECT * FROM registros WHERE id = ? ORDER BY fecha_boletin",
+                               (str(id_registro),), limite)
+    def constituciones(self, ciudad, desde, hasta, limite=1000):
+        '''
+        Devuelve las constituciones de sociedades publicadas en una ciudad entre dos fechas.
+        Args:
+            ciudad (str): Ciudad en minúsculas, como la deja el Wrangler (por ejemplo "madrid")
+            desde (str): Fecha inicial del boletín en formato aaaa-mm-dd (incluida)
+            hasta (str): Fecha final del boletín en formato aaaa-mm-dd (incluida)
+        '''
+        return self._consultar("SELECT * FROM registros WHERE ciudad = ? AND fecha_boletin BETWEEN ? AND ? "
+                               "AND actos LIKE '%Constitución%' ORDER BY fecha_boletin",
+                               (ciudad.lower(), desde, hasta), limite)
+    def buscar(self, texto, limite=100):
+        '''
+        Búsqueda de texto completo en el nombre y el objeto social, ordenada por relevancia.
+        Args:
+            texto (str): Consulta en sintaxis FTS5 (por ejemplo "hostelería" o "nombre:DELTA")
+        '''
+        return self._consultar("SELECT registros.* FROM registros_fts JOIN registros "
+                               "ON registros.rowid = registros_fts.rowid "
+                               "WHERE registros_fts MATCH ? ORDER BY bm25(registros_fts)", (texto,), limite)
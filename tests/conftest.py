@@ -0,0 +1,4 @@
+import os
+import sys
+# Las etapas se importan como en src/ (import Fetcher, from utils.Loger import Logger...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src"))
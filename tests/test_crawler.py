@@ -0,0 +1,37 @@
+from collections import Counter
+import Crawler
+def _estadisticas():
+    return {"aciertos": Counter(), "fallos": Counter()}
+def test_extraer_actos_constitucion_en_varios_renglones():
+    parrafo = ("386538 - CONSTRUCCIONES EJEMPLO SL.\n"
+               "Constitución. Comienzo de operaciones: 1.08.24. Objeto social: Construcción de\n"
+               "edificios y obras.Domicilio: C/ MAYOR 1 (MADRID). Capital: 3.000,00 Euros.\n"
+               "Nombramientos. Adm. Unico: PEREZ GARCIA JUAN. Datos\n"
+               "registrales. S 8 , H M 600000, I/A 1 (26.08.24).\n")
+    estadisticas = _estadisticas()
+    dicc = Crawler.extraer_actos(parrafo, estadisticas)
+    assert dicc == {
+        "Id": "386538", "nombre": "CONSTRUCCIONES EJEMPLO SL.",
+        "Acto legal": "Constitución, Nombramientos, Datos registrales",
+        "Comienzo de operaciones": "1.08.24",
+        # Las palabras partidas entre renglones no se pegan ("Construcción de edificios")
+        "Objeto social": "Construcción de edificios y obras.",
+        "Domicilio": "C/ MAYOR 1 (MADRID).",
+        "Capital": ": 3.000",
+        "Nombramientos": "Adm. Unico: PEREZ GARCIA JUAN",
+        "Datos registrales": "S 8 , H M 600000, I/A 1 (26.08.24)",
+    }
+    assert estadisticas["aciertos"] == Counter({"Constitución": 1, "Nombramientos": 1, "Datos registrales": 1})
+    assert not estadisticas["fallos"]
+def test_extraer_actos_extincion():
+    parrafo = ("386539 - COMERCIAL EJEMPLO SA.\n"
+               "Disolución. Voluntaria. Extinción. Ceses/Dimisiones. Liquidador: LOPEZ ANA.\n")
+    dicc = Crawler.extraer_actos(parrafo, _estadisticas())
+    assert dicc == {"Id": "386539", "nombre": "COMERCIAL EJEMPLO SA.",
+                    "Acto legal": "Disolución, Extinción, Ceses/Dimisiones",
+                    "Disolución": "Voluntaria", "Extinción": "", "Ceses/Dimisiones": "Liquidador: LOPEZ ANA"}
+def test_extraer_actos_sin_actos():
+    estadisticas = _estadisticas()
+    assert Crawler.extraer_actos("386540 - SIN ACTOS SL.\nTexto sin actos reconocibles.\n", estadisticas) is None
+    assert Crawler.extraer_actos("sin cabecera\nConstitución. Algo.\n", estadisticas) is None
+    assert estadisticas["fallos"] == Counter({"Sin actos": 1, "Cabecera": 1})
@@ -0,0 +1,65 @@
+import functools
+import logging
+import threading
+import time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pytest
+import Fetcher
+class _ManejadorRegistrado(SimpleHTTPRequestHandler):
+    """Sirve los archivos de un directorio y apunta cuándo llega cada petición"""
+    def __init__(self, *args, peticiones, **kwargs):
+        self.peticiones = peticiones
+        super().__init__(*args, **kwargs)
+    def do_GET(self):
+        self.peticiones.append((time.monotonic(), self.path))
+        super().do_GET()
+    def log_message(self, *args):
+        pass
+@pytest.fixture
+def servidor(tmp_path):
+    """Servidor HTTP local con cinco PDF de contenido distinto"""
+    directorio = tmp_path / "servidor"
+    directorio.mkdir()
+    contenidos = {f"BORME-A-2024-168-{i:02d}.pdf": f"%PDF-1.4 boletín {i}\n".encode() * (2000 * (i + 1))
+                  for i in range(5)}
+    for nombre, contenido in contenidos.items():
+        (directorio / nombre).write_bytes(contenido)
+    peticiones = []
+    manejador = functools.partial(_ManejadorRegistrado, directory=str(directorio), peticiones=peticiones)
+    http = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{http.server_address[1]}", contenidos, peticiones
+    http.shutdown()
+    http.server_close()
+def test_descargar_enlaces(servidor, tmp_path):
+    base, contenidos, peticiones = servidor
+    salida = tmp_path / "PDF"
+    salida.mkdir()
+    nombres = sorted(contenidos)
+    # Enlaces repetidos, con espacios y líneas vacías, como en un links.txt escrito a mano
+    enlaces = [f"{base}/{nombre}" for nombre in nombres] + [f" {base}/{nombres[0]}\n", f"{base}/{nombres[3]}", "", "\n"]
+    peticiones_por_segundo = 10.0
+    descargados = Fetcher.descargar_enlaces(enlaces, str(salida), logging.getLogger("Practica12"), concurrencia=4,
+                                            peticiones_por_segundo=peticiones_por_segundo)
+    assert descargados == len(nombres)
+    # Cada archivo se pide una sola vez aunque el enlace esté repetido
+    assert sorted(ruta for _, ruta in peticiones) == [f"/{nombre}" for nombre in nombres]
+    # Las peticiones al mismo host quedan espaciadas según el límite, aunque haya cuatro hilos
+    instantes = sorted(instante for instante, _ in peticiones)
+    # (con margen para lo que tarda cada petición en llegar al servidor desde su turno)
+    separaciones = [despues - antes for antes, despues in zip(instantes, instantes[1:])]
+    assert min(separaciones) >= 0.5 / peticiones_por_segundo
+    assert instantes[-1] - instantes[0] >= 0.9 * (len(instantes) - 1) / peticiones_por_segundo
+    # Los archivos escritos son los del servidor y no queda ningún .part
+    assert sorted(p.name for p in salida.iterdir()) == nombres
+    for nombre, contenido in contenidos.items():
+        assert (salida / nombre).read_bytes() == contenido
+def test_limitador_por_host_independiente():
+    limitador = Fetcher.LimitadorPorHost(5.0)
+    inicio = time.monotonic()
+    for host in ("a.example", "b.example", "c.example"):
+        limitador.esperar(host)
+    # Hosts distintos no se esperan entre sí
+    assert time.monotonic() - inicio < 0.1
+    limitador.esperar("a.example")
+    assert time.monotonic() - inicio >= 0.19
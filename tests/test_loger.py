@@ -0,0 +1,20 @@
+import logging
+import time
+from utils.Loger import Logger
+def test_resumen_al_cerrar_la_ventana_sin_mas_registros(tmp_path):
+    ruta = tmp_path / "Pruebalogs"
+    instancia = Logger("PruebaLoger", str(ruta))
+    logger = instancia.launch_logging(queued=True, window=0.2)
+    try:
+        for i in range(5):
+            logger.error(f"Error al procesar fecha en el registro {i}")
+        # Sin registros nuevos, el resumen se escribe al cerrarse la ventana y no al parar el log
+        limite = time.monotonic() + 5
+        while "4× Error al procesar fecha en el registro #" not in ruta.read_text(encoding="utf-8"):
+            assert time.monotonic() < limite, ruta.read_text(encoding="utf-8")
+            time.sleep(0.05)
+        lineas = ruta.read_text(encoding="utf-8").splitlines()
+        assert len(lineas) == 2 and lineas[0].endswith("Error al procesar fecha en el registro 0")
+    finally:
+        instancia.stop_logging()
+    assert not logging.getLogger("PruebaLoger").handlers
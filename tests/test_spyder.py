@@ -0,0 +1,43 @@
+import functools
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import Spyder
+import Sumario
+from test_sumario import ENLACES_A, _fixture
+class _ManejadorContado(SimpleHTTPRequestHandler):
+    def __init__(self, *args, peticiones, **kwargs):
+        self.peticiones = peticiones
+        super().__init__(*args, **kwargs)
+    def do_GET(self):
+        self.peticiones.append(self.path)
+        super().do_GET()
+    def log_message(self, *args):
+        pass
+def test_procesar_borme_fechas_ya_indexadas(tmp_path, monkeypatch):
+    # Una segunda ejecución con las mismas fechas no las vuelve a pedir, pero links.txt
+    # sigue conteniendo sus enlaces (los toma del índice) en lugar de quedar vacío
+    sumarios = tmp_path / "sumarios"
+    sumarios.mkdir()
+    (sumarios / "20240830").write_bytes(_fixture())
+    peticiones = []
+    http = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_ManejadorContado, peticiones=peticiones,
+                                                                   directory=str(sumarios)))
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    monkeypatch.setattr(Sumario, "URL_SUMARIO", f"http://127.0.0.1:{http.server_address[1]}/{{fecha}}")
+    (tmp_path / "src").mkdir()
+    (tmp_path / "data" / "logs").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path / "src")
+    ruta_enlaces = tmp_path / "links.txt"
+    monkeypatch.setattr(Spyder, "RUTA_SALIDA", str(ruta_enlaces))
+    ruta_indice = str(tmp_path / "links.db")
+    try:
+        Spyder.procesar_borme("30/08/2024", backend="http", ruta_indice=ruta_indice)
+        assert ruta_enlaces.read_text(encoding="utf-8").split() == ENLACES_A
+        Spyder.procesar_borme("30/08/2024", backend="http", ruta_indice=ruta_indice)
+        assert ruta_enlaces.read_text(encoding="utf-8").split() == ENLACES_A
+        Spyder.procesar_borme("30/08/2024", backend="selenium", ruta_indice=ruta_indice)
+        assert ruta_enlaces.read_text(encoding="utf-8").split() == ENLACES_A
+    finally:
+        http.shutdown()
+        http.server_close()
+    assert peticiones == ["/20240830"]
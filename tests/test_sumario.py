@@ -0,0 +1,48 @@
+import functools
+import logging
+import os
+import threading
+import xml.etree.ElementTree as ET
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import pytest
+import Sumario
+RUTA_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sumario_20240830.xml")
+ENLACES_A = [f"https://www.boe.es/borme/dias/2024/08/30/pdfs/BORME-A-2024-168-{provincia}.pdf"
+             for provincia in ("03", "08", "28", "46")]
+def _fixture():
+    with open(RUTA_FIXTURE, "rb") as archivo:
+        return archivo.read()
+def test_parsear_sumario_actos_inscritos():
+    # Solo la sección A, en orden, sin el PDF del sumario ni espacios alrededor de la URL
+    assert Sumario.parsear_sumario(_fixture()) == ENLACES_A
+def test_parsear_sumario_otras_secciones():
+    contenido = _fixture()
+    assert Sumario.parsear_sumario(contenido, "B") == [
+        "https://www.boe.es/borme/dias/2024/08/30/pdfs/BORME-B-2024-168-28.pdf"]
+    # En la sección C los items están dentro de apartados
+    assert Sumario.parsear_sumario(contenido, "C") == [
+        "https://www.boe.es/borme/dias/2024/08/30/pdfs/BORME-C-2024-5001.pdf"]
+    assert Sumario.parsear_sumario(contenido, "Z") == []
+def test_parsear_sumario_xml_invalido():
+    with pytest.raises(ET.ParseError):
+        Sumario.parsear_sumario(_fixture()[:200])
+def test_construir_url_sumario():
+    url = "https://www.boe.es/datosabiertos/api/borme/sumario/20240830"
+    assert Sumario.construir_url_sumario("30/08/2024") == url
+    assert Sumario.construir_url_sumario("30082024\n") == url
+class _ManejadorSilencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+def test_extraer_enlaces_http(tmp_path, monkeypatch):
+    # El sumario se sirve desde un servidor local; la fecha sin archivo responde 404 (no hay boletín)
+    (tmp_path / "20240830").write_bytes(_fixture())
+    http = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_ManejadorSilencioso, directory=str(tmp_path)))
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    monkeypatch.setattr(Sumario, "URL_SUMARIO", f"http://127.0.0.1:{http.server_address[1]}/{{fecha}}")
+    try:
+        enlaces = Sumario.extraer_enlaces_http(["30082024", "31/08/2024", "fecha"], logging.getLogger("Practica12"),
+                                               concurrencia=2, peticiones_por_segundo=None)
+    finally:
+        http.shutdown()
+        http.server_close()
+    assert enlaces == [ENLACES_A, [], []]